@@ -5,6 +5,8 @@ namespace App\Http\Controllers;
 use App\Models\DiscoveredUrl;
 use Illuminate\Http\JsonResponse;
 use Illuminate\Http\Request;
+use Illuminate\Support\Facades\DB;
+use Illuminate\Support\Facades\Validator;
 
 class DiscoveredUrlController extends Controller
 {
@@ -21,6 +23,19 @@ class DiscoveredUrlController extends Controller
             $query->where('url_type', $request->url_type);
         }
         $perPage = (int) $request->get('per_page', 200);
+        if ($request->input('pagination') === 'cursor') {
+            // COUNT only once, on the first page of the scan.
+            $total = $request->filled('cursor') ? null : (clone $query)->reorder()->count();
+            $query->reorder()->orderBy('id');
+            $items = $query->cursorPaginate($perPage, ['*'], 'cursor', $request->input('cursor'));
+
+            return response()->json([
+                'data' => $items->items(),
+                'total' => $total,
+                'per_page' => $items->perPage(),
+                'next_cursor' => $items->nextCursor()?->encode(),
+            ]);
+        }
         $items = $query->paginate($perPage);
 
         return response()->json([
@@ -28,6 +43,7 @@ class DiscoveredUrlController extends Controller
             'total' => $items->total(),
             'per_page' => $items->perPage(),
             'current_page' => $items->currentPage(),
+            'last_page' => $items->lastPage(),
         ]);
     }
 
@@ -50,6 +66,126 @@ class DiscoveredUrlController extends Controller
         return response()->json($item, 201);
     }
 
+    public function bulkStore(Request $request): JsonResponse
+    {
+        $rows = $request->input('urls', []);
+        if (! is_array($rows)) {
+            return response()->json(['error' => 'urls must be an array'], 422);
+        }
+        $candidates = [];
+        $invalid = 0;
+        foreach ($rows as $row) {
+            $validator = Validator::make(is_array($row) ? $row : [], [
+                'place_id' => 'required|string',
+                'url' => 'required|string',
+                'url_type' => 'required|string|in:FACEBOOK,WEBSITE',
+                'found_by_stage' => 'required|string|in:STAGE2,STAGE3',
+            ]);
+            if ($validator->fails()) {
+                $invalid++;
+                continue;
+            }
+            $candidates[$row['place_id']."\0".$row['url']] = $row;
+        }
+        // discovered_urls has no unique index on (place_id, url); dedupe against existing rows like firstOrCreate.
+        if ($candidates) {
+            $placeIds = array_values(array_unique(array_column($candidates, 'place_id')));
+            DiscoveredUrl::query()
+                ->whereIn('place_id', $placeIds)
+                ->get(['place_id', 'url'])
+                ->each(function ($existing) use (&$candidates) {
+                    unset($candidates[$existing->place_id."\0".$existing->url]);
+                });
+        }
+        $now = now();
+        $insert = array_map(fn ($row) => [
+            'place_id' => $row['place_id'],
+            'url' => $row['url'],
+            'url_type' => $row['url_type'],
+            'found_by_stage' => $row['found_by_stage'],
+            'status' => $row['status'] ?? 'NEW',
+            'created_at' => $now,
+            'updated_at' => $now,
+        ], array_values($candidates));
+        $created = $insert ? DiscoveredUrl::insertOrIgnore($insert) : 0;
+
+        return response()->json([
+            'message' => "Created {$created} discovered URLs",
+            'created' => $created,
+            'skipped' => count($rows) - $created - $invalid,
+            'invalid' => $invalid,
+        ], 201);
+    }
+
+    /**
+     * Atomically claim up to n NEW discovered URLs for one worker with a time-limited lease.
+     * Expired leases (crashed workers) are put back to NEW first.
+     */
+    public function claim(Request $request): JsonResponse
+    {
+        $data = $request->validate([
+            'n' => 'required|integer|min:1|max:1000',
+            'worker_id' => 'required|string|max:100',
+            'lease_seconds' => 'nullable|integer|min:10|max:86400',
+        ]);
+        $leaseUntil = now()->addSeconds((int) ($data['lease_seconds'] ?? 600));
+
+        $claimed = DB::transaction(function () use ($data, $leaseUntil) {
+            DiscoveredUrl::query()
+                ->where('status', 'PROCESSING')
+                ->whereNotNull('lease_expires_at')
+                ->where('lease_expires_at', '<', now())
+                ->update(['status' => 'NEW', 'claimed_by' => null, 'lease_expires_at' => null]);
+
+            // SKIP LOCKED: concurrent claimers take disjoint rows instead of waiting on each other.
+            $ids = DiscoveredUrl::query()
+                ->where('status', 'NEW')
+                ->orderBy('id')
+                ->limit((int) $data['n'])
+                ->lock('for update skip locked')
+                ->pluck('id')
+                ->all();
+            if (! $ids) {
+                return [];
+            }
+            DiscoveredUrl::query()->whereIn('id', $ids)->update([
+                'status' => 'PROCESSING',
+                'claimed_by' => $data['worker_id'],
+                'lease_expires_at' => $leaseUntil,
+                'updated_at' => now(),
+            ]);
+
+            return DiscoveredUrl::query()->whereIn('id', $ids)->orderBy('id')->get()->all();
+        });
+
+        return response()->json(['data' => $claimed, 'lease_expires_at' => $leaseUntil->toIso8601String()]);
+    }
+
+    public function bulkStatus(Request $request): JsonResponse
+    {
+        $updates = $request->input('updates', []);
+        if (! is_array($updates)) {
+            return response()->json(['error' => 'updates must be an array'], 422);
+        }
+        $byStatus = [];
+        foreach ($updates as $row) {
+            $id = $row['id'] ?? null;
+            $status = $row['status'] ?? null;
+            if (! is_numeric($id) || ! is_string($status) || $status === '') {
+                continue;
+            }
+            $byStatus[$status][] = (int) $id;
+        }
+        $updated = 0;
+        foreach ($byStatus as $status => $ids) {
+            $updated += DiscoveredUrl::query()
+                ->whereIn('id', array_values(array_unique($ids)))
+                ->update(['status' => $status, 'updated_at' => now()]);
+        }
+
+        return response()->json(['message' => "Updated {$updated} discovered URLs", 'updated' => $updated]);
+    }
+
     public function show(int $discovered_url): JsonResponse
     {
         $model = DiscoveredUrl::findOrFail($discovered_url);
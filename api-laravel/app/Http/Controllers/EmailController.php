@@ -6,18 +6,44 @@ use App\Models\Email;
 use App\Models\Place;
 use Illuminate\Http\JsonResponse;
 use Illuminate\Http\Request;
+use Illuminate\Support\Facades\Validator;
 
 class EmailController extends Controller
 {
     public function index(Request $request): JsonResponse
     {
-        $query = Email::query()->orderByDesc('created_at');
+        // id as tie-breaker keeps page boundaries stable when clients fetch pages in parallel
+        $query = Email::query()->orderByDesc('created_at')->orderByDesc('id');
+        if ($request->filled('updated_since')) {
+            // >= on purpose: rows updated within the same second as the client's watermark are re-sent.
+            // Exports carry place columns, so an edited place re-sends its emails too.
+            $since = $request->updated_since;
+            $query->where(function ($q) use ($since) {
+                $q->where('updated_at', '>=', $since)
+                    ->orWhereHas('place', fn ($p) => $p->where('updated_at', '>=', $since));
+            });
+        }
         if ($request->filled('place_id')) {
             $query->where('place_id', $request->place_id);
         }
         if ($request->filled('source')) {
             $query->where('source', $request->source);
         }
+        // id-bounded snapshot / id-range pages for exports: rows inserted after the snapshot
+        // (higher ids) cannot shift what a client is paging through.
+        if ($request->filled('min_id')) {
+            $query->where('id', '>=', (int) $request->min_id);
+        }
+        if ($request->filled('max_id')) {
+            $query->where('id', '<=', (int) $request->max_id);
+        }
+        if ($request->filled('before_id')) {
+            $query->where('id', '<', (int) $request->before_id);
+        }
+        if ($request->input('order') === 'id') {
+            // keyset order for before_id paging
+            $query->reorder()->orderByDesc('id');
+        }
         if ($request->boolean('include_place')) {
             $query->with('place');
         }
@@ -32,12 +58,31 @@ class EmailController extends Controller
             }, $data);
         }
 
-        return response()->json([
+        $response = [
             'data' => $data,
             'total' => $emails->total(),
             'per_page' => $emails->perPage(),
             'current_page' => $emails->currentPage(),
-        ]);
+            'last_page' => $emails->lastPage(),
+        ];
+        if ($request->boolean('meta')) {
+            // Cache key for incremental exports: watermark + a fingerprint of the id set
+            // (count, min/max id, sum of ids) so a delete is detected even when an insert keeps the count.
+            // The watermark covers places as well as emails (place columns are part of the export).
+            $response['max_updated_at'] = collect([
+                Email::query()->max('updated_at'),
+                Place::query()->max('updated_at'),
+            ])->filter()->max();
+            $fingerprint = Email::query()
+                ->selectRaw('COUNT(*) AS total_all, MIN(id) AS min_id, MAX(id) AS max_id, COALESCE(SUM(id), 0) AS ids_sum')
+                ->first();
+            $response['total_all'] = (int) $fingerprint->total_all;
+            $response['min_id'] = $fingerprint->min_id !== null ? (int) $fingerprint->min_id : null;
+            $response['max_id'] = (int) ($fingerprint->max_id ?? 0);
+            $response['ids_sum'] = (string) $fingerprint->ids_sum;
+        }
+
+        return response()->json($response);
     }
 
     public function store(Request $request): JsonResponse
@@ -60,6 +105,49 @@ class EmailController extends Controller
         return response()->json($email, 201);
     }
 
+    public function bulkStore(Request $request): JsonResponse
+    {
+        $rows = $request->input('emails', []);
+        if (! is_array($rows)) {
+            return response()->json(['error' => 'emails must be an array'], 422);
+        }
+        $now = now();
+        $insert = [];
+        $invalid = 0;
+        foreach ($rows as $row) {
+            $validator = Validator::make(is_array($row) ? $row : [], [
+                'place_id' => 'required|string',
+                'email' => 'required|email',
+                'source' => 'required|string',
+            ]);
+            if ($validator->fails()) {
+                $invalid++;
+                continue;
+            }
+            $key = $row['place_id']."\0".$row['email'];
+            $insert[$key] = [
+                'place_id' => $row['place_id'],
+                'email' => $row['email'],
+                'source' => $row['source'],
+                'created_at' => $now,
+                'updated_at' => $now,
+            ];
+        }
+        // Same semantics as store(): existing (place_id, email) rows are left untouched.
+        $created = $insert ? Email::insertOrIgnore(array_values($insert)) : 0;
+        $placeIds = array_values(array_unique(array_column($insert, 'place_id')));
+        if ($placeIds) {
+            Place::query()->whereIn('place_id', $placeIds)->update(['status' => 'DONE']);
+        }
+
+        return response()->json([
+            'message' => "Created {$created} emails",
+            'created' => $created,
+            'skipped' => count($rows) - $created - $invalid,
+            'invalid' => $invalid,
+        ], 201);
+    }
+
     public function show(int $email): JsonResponse
     {
         $model = Email::findOrFail($email);
@@ -7,6 +7,8 @@ use App\Models\Email;
 use App\Models\Place;
 use Illuminate\Http\JsonResponse;
 use Illuminate\Http\Request;
+use Illuminate\Support\Carbon;
+use Illuminate\Support\Facades\DB;
 
 class PlaceController extends Controller
 {
@@ -135,7 +137,38 @@ class PlaceController extends Controller
         if ($request->filled('normalized_category')) {
             $query->where('normalized_category', $request->normalized_category);
         }
+        if ($request->boolean('facebook')) {
+            $query->where(function ($q) {
+                $q->where('website', 'like', '%facebook.com%')->orWhere('website', 'like', '%fb.com/%');
+            });
+        }
+        // Stage 3 incremental scan: never scraped, scraped before fb_due_before, or FAILED before fb_retry_before.
+        if ($request->filled('fb_due_before')) {
+            $due = Carbon::parse($request->fb_due_before);
+            $retry = $request->filled('fb_retry_before') ? Carbon::parse($request->fb_retry_before) : $due;
+            $query->where(function ($q) use ($due, $retry) {
+                $q->whereNull('fb_scraped_at')
+                    ->orWhere('fb_scraped_at', '<', $due)
+                    ->orWhere(function ($failed) use ($retry) {
+                        $failed->where('fb_status', 'FAILED')->where('fb_scraped_at', '<', $retry);
+                    });
+            });
+        }
         $perPage = (int) $request->get('per_page', 100);
+        if ($request->input('pagination') === 'cursor') {
+            // COUNT only once, on the first page of the scan.
+            $total = $request->filled('cursor') ? null : (clone $query)->reorder()->count();
+            // Keyset pagination on the primary key: stable while workers change row status mid-scan.
+            $query->reorder()->orderBy('place_id');
+            $places = $query->cursorPaginate($perPage, ['*'], 'cursor', $request->input('cursor'));
+
+            return response()->json([
+                'data' => $places->items(),
+                'total' => $total,
+                'per_page' => $places->perPage(),
+                'next_cursor' => $places->nextCursor()?->encode(),
+            ]);
+        }
         $places = $query->paginate($perPage);
 
         return response()->json([
@@ -143,6 +176,7 @@ class PlaceController extends Controller
             'total' => $places->total(),
             'per_page' => $places->perPage(),
             'current_page' => $places->currentPage(),
+            'last_page' => $places->lastPage(),
         ]);
     }
 
@@ -197,7 +231,11 @@ class PlaceController extends Controller
             'normalized_category',
             'province',
             'district',
+            'fb_status',
         ]);
+        if (isset($data['fb_status'])) {
+            $data['fb_scraped_at'] = now();
+        }
         $model->update($data);
 
         return response()->json($model);
@@ -276,6 +314,104 @@ class PlaceController extends Controller
         ], 201);
     }
 
+    /**
+     * Atomically claim up to n NEW places for one worker with a time-limited lease.
+     * Expired leases (crashed workers) are put back to NEW first.
+     */
+    public function claim(Request $request): JsonResponse
+    {
+        $data = $request->validate([
+            'n' => 'required|integer|min:1|max:1000',
+            'worker_id' => 'required|string|max:100',
+            'lease_seconds' => 'nullable|integer|min:10|max:86400',
+        ]);
+        $leaseUntil = now()->addSeconds((int) ($data['lease_seconds'] ?? 600));
+
+        $claimed = DB::transaction(function () use ($data, $leaseUntil) {
+            Place::query()
+                ->where('status', 'PROCESSING')
+                ->whereNotNull('lease_expires_at')
+                ->where('lease_expires_at', '<', now())
+                ->update(['status' => 'NEW', 'claimed_by' => null, 'lease_expires_at' => null]);
+
+            // SKIP LOCKED: concurrent claimers take disjoint rows instead of waiting on each other.
+            $ids = Place::query()
+                ->where('status', 'NEW')
+                ->orderBy('place_id')
+                ->limit((int) $data['n'])
+                ->lock('for update skip locked')
+                ->pluck('place_id')
+                ->all();
+            if (! $ids) {
+                return [];
+            }
+            Place::query()->whereIn('place_id', $ids)->update([
+                'status' => 'PROCESSING',
+                'claimed_by' => $data['worker_id'],
+                'lease_expires_at' => $leaseUntil,
+                'updated_at' => now(),
+            ]);
+
+            return Place::query()->whereIn('place_id', $ids)->orderBy('place_id')->get()->all();
+        });
+
+        return response()->json(['data' => $claimed, 'lease_expires_at' => $leaseUntil->toIso8601String()]);
+    }
+
+    public function bulkStatus(Request $request): JsonResponse
+    {
+        $updates = $request->input('updates', []);
+        if (! is_array($updates)) {
+            return response()->json(['error' => 'updates must be an array'], 422);
+        }
+        // Group by status so each distinct status is a single UPDATE ... WHERE IN.
+        $byStatus = [];
+        foreach ($updates as $row) {
+            $placeId = $row['place_id'] ?? null;
+            $status = $row['status'] ?? null;
+            if (! is_string($placeId) || ! is_string($status) || $placeId === '' || $status === '') {
+                continue;
+            }
+            $byStatus[$status][] = $placeId;
+        }
+        $updated = 0;
+        foreach ($byStatus as $status => $ids) {
+            $updated += Place::query()
+                ->whereIn('place_id', array_values(array_unique($ids)))
+                ->update(['status' => $status, 'updated_at' => now()]);
+        }
+
+        return response()->json(['message' => "Updated {$updated} places", 'updated' => $updated]);
+    }
+
+    /**
+     * Record Stage 3 results: fb_status per place, fb_scraped_at = now.
+     */
+    public function bulkFbStatus(Request $request): JsonResponse
+    {
+        $updates = $request->input('updates', []);
+        if (! is_array($updates)) {
+            return response()->json(['error' => 'updates must be an array'], 422);
+        }
+        $byStatus = [];
+        foreach ($updates as $row) {
+            $placeId = $row['place_id'] ?? null;
+            $status = $row['fb_status'] ?? null;
+            if (! is_string($placeId) || ! is_string($status) || $placeId === '' || $status === '') {
+                continue;
+            }
+            $byStatus[$status][] = $placeId;
+        }
+        $updated = 0;
+        foreach ($byStatus as $status => $ids) {
+            $updated += Place::query()
+                ->whereIn('place_id', array_values(array_unique($ids)))
+                ->update(['fb_status' => $status, 'fb_scraped_at' => now(), 'updated_at' => now()]);
+        }
+
+        return response()->json(['message' => "Updated {$updated} places", 'updated' => $updated]);
+    }
+
     public function clear(): JsonResponse
     {
         DiscoveredUrl::query()->delete();
@@ -0,0 +1,45 @@
+<?php
+
+namespace App\Http\Middleware;
+
+use Closure;
+use Illuminate\Http\Request;
+use Symfony\Component\HttpFoundation\InputBag;
+use Symfony\Component\HttpFoundation\Response;
+
+/**
+ * Accept request bodies sent with "Content-Encoding: gzip" (chunked Stage 1 import).
+ * Registered as global middleware ahead of TrimStrings so the JSON body is parsed
+ * from the decompressed payload.
+ */
+class DecompressGzipRequest
+{
+    public function handle(Request $request, Closure $next): Response
+    {
+        if (strtolower((string) $request->header('Content-Encoding')) !== 'gzip') {
+            return $next($request);
+        }
+        $decoded = @gzdecode($request->getContent());
+        if ($decoded === false) {
+            return response()->json(['error' => 'invalid gzip request body'], 400);
+        }
+
+        $server = $request->server->all();
+        unset($server['HTTP_CONTENT_ENCODING']);
+        $server['CONTENT_LENGTH'] = (string) strlen($decoded);
+        $request->initialize(
+            $request->query->all(),
+            $request->request->all(),
+            $request->attributes->all(),
+            $request->cookies->all(),
+            $request->files->all(),
+            $server,
+            $decoded
+        );
+        if ($request->isJson()) {
+            $request->setJson(new InputBag((array) json_decode($decoded, true)));
+        }
+
+        return $next($request);
+    }
+}
@@ -0,0 +1,61 @@
+<?php
+
+namespace App\Http\Middleware;
+
+use Closure;
+use Illuminate\Http\Request;
+use Illuminate\Support\Facades\Cache;
+use Symfony\Component\HttpFoundation\Response;
+
+/**
+ * Replay-safe writes for the Python spool shipper (api_client.SpoolWriter).
+ * A request carrying "Idempotency-Key" is executed once; a retry with the same key
+ * (e.g. the response was lost on a timeout) gets the stored response instead of
+ * writing again. Only 2xx responses are remembered, so failed batches can be retried.
+ */
+class IdempotentRequest
+{
+    private const TTL_SECONDS = 86400;
+
+    public function handle(Request $request, Closure $next): Response
+    {
+        $key = trim((string) $request->header('Idempotency-Key'));
+        if ($key === '' || strlen($key) > 200) {
+            return $next($request);
+        }
+        $cacheKey = 'idempotency:' . sha1($request->method() . ' ' . $request->path() . ' ' . $key);
+
+        $replay = $this->replay($cacheKey);
+        if ($replay) {
+            return $replay;
+        }
+
+        // Serialize concurrent retries of the same batch; the second one replays the first.
+        return Cache::lock($cacheKey . ':lock', 120)->block(60, function () use ($cacheKey, $request, $next) {
+            $replay = $this->replay($cacheKey);
+            if ($replay) {
+                return $replay;
+            }
+            $response = $next($request);
+            if ($response->isSuccessful()) {
+                Cache::put($cacheKey, [
+                    'status' => $response->getStatusCode(),
+                    'content' => $response->getContent(),
+                ], self::TTL_SECONDS);
+            }
+            return $response;
+        });
+    }
+
+    private function replay(string $cacheKey): ?Response
+    {
+        $stored = Cache::get($cacheKey);
+        if (!is_array($stored)) {
+            return null;
+        }
+        return response($stored['content'], $stored['status'], [
+            'Content-Type' => 'application/json',
+            'Idempotent-Replayed' => 'true',
+        ]);
+    }
+}
@@ -15,6 +15,12 @@ class DiscoveredUrl extends Model
         'url_type',
         'found_by_stage',
         'status',
+        'claimed_by',
+        'lease_expires_at',
+    ];
+
+    protected $casts = [
+        'lease_expires_at' => 'datetime',
     ];
 
     public function place(): BelongsTo
@@ -32,6 +32,10 @@ class Place extends Model
         'longitude',
         'raw_data',
         'status',
+        'claimed_by',
+        'lease_expires_at',
+        'fb_status',
+        'fb_scraped_at',
     ];
 
     protected $casts = [
@@ -39,6 +43,8 @@ class Place extends Model
         'review_rating' => 'float',
         'latitude' => 'float',
         'longitude' => 'float',
+        'lease_expires_at' => 'datetime',
+        'fb_scraped_at' => 'datetime',
     ];
 
     public function emails(): HasMany
@@ -1,5 +1,6 @@
 <?php
 
+use App\Http\Middleware\DecompressGzipRequest;
 use Illuminate\Foundation\Application;
 use Illuminate\Foundation\Configuration\Exceptions;
 use Illuminate\Foundation\Configuration\Middleware;
@@ -12,7 +13,7 @@ return Application::configure(basePath: dirname(__DIR__))
         health: '/health',
     )
     ->withMiddleware(function (Middleware $middleware) {
-        //
+        $middleware->prepend(DecompressGzipRequest::class);
     })
     ->withExceptions(function (Exceptions $exceptions) {
         //
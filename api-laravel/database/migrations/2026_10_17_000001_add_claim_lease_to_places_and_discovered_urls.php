@@ -0,0 +1,36 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    public function up(): void
+    {
+        foreach (['places', 'discovered_urls'] as $tableName) {
+            Schema::table($tableName, function (Blueprint $table) use ($tableName) {
+                if (! Schema::hasColumn($tableName, 'claimed_by')) {
+                    $table->string('claimed_by', 100)->nullable()->after('status');
+                }
+                if (! Schema::hasColumn($tableName, 'lease_expires_at')) {
+                    $table->timestamp('lease_expires_at')->nullable()->after('claimed_by');
+                }
+            });
+
+            Schema::table($tableName, function (Blueprint $table) {
+                $table->index(['status', 'lease_expires_at']);
+            });
+        }
+    }
+
+    public function down(): void
+    {
+        foreach (['places', 'discovered_urls'] as $tableName) {
+            Schema::table($tableName, function (Blueprint $table) {
+                $table->dropIndex(['status', 'lease_expires_at']);
+                $table->dropColumn(['claimed_by', 'lease_expires_at']);
+            });
+        }
+    }
+};
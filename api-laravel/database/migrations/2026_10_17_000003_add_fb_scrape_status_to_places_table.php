@@ -0,0 +1,32 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    public function up(): void
+    {
+        Schema::table('places', function (Blueprint $table) {
+            if (! Schema::hasColumn('places', 'fb_status')) {
+                $table->string('fb_status', 20)->nullable()->after('lease_expires_at');
+            }
+            if (! Schema::hasColumn('places', 'fb_scraped_at')) {
+                $table->timestamp('fb_scraped_at')->nullable()->after('fb_status');
+            }
+        });
+
+        Schema::table('places', function (Blueprint $table) {
+            $table->index(['fb_status', 'fb_scraped_at']);
+        });
+    }
+
+    public function down(): void
+    {
+        Schema::table('places', function (Blueprint $table) {
+            $table->dropIndex(['fb_status', 'fb_scraped_at']);
+            $table->dropColumn(['fb_status', 'fb_scraped_at']);
+        });
+    }
+};
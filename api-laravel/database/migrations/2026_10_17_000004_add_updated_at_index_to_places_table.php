@@ -0,0 +1,22 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    public function up(): void
+    {
+        Schema::table('places', function (Blueprint $table) {
+            $table->index('updated_at');
+        });
+    }
+
+    public function down(): void
+    {
+        Schema::table('places', function (Blueprint $table) {
+            $table->dropIndex(['updated_at']);
+        });
+    }
+};
@@ -7,6 +7,7 @@ use App\Http\Controllers\DiscoveredUrlController;
 use App\Http\Controllers\StatsController;
 use App\Http\Controllers\PipelineController;
 use App\Http\Controllers\EmailCampaignController;
+use App\Http\Middleware\IdempotentRequest;
 use Illuminate\Support\Facades\Route;
 
 // Check-in API (same paths as FastAPI)
@@ -20,13 +21,20 @@ Route::get('/responses', [CheckinController::class, 'getResponses']);
 Route::get('/stats', [StatsController::class, 'index']);
 Route::post('/places/import', [PlaceController::class, 'import']);
 Route::post('/places/clear', [PlaceController::class, 'clear']);
+Route::post('/places/bulk-status', [PlaceController::class, 'bulkStatus'])->middleware(IdempotentRequest::class);
+Route::post('/places/claim', [PlaceController::class, 'claim']);
+Route::post('/places/bulk-fb-status', [PlaceController::class, 'bulkFbStatus'])->middleware(IdempotentRequest::class);
 Route::apiResource('places', PlaceController::class)->only(['index', 'store', 'show', 'update', 'destroy']);
 Route::post('/emails/bulk-delete', [EmailController::class, 'bulkDelete']);
+Route::post('/emails/bulk', [EmailController::class, 'bulkStore'])->middleware(IdempotentRequest::class);
 Route::apiResource('emails', EmailController::class)->only(['index', 'store', 'show', 'update', 'destroy']);
 Route::post('/email-campaigns/preview', [EmailCampaignController::class, 'preview']);
 Route::post('/email-campaigns/send', [EmailCampaignController::class, 'send']);
 Route::get('/email-campaigns', [EmailCampaignController::class, 'index']);
 Route::get('/email-campaigns/{id}', [EmailCampaignController::class, 'show']);
+Route::post('/discovered-urls/bulk', [DiscoveredUrlController::class, 'bulkStore'])->middleware(IdempotentRequest::class);
+Route::post('/discovered-urls/bulk-status', [DiscoveredUrlController::class, 'bulkStatus'])->middleware(IdempotentRequest::class);
+Route::post('/discovered-urls/claim', [DiscoveredUrlController::class, 'claim']);
 Route::apiResource('discovered-urls', DiscoveredUrlController::class)->only(['index', 'store', 'show', 'update', 'destroy']);
 Route::post('/pipeline/run', [PipelineController::class, 'run']);
 Route::get('/pipeline/status', [PipelineController::class, 'status']);
@@ -0,0 +1,1101 @@
+# -*- coding: utf-8 -*-
+"""
+API client for Laravel Pipeline + Check-in API.
+ใช้แทนการเชื่อม SQLite โดยตรง — ทุกการอ่าน/เขียนข้อมูลผ่าน HTTP ไปที่ API.
+"""
+import os
+import gzip
+import atexit
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Optional, Any, Callable, Iterator
+from pathlib import Path
+
+from .metrics import ApiMetrics, CircuitBreaker, CircuitOpenError, endpoint_key
+from .limiter import AdaptiveLimiter
+
+# Base URL จาก env (ชี้ไปที่ Laravel API)
+def get_api_base_url() -> str:
+    url = os.getenv("CHECKIN_API_URL") or os.getenv("API_BASE_URL") or "http://localhost:8000"
+    return url.rstrip("/")
+
+# ---------- HTTP session (pooled, keep-alive) ----------
+# One Session per process: connections to the API are reused instead of opening
+# a new TCP connection for every create_email / update_place call.
+#   API_POOL_SIZE     max keep-alive connections per host (default 10)
+#   API_RETRIES       retries on connection errors (default 3)
+#   API_RETRY_BACKOFF backoff factor in seconds between retries (default 0.3)
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+def _build_session() -> requests.Session:
+    pool_size = max(1, _env_int("API_POOL_SIZE", 10))
+    # Retry only failures where the request never reached the server
+    # (connect errors / dropped keep-alive connections); read timeouts and
+    # HTTP error statuses are returned to the caller unchanged.
+    retry = Retry(
+        total=None,
+        connect=_env_int("API_RETRIES", 3),
+        read=0,
+        status=0,
+        other=0,
+        redirect=False,
+        allowed_methods=None,
+        backoff_factor=_env_float("API_RETRY_BACKOFF", 0.3),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+    s = requests.Session()
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    s.headers.update({"Accept": "application/json", "Connection": "keep-alive"})
+    return s
+
+def get_session() -> requests.Session:
+    """Process-wide pooled Session (re-created after fork)."""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            _session = _build_session()
+            _session_pid = pid
+        return _session
+
+def close_session() -> None:
+    """ปิด connection pool (เรียกตอนจบโปรเซส หรือเมื่อเปลี่ยน API_POOL_SIZE)"""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pid = None
+
+# ---------- Metrics + circuit breaker ----------
+# ทุก _req ถูกวัด latency / status / bytes ต่อ endpoint (ดู get_metrics()).
+# Circuit breaker: เมื่อ API ช้า/ล้มจนเกิน threshold จะ fail fast (CircuitOpenError)
+# แทนการกอง request ที่ timeout 60s ใส่ server ที่ overload อยู่แล้ว.
+#   API_CB_ENABLED    0 = ปิด breaker (default 1)
+#   API_CB_WINDOW     rolling window seconds (default 30)
+#   API_CB_MIN_CALLS  min calls in window before the breaker can trip (default 20)
+#   API_CB_ERROR_RATE trip when error rate >= this (default 0.5)
+#   API_CB_P95        trip when p95 latency >= this many seconds (default 20, 0 = off)
+#   API_CB_COOLDOWN   seconds open before a half-open probe (default 15)
+#   API_METRICS_FILE  write a JSON snapshot here at process exit
+_metrics = ApiMetrics()
+_breaker = CircuitBreaker(
+    enabled=os.getenv("API_CB_ENABLED", "1").strip().lower() not in ("0", "false", "no", "off"),
+    window_s=_env_float("API_CB_WINDOW", 30.0),
+    min_calls=_env_int("API_CB_MIN_CALLS", 20),
+    error_rate=_env_float("API_CB_ERROR_RATE", 0.5),
+    p95_s=_env_float("API_CB_P95", 20.0),
+    cooldown_s=_env_float("API_CB_COOLDOWN", 15.0),
+)
+
+# ---------- Adaptive write concurrency ----------
+# Write (non-GET) requests ของทุก stage ในโปรเซสผ่าน AIMD limiter ตัวเดียว: in-flight เพิ่มทีละ 1
+# เมื่อ latency <= API_WRITE_LATENCY, หารครึ่งเมื่อ timeout/429/5xx.
+#   API_ADAPTIVE_LIMIT       0 = ปิด (default 1)
+#   API_WRITE_LIMIT_INITIAL  starting in-flight writes (default 2)
+#   API_WRITE_LIMIT_MAX      upper bound (default API_POOL_SIZE)
+#   API_WRITE_LATENCY        healthy latency target in seconds (default 2)
+_write_limiter = AdaptiveLimiter(
+    enabled=os.getenv("API_ADAPTIVE_LIMIT", "1").strip().lower() not in ("0", "false", "no", "off"),
+    initial=max(1, _env_int("API_WRITE_LIMIT_INITIAL", 2)),
+    min_limit=1,
+    max_limit=max(1, _env_int("API_WRITE_LIMIT_MAX", _env_int("API_POOL_SIZE", 10))),
+    latency_target=_env_float("API_WRITE_LATENCY", 2.0) or 2.0,
+)
+
+def _is_overload(status: Optional[int]) -> bool:
+    """None = exception (timeout / connection error)"""
+    return status is None or status == 429 or status >= 500
+
+def _body_size(body: Any) -> int:
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    return 0
+
+def get_metrics() -> dict:
+    """Snapshot: per-endpoint count/errors/status/bytes/latency (p50/p95/p99) + circuit breaker state"""
+    snap = _metrics.snapshot()
+    snap["circuit"] = _breaker.snapshot()
+    snap["write_limiter"] = _write_limiter.snapshot()
+    return snap
+
+def dump_metrics(path: Optional[str] = None) -> str:
+    """เขียน get_metrics() เป็น JSON (path หรือ API_METRICS_FILE). Returns JSON string"""
+    data = json.dumps(get_metrics(), ensure_ascii=False, indent=2)
+    path = path or os.getenv("API_METRICS_FILE")
+    if path:
+        Path(path).write_text(data, encoding="utf-8")
+    return data
+
+def reset_metrics() -> None:
+    _metrics.reset()
+
+def circuit_state() -> dict:
+    return _breaker.snapshot()
+
+def _dump_metrics_at_exit() -> None:
+    if os.getenv("API_METRICS_FILE") and _metrics.snapshot()["totals"]["count"]:
+        try:
+            dump_metrics()
+        except OSError:
+            pass
+
+atexit.register(_dump_metrics_at_exit)
+
+# Errors that are worth retrying (API overloaded / restarting / unreachable) rather than ending a run
+TRANSIENT_ERRORS = (CircuitOpenError, requests.RequestException)
+
+def _req(method: str, path: str, **kwargs) -> requests.Response:
+    base = get_api_base_url()
+    url = path if path.startswith("http") else f"{base}{path}"
+    # API on local Windows can intermittently respond slowly while multiple stages run.
+    timeout = kwargs.pop("timeout", 60)
+    endpoint = endpoint_key(method, path)
+    _breaker.before_call(endpoint)
+    limited = method.upper() != "GET"
+    if limited:
+        _write_limiter.acquire()
+    start = time.perf_counter()
+    try:
+        r = get_session().request(method, url, timeout=timeout, **kwargs)
+    except Exception:
+        elapsed = time.perf_counter() - start
+        if limited:
+            _write_limiter.release(elapsed, True)
+        _breaker.after_call(elapsed, True)
+        _metrics.record(endpoint, elapsed, None, True, _body_size(kwargs.get("data")))
+        raise
+    elapsed = time.perf_counter() - start
+    if limited:
+        _write_limiter.release(elapsed, _is_overload(r.status_code))
+    error = r.status_code >= 500
+    _breaker.after_call(elapsed, error)
+    _metrics.record(endpoint, elapsed, r.status_code, error,
+                    _body_size(r.request.body), len(r.content or b""))
+    return r
+
+# ---------- Streaming pagination ----------
+def _fetch_page(path: str, params: dict, page: Optional[int], cursor: Optional[str]) -> Optional[dict]:
+    """1 หน้า: ขอ keyset (pagination=cursor) เสมอ; server รุ่นเก่าที่ไม่รู้จักจะตอบแบบ page ปกติ"""
+    params = dict(params, pagination="cursor")
+    if cursor:
+        params["cursor"] = cursor
+    elif page:
+        params["page"] = page
+    r = _req("GET", path, params=params)
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+class PageIterator:
+    """
+    Iterate rows of a paginated list endpoint while the next page is fetched in a
+    background thread, so work starts after one page latency and memory stays at ~2 pages.
+
+    ใช้ keyset/cursor (next_cursor) เมื่อ server รองรับ — ปลอดภัยเมื่อ worker เปลี่ยน status
+    ของ row ระหว่างสแกน. ถ้า server ตอบแบบ page number จะ fallback เป็น page=N
+    (กรณีนี้ถ้า filter ด้วย status แล้ว consumer เปลี่ยน status ไปด้วย อาจข้ามบาง row ได้).
+
+    .total = จำนวน row ทั้งหมดจากหน้าแรก (ตัดด้วย limit), None ถ้า server ไม่ส่งมา
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[Optional[int], Optional[str]], Optional[dict]],
+        per_page: int = 500,
+        limit: Optional[int] = None,
+        transform: Optional[Callable[[dict], Any]] = None,
+    ):
+        self._fetch = fetch
+        self.per_page = per_page
+        self.limit = limit
+        self._transform = transform
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-prefetch")
+        self._first = self._pool.submit(fetch, 1, None)
+        self._started = False
+
+    @property
+    def total(self) -> Optional[int]:
+        first = self._first.result()
+        total = (first or {}).get("total")
+        if total is None:
+            return None
+        total = int(total)
+        return min(total, self.limit) if self.limit else total
+
+    def _next_request(self, resp: dict, page: int, chunk_len: int) -> Optional[tuple]:
+        if "next_cursor" in resp:
+            cursor = resp.get("next_cursor")
+            return (None, cursor) if cursor else None
+        current_page = int(resp.get("current_page") or page)
+        last_page = int(resp.get("last_page") or current_page)
+        if current_page >= last_page or chunk_len < self.per_page:
+            return None
+        return (page + 1, None)
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._started:
+            raise RuntimeError("PageIterator can only be iterated once")
+        self._started = True
+        fut = self._first
+        page = 1
+        yielded = 0
+        try:
+            while fut is not None:
+                resp = fut.result() or {}
+                chunk = resp.get("data") or []
+                if not chunk:
+                    break
+                nxt = self._next_request(resp, page, len(chunk))
+                fut = None
+                if nxt is not None and not (self.limit and yielded + len(chunk) >= self.limit):
+                    page = nxt[0] or page + 1
+                    fut = self._pool.submit(self._fetch, *nxt)
+                for row in chunk:
+                    if self.limit and yielded >= self.limit:
+                        return
+                    yielded += 1
+                    yield self._transform(row) if self._transform else row
+        finally:
+            if fut is not None:
+                fut.cancel()
+            self._pool.shutdown(wait=False)
+
+# ---------- Stats ----------
+def get_stats() -> Optional[dict]:
+    """ดึงสถิติรวม (total_places, status_breakdown, total_emails, source_breakdown, total_discovered, ...)"""
+    r = _req("GET", "/api/stats")
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+# ---------- Places ----------
+def get_places(status: Optional[str] = None, per_page: int = 500, page: Optional[int] = None) -> Optional[dict]:
+    """GET /api/places. Returns { data: [...], total, per_page, current_page }"""
+    params = {"per_page": per_page}
+    if status:
+        params["status"] = status
+    if page:
+        params["page"] = page
+    r = _req("GET", "/api/places", params=params)
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+def iter_places(
+    status: Optional[str] = None,
+    per_page: int = 500,
+    limit: Optional[int] = None,
+    transform: Optional[Callable[[dict], Any]] = None,
+    facebook: bool = False,
+    fb_due_before: Optional[str] = None,
+    fb_retry_before: Optional[str] = None,
+) -> "PageIterator":
+    """
+    Stream places page by page (next page prefetched in background). ดู PageIterator
+    facebook=True: เฉพาะ website ที่เป็น Facebook. fb_due_before / fb_retry_before (ISO 8601):
+    เฉพาะที่ยังไม่เคย scrape, scrape ก่อน fb_due_before หรือ FAILED ก่อน fb_retry_before (Stage 3 incremental)
+    """
+    def fetch(page: Optional[int], cursor: Optional[str]) -> Optional[dict]:
+        params = {"per_page": per_page}
+        if status:
+            params["status"] = status
+        if facebook:
+            params["facebook"] = 1
+        if fb_due_before:
+            params["fb_due_before"] = fb_due_before
+        if fb_retry_before:
+            params["fb_retry_before"] = fb_retry_before
+        return _fetch_page("/api/places", params, page, cursor)
+    return PageIterator(fetch, per_page=per_page, limit=limit, transform=transform)
+
+def _claimed_rows(r: requests.Response) -> Optional[list]:
+    if r.status_code in (404, 405):
+        return None
+    r.raise_for_status()
+    return (r.json() or {}).get("data") or []
+
+def claim_places(n: int, worker_id: str, lease_seconds: int = 600) -> Optional[list]:
+    """
+    POST /api/places/claim — จอง NEW places สูงสุด n แถวให้ worker นี้แบบ atomic (status=PROCESSING + lease).
+    Lease ที่หมดอายุ (worker ตาย) จะถูกคืนเป็น NEW ก่อน. Returns list of places ([] = ไม่มีงาน),
+    None ถ้า API ไม่มี endpoint นี้ (404/405). Error อื่น (429/5xx, connection) raise หนึ่งใน TRANSIENT_ERRORS
+    ให้ caller retry แทนการเข้าใจว่าไม่มีงาน.
+    """
+    r = _req("POST", "/api/places/claim", json={"n": n, "worker_id": worker_id, "lease_seconds": lease_seconds})
+    return _claimed_rows(r)
+
+def get_place(place_id: str) -> Optional[dict]:
+    r = _req("GET", f"/api/places/{place_id}")
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+def update_place(place_id: str, data: dict) -> Optional[dict]:
+    r = _req("PATCH", f"/api/places/{place_id}", json=data)
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+def update_places_status_bulk(updates: list) -> Optional[dict]:
+    """POST /api/places/bulk-status. updates = [{place_id, status}, ...]"""
+    r = _req("POST", "/api/places/bulk-status", json={"updates": updates})
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+def import_places(payload: list, compress: bool = False, timeout: Optional[float] = None) -> tuple[Optional[dict], Optional[str]]:
+    """POST /api/places/import. Returns (result_dict, error_message). result_dict is None on failure.
+    compress=True ส่ง body แบบ gzip (Content-Encoding: gzip) — ลดขนาด chunk ที่มี raw_data ยาวๆ"""
+    try:
+        kwargs = {"timeout": timeout} if timeout else {}
+        if compress:
+            body = gzip.compress(json.dumps({"places": payload}, ensure_ascii=False).encode("utf-8"), compresslevel=5)
+            headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+            r = _req("POST", "/api/places/import", data=body, headers=headers, **kwargs)
+        else:
+            r = _req("POST", "/api/places/import", json={"places": payload}, **kwargs)
+        if r.status_code in (200, 201):
+            return (r.json(), None)
+        try:
+            err = r.json()
+            msg = err.get("message", err.get("error", r.text)) if isinstance(err, dict) else r.text
+        except Exception:
+            msg = r.text or f"HTTP {r.status_code}"
+        return (None, msg)
+    except Exception as e:
+        return (None, str(e))
+
+def clear_all() -> Optional[dict]:
+    """POST /api/places/clear — ล้าง places, emails, discovered_urls"""
+    r = _req("POST", "/api/places/clear")
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+# ---------- Emails ----------
+def get_emails(place_id: Optional[str] = None, source: Optional[str] = None, per_page: int = 2000, include_place: bool = False) -> Optional[dict]:
+    """GET /api/emails. Returns { data: [...], total, ... }. If include_place=True, each item has 'place'."""
+    params = {"per_page": per_page}
+    if place_id:
+        params["place_id"] = place_id
+    if source:
+        params["source"] = source
+    if include_place:
+        params["include_place"] = "1"
+    r = _req("GET", "/api/emails", params=params)
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+def create_email(place_id: str, email: str, source: str) -> Optional[dict]:
+    r = _req("POST", "/api/emails", json={"place_id": place_id, "email": email, "source": source})
+    if r.status_code not in (200, 201):
+        return None
+    return r.json()
+
+def update_email(email_id: int, data: dict) -> Optional[dict]:
+    r = _req("PATCH", f"/api/emails/{email_id}", json=data)
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+def delete_email(email_id: int) -> bool:
+    r = _req("DELETE", f"/api/emails/{email_id}")
+    return r.status_code == 200
+
+def bulk_delete_emails(ids: list) -> Optional[dict]:
+    r = _req("POST", "/api/emails/bulk-delete", json={"ids": ids})
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+def create_emails_bulk(rows: list) -> Optional[dict]:
+    """POST /api/emails/bulk. rows = [{place_id, email, source}, ...]. Returns { created, skipped }"""
+    r = _req("POST", "/api/emails/bulk", json={"emails": rows})
+    if r.status_code not in (200, 201):
+        return None
+    return r.json()
+
+# ---------- Discovered URLs ----------
+def get_discovered_urls(
+    status: Optional[str] = None,
+    place_id: Optional[str] = None,
+    url_type: Optional[str] = None,
+    per_page: int = 500,
+    page: Optional[int] = None,
+) -> Optional[dict]:
+    params = {"per_page": per_page}
+    if status:
+        params["status"] = status
+    if place_id:
+        params["place_id"] = place_id
+    if url_type:
+        params["url_type"] = url_type
+    if page:
+        params["page"] = page
+    r = _req("GET", "/api/discovered-urls", params=params)
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+def iter_discovered_urls(
+    status: Optional[str] = None,
+    url_type: Optional[str] = None,
+    per_page: int = 500,
+    limit: Optional[int] = None,
+    transform: Optional[Callable[[dict], Any]] = None,
+) -> "PageIterator":
+    """Stream discovered URLs page by page (next page prefetched in background). ดู PageIterator"""
+    def fetch(page: Optional[int], cursor: Optional[str]) -> Optional[dict]:
+        params = {"per_page": per_page}
+        if status:
+            params["status"] = status
+        if url_type:
+            params["url_type"] = url_type
+        return _fetch_page("/api/discovered-urls", params, page, cursor)
+    return PageIterator(fetch, per_page=per_page, limit=limit, transform=transform)
+
+def claim_discovered_urls(n: int, worker_id: str, lease_seconds: int = 600) -> Optional[list]:
+    """POST /api/discovered-urls/claim — เหมือน claim_places แต่สำหรับ discovered URLs"""
+    r = _req("POST", "/api/discovered-urls/claim", json={"n": n, "worker_id": worker_id, "lease_seconds": lease_seconds})
+    return _claimed_rows(r)
+
+def create_discovered_url(place_id: str, url: str, url_type: str, found_by_stage: str) -> Optional[dict]:
+    r = _req("POST", "/api/discovered-urls", json={
+        "place_id": place_id, "url": url, "url_type": url_type, "found_by_stage": found_by_stage
+    })
+    if r.status_code not in (200, 201):
+        return None
+    return r.json()
+
+def update_discovered_url(id: int, status: str) -> Optional[dict]:
+    r = _req("PATCH", f"/api/discovered-urls/{id}", json={"status": status})
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+def create_discovered_urls_bulk(rows: list) -> Optional[dict]:
+    """POST /api/discovered-urls/bulk. rows = [{place_id, url, url_type, found_by_stage}, ...]"""
+    r = _req("POST", "/api/discovered-urls/bulk", json={"urls": rows})
+    if r.status_code not in (200, 201):
+        return None
+    return r.json()
+
+def update_discovered_urls_status_bulk(updates: list) -> Optional[dict]:
+    """POST /api/discovered-urls/bulk-status. updates = [{id, status}, ...]"""
+    r = _req("POST", "/api/discovered-urls/bulk-status", json={"updates": updates})
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+# ---------- Buffered bulk writes ----------
+class BulkWriter:
+    """
+    รวม write ของ stage (emails, discovered URLs, status) แล้วส่งเป็น batch
+    แทนการยิง 1 request ต่อ 1 row. Flush เมื่อ buffer ครบ max_batch หรือเก่ากว่า max_age วินาที.
+
+        with api_client.BulkWriter() as writer:
+            writer.add_email(place_id, email, 'WEBSITE')
+            writer.set_place_status(place_id, 'DONE')
+            writer.set_place_fb_status(place_id, 'NO_EMAIL')   # Stage 3 (fb_scraped_at = เวลาที่ server รับ)
+
+    Env: API_BULK_SIZE (default 200), API_BULK_MAX_AGE seconds (default 5).
+    ถ้า API ยังไม่มี bulk endpoint (404/405) จะ fallback เป็นการเรียกทีละ row.
+    ระหว่างที่ circuit breaker เปิด flush จะเลื่อนออกไป (write ยังอยู่ใน buffer) แทนการยิงใส่ API ที่ overload.
+    """
+
+    def __init__(self, max_batch: Optional[int] = None, max_age: Optional[float] = None, verbose: bool = False):
+        self.max_batch = max(1, max_batch or _env_int("API_BULK_SIZE", 200))
+        self.max_age = max_age if max_age is not None else _env_float("API_BULK_MAX_AGE", 5.0)
+        self.verbose = verbose
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._emails: list = []
+        self._urls: list = []
+        # status updates are coalesced: last status per id wins
+        self._place_status: dict = {}
+        self._url_status: dict = {}
+        self._place_fb_status: dict = {}
+        self._oldest: Optional[float] = None
+        self._stop = threading.Event()
+        self._timer: Optional[threading.Thread] = None
+        self._bulk_missing: set = set()
+        self.stats = {"rows": 0, "requests": 0, "failed": 0, "dropped": 0, "deferred": 0}
+
+    # ----- buffering -----
+    def _pending(self) -> int:
+        return (len(self._emails) + len(self._urls) + len(self._place_status) + len(self._url_status)
+                + len(self._place_fb_status))
+
+    def _added(self) -> None:
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self.stats["rows"] += 1
+        self._ensure_timer()
+
+    def _ensure_timer(self) -> None:
+        if self._timer is None and self.max_age > 0:
+            self._timer = threading.Thread(target=self._age_loop, name="BulkWriter", daemon=True)
+            self._timer.start()
+
+    def add_email(self, place_id: str, email: str, source: str) -> None:
+        with self._lock:
+            self._emails.append({"place_id": place_id, "email": email, "source": source})
+            self._added()
+            full = self._pending() >= self.max_batch
+        if full:
+            self.flush()
+
+    def add_discovered_url(self, place_id: str, url: str, url_type: str, found_by_stage: str) -> None:
+        with self._lock:
+            self._urls.append({"place_id": place_id, "url": url, "url_type": url_type, "found_by_stage": found_by_stage})
+            self._added()
+            full = self._pending() >= self.max_batch
+        if full:
+            self.flush()
+
+    def set_place_status(self, place_id: str, status: str) -> None:
+        with self._lock:
+            self._place_status[place_id] = status
+            self._added()
+            full = self._pending() >= self.max_batch
+        if full:
+            self.flush()
+
+    def set_discovered_url_status(self, url_id: int, status: str) -> None:
+        with self._lock:
+            self._url_status[int(url_id)] = status
+            self._added()
+            full = self._pending() >= self.max_batch
+        if full:
+            self.flush()
+
+    def set_place_fb_status(self, place_id: str, fb_status: str) -> None:
+        with self._lock:
+            self._place_fb_status[place_id] = fb_status
+            self._added()
+            full = self._pending() >= self.max_batch
+        if full:
+            self.flush()
+
+    def _age_loop(self) -> None:
+        interval = max(0.2, self.max_age / 2)
+        while not self._stop.wait(interval):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.max_age
+            if due:
+                try:
+                    self.flush()
+                except Exception:
+                    pass
+
+    # ----- sending -----
+    def _send(self, kind: str, items: list, idempotency_key: Optional[str] = None) -> list:
+        """
+        ส่ง 1 batch; fallback เป็น per-row เมื่อ server ไม่มี bulk endpoint.
+        Returns rows ที่ส่งไม่สำเร็จ ([] = สำเร็จทั้ง batch) — caller re-queue เฉพาะ rows เหล่านี้
+        เพื่อไม่ให้ row ที่เขียนไปแล้วใน per-row fallback ถูกส่งซ้ำ (discovered_urls ไม่มี unique index).
+        """
+        if kind not in self._bulk_missing:
+            paths = {
+                "emails": ("/api/emails/bulk", "emails"),
+                "urls": ("/api/discovered-urls/bulk", "urls"),
+                "place_status": ("/api/places/bulk-status", "updates"),
+                "url_status": ("/api/discovered-urls/bulk-status", "updates"),
+                "place_fb_status": ("/api/places/bulk-fb-status", "updates"),
+            }
+            path, key = paths[kind]
+            headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+            r = _req("POST", path, json={key: items}, headers=headers)
+            self.stats["requests"] += 1
+            if r.status_code in (200, 201):
+                return []
+            if r.status_code not in (404, 405):
+                return items
+            self._bulk_missing.add(kind)
+            if self.verbose:
+                print(f"   [WARNING] {path} not available; falling back to per-row writes")
+        failed = []
+        for i, it in enumerate(items):
+            self.stats["requests"] += 1
+            try:
+                if kind == "emails":
+                    res = create_email(it["place_id"], it["email"], it["source"])
+                elif kind == "urls":
+                    res = create_discovered_url(it["place_id"], it["url"], it["url_type"], it["found_by_stage"])
+                elif kind == "place_status":
+                    res = update_place(it["place_id"], {"status": it["status"]})
+                elif kind == "place_fb_status":
+                    res = update_place(it["place_id"], {"fb_status": it["fb_status"]})
+                else:
+                    res = update_discovered_url(int(it["id"]), it["status"])
+            except Exception as e:
+                # API ล่ม / breaker เปิดกลาง batch: row นี้และที่เหลือยังไม่ได้ส่ง
+                if self.verbose and not isinstance(e, CircuitOpenError):
+                    print(f"   [WARNING] Per-row {kind} write error: {e}")
+                failed.extend(items[i:])
+                break
+            if res is None:
+                failed.append(it)
+        return failed
+
+    def flush(self) -> bool:
+        """ส่งทุกอย่างที่ค้างอยู่. Returns False ถ้ามี batch ที่ส่งไม่สำเร็จ (batch นั้นจะถูกเก็บไว้ส่งใหม่)"""
+        with self._flush_lock:
+            if _breaker.is_open():
+                self.stats["deferred"] += 1
+                return False
+            with self._lock:
+                emails, self._emails = self._emails, []
+                urls, self._urls = self._urls, []
+                place_status, self._place_status = self._place_status, {}
+                url_status, self._url_status = self._url_status, {}
+                place_fb_status, self._place_fb_status = self._place_fb_status, {}
+                self._oldest = None
+            # Rows first, then statuses, so a place is never marked DONE before its emails exist.
+            batches = [
+                ("emails", emails),
+                ("urls", urls),
+                ("place_status", [{"place_id": k, "status": v} for k, v in place_status.items()]),
+                ("url_status", [{"id": k, "status": v} for k, v in url_status.items()]),
+                ("place_fb_status", [{"place_id": k, "fb_status": v} for k, v in place_fb_status.items()]),
+            ]
+            # Stop at the first failed batch (like SpoolWriter.flush): it and everything after it is re-queued.
+            failed = []
+            for kind, items in batches:
+                for i in range(0, len(items), self.max_batch):
+                    chunk = items[i:i + self.max_batch]
+                    if failed:
+                        failed.append((kind, chunk))
+                        continue
+                    try:
+                        unsent = self._send(kind, chunk)
+                    except CircuitOpenError:
+                        unsent = chunk
+                    except Exception as e:
+                        unsent = chunk
+                        if self.verbose:
+                            print(f"   [WARNING] Bulk {kind} flush error: {e}")
+                    if unsent:
+                        self.stats["failed"] += 1
+                        failed.append((kind, unsent))
+            if failed:
+                self._requeue(failed)
+            return not failed
+
+    def _requeue(self, failed: list) -> None:
+        with self._lock:
+            # reversed: each chunk is put in front of rows added meanwhile, keeping the original order
+            for kind, chunk in reversed(failed):
+                if kind == "emails":
+                    self._emails[:0] = chunk
+                elif kind == "urls":
+                    self._urls[:0] = chunk
+                elif kind == "place_status":
+                    for it in chunk:
+                        self._place_status.setdefault(it["place_id"], it["status"])
+                elif kind == "place_fb_status":
+                    for it in chunk:
+                        self._place_fb_status.setdefault(it["place_id"], it["fb_status"])
+                else:
+                    for it in chunk:
+                        self._url_status.setdefault(it["id"], it["status"])
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def _final_flush(self) -> bool:
+        """หยุด timer แล้ว flush ครั้งสุดท้าย (retry 1 ครั้ง — รอ breaker cooldown ก่อนถ้าเปิดอยู่)"""
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join(timeout=5)
+            self._timer = None
+        ok = self.flush()
+        if not ok:
+            wait = _breaker.retry_in()
+            if wait > 0:
+                time.sleep(min(wait, 60.0))
+            ok = self.flush()
+        return ok
+
+    def close(self) -> None:
+        """Flush ครั้งสุดท้ายและหยุด timer; write ที่ยังส่งไม่ได้จะถูกทิ้ง (ใช้ SpoolWriter ถ้าต้องการเก็บไว้)"""
+        if not self._final_flush():
+            with self._lock:
+                self.stats["dropped"] += self._pending()
+                if self.verbose:
+                    print(f"   [WARNING] BulkWriter dropped {self._pending()} unsent writes")
+                self._emails, self._urls = [], []
+                self._place_status, self._url_status, self._place_fb_status = {}, {}, {}
+                self._oldest = None
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+class SpoolWriter(BulkWriter):
+    """
+    BulkWriter ที่เขียนทุก row ลง spool บนดิสก์ก่อน (api_client.spool, SQLite WAL) แล้ว shipper
+    (timer thread ของ BulkWriter) ส่งขึ้น API เป็น bulk พร้อม Idempotency-Key ต่อ batch.
+    Crawl จึงไม่ต้องรอ API และ write ที่ยังส่งไม่ได้ตอน close() จะค้างอยู่ในไฟล์ —
+    ถูกส่งต่อโดย writer ตัวถัดไปที่เปิด spool เดียวกัน (ไม่มีการทิ้งข้อมูล).
+
+    Env: API_SPOOL_PATH (default api_spool.db) + API_BULK_SIZE / API_BULK_MAX_AGE เหมือน BulkWriter.
+    """
+
+    KINDS = ("emails", "urls", "place_status", "url_status", "place_fb_status")
+
+    def __init__(self, path: Optional[str] = None, max_batch: Optional[int] = None,
+                 max_age: Optional[float] = None, verbose: bool = False):
+        super().__init__(max_batch=max_batch, max_age=max_age, verbose=verbose)
+        from .spool import Spool
+        self.spool = Spool(path or os.getenv("API_SPOOL_PATH") or "api_spool.db")
+        self._unflushed = 0
+        self.stats.update(shipped=0, kept=0)
+        leftover = self.spool.pending()
+        if leftover:
+            # rows from an earlier run that never reached the API: ship them with this run
+            if self.verbose:
+                print(f"   [SPOOL] {leftover} unsent writes from a previous run in {self.spool.path}")
+            with self._lock:
+                self._oldest = time.monotonic() - self.max_age
+                self._ensure_timer()
+
+    def _pending(self) -> int:
+        return self._unflushed
+
+    def _append(self, kind: str, item: dict) -> None:
+        self.spool.append(kind, item)
+        with self._lock:
+            self._unflushed += 1
+            self._added()
+            full = self._unflushed >= self.max_batch
+        if full:
+            self.flush()
+
+    def add_email(self, place_id: str, email: str, source: str) -> None:
+        self._append("emails", {"place_id": place_id, "email": email, "source": source})
+
+    def add_discovered_url(self, place_id: str, url: str, url_type: str, found_by_stage: str) -> None:
+        self._append("urls", {"place_id": place_id, "url": url, "url_type": url_type, "found_by_stage": found_by_stage})
+
+    def set_place_status(self, place_id: str, status: str) -> None:
+        self._append("place_status", {"place_id": place_id, "status": status})
+
+    def set_discovered_url_status(self, url_id: int, status: str) -> None:
+        self._append("url_status", {"id": int(url_id), "status": status})
+
+    def set_place_fb_status(self, place_id: str, fb_status: str) -> None:
+        self._append("place_fb_status", {"place_id": place_id, "fb_status": fb_status})
+
+    @staticmethod
+    def _coalesce(kind: str, items: list) -> list:
+        """status ของ id เดียวกันใน batch: ค่าล่าสุดชนะ"""
+        if kind not in ("place_status", "url_status", "place_fb_status"):
+            return items
+        key = "id" if kind == "url_status" else "place_id"
+        return list({it[key]: it for it in items}.values())
+
+    def flush(self) -> bool:
+        """ส่งทุก batch ใน spool ตามลำดับ kind (rows ก่อน status). หยุดที่ batch แรกที่ส่งไม่สำเร็จ"""
+        with self._flush_lock:
+            if _breaker.is_open():
+                self.stats["deferred"] += 1
+                return False
+            with self._lock:
+                self._oldest = None
+                self._unflushed = 0
+            for kind in self.KINDS:
+                while True:
+                    batch, items = self.spool.claim_batch(kind, self.max_batch)
+                    if not batch:
+                        break
+                    items = self._coalesce(kind, items)
+                    try:
+                        unsent = self._send(kind, items, idempotency_key=batch)
+                    except CircuitOpenError:
+                        unsent = items
+                    except Exception as e:
+                        unsent = items
+                        if self.verbose:
+                            print(f"   [WARNING] Spool {kind} ship error: {e}")
+                    if unsent:
+                        if len(unsent) < len(items):
+                            # per-row fallback เขียนไปแล้วบางส่วน: เก็บไว้เฉพาะ rows ที่ยังไม่ได้ส่ง
+                            self.spool.retain(batch, unsent)
+                            self.stats["shipped"] += len(items) - len(unsent)
+                        self.spool.release(batch)
+                        self.stats["failed"] += 1
+                        with self._lock:
+                            if self._oldest is None:
+                                self._oldest = time.monotonic()
+                        return False
+                    self.spool.ack(batch)
+                    self.stats["shipped"] += len(items)
+            return True
+
+    def close(self) -> None:
+        """Flush ครั้งสุดท้าย; ที่ส่งไม่ได้ยังอยู่ใน spool สำหรับรอบถัดไป"""
+        self._final_flush()
+        self.stats["kept"] = self.spool.pending()
+        if self.stats["kept"] and self.verbose:
+            print(f"   [SPOOL] {self.stats['kept']} writes kept in {self.spool.path}; they will be sent on the next run")
+        self.spool.close()
+
+def open_writer(verbose: bool = False) -> BulkWriter:
+    """Writer ของ stage: SpoolWriter (default) หรือ BulkWriter ในหน่วยความจำถ้า API_SPOOL=0"""
+    if os.getenv("API_SPOOL", "1").strip().lower() in ("0", "false", "no", "off"):
+        return BulkWriter(verbose=verbose)
+    return SpoolWriter(verbose=verbose)
+
+# ---------- Check-in (existing) ----------
+def health_check() -> Optional[dict]:
+    r = _req("GET", "/health", timeout=5)
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+def create_token(email: str, expires_in_days: Optional[int] = None) -> Optional[dict]:
+    body = {"email": email}
+    if expires_in_days is not None:
+        body["expires_in_days"] = expires_in_days
+    r = _req("POST", "/api/create-token", json=body)
+    if r.status_code not in (200, 201):
+        return None
+    return r.json()
+
+def get_tokens(email: Optional[str] = None) -> Optional[dict]:
+    params = {}
+    if email:
+        params["email"] = email
+    r = _req("GET", "/api/tokens", params=params)
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+def get_responses(response_type: Optional[str] = None) -> Optional[dict]:
+    params = {}
+    if response_type:
+        params["response_type"] = response_type
+    r = _req("GET", "/api/responses", params=params)
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+# ---------- Helpers for GUI (DataFrame-compatible) ----------
+EMAIL_EXPORT_COLUMNS = [
+    "id", "place_id", "place_name", "category", "phone", "website", "address", "email", "source", "found_at",
+]
+
+def _get_emails_export_page(params: dict) -> Optional[dict]:
+    r = _req("GET", "/api/emails", params={"include_place": "1", **params})
+    if r.status_code != 200:
+        return None
+    data = r.json()
+    return data if isinstance(data, dict) and "data" in data else None
+
+def _append_email_rows(cols: dict, emails: list) -> None:
+    """เติม column arrays ตรงๆ (ไม่สร้าง dict ต่อแถว)"""
+    ids, place_ids, names, cats = cols["id"], cols["place_id"], cols["place_name"], cols["category"]
+    phones, sites, addrs = cols["phone"], cols["website"], cols["address"]
+    email_addrs, sources, found = cols["email"], cols["source"], cols["found_at"]
+    for e in emails:
+        p = e.get("place") or {}
+        ids.append(e.get("id"))
+        place_ids.append(e.get("place_id", ""))
+        names.append(p.get("name", ""))
+        cats.append(p.get("category"))
+        phones.append(p.get("phone"))
+        sites.append(p.get("website"))
+        addrs.append(p.get("address"))
+        email_addrs.append(e.get("email", ""))
+        sources.append(e.get("source", ""))
+        found.append(e.get("created_at", ""))
+
+def _sort_email_columns(cols: dict) -> dict:
+    """เรียงแบบเดียวกับ server: found_at desc, id desc"""
+    order = sorted(range(len(cols["id"])), key=lambda i: (str(cols["found_at"][i] or ""), cols["id"][i] or 0), reverse=True)
+    return {c: [cols[c][i] for i in order] for c in EMAIL_EXPORT_COLUMNS}
+
+def _get_email_export_meta() -> Optional[dict]:
+    """Watermark (max updated_at ของ emails/places) + fingerprint ของ id set: total_all, min_id, max_id, ids_sum"""
+    resp = _get_emails_export_page({"per_page": 1, "page": 1, "meta": "1"})
+    if resp is None:
+        return None
+    return {k: resp.get(k) for k in ("max_updated_at", "total_all", "min_id", "max_id", "ids_sum")}
+
+def _fetch_email_snapshot(per_page: int, workers: int, meta: dict) -> Optional[dict]:
+    """
+    ทุก row ที่ id อยู่ใน [min_id, max_id] ของ meta: แบ่งเป็นช่วง id ละ per_page แล้วดึงขนานกัน.
+    ไม่ใช้ offset — insert ระหว่างดึง (id ใหม่ > max_id) หรือ delete ไม่ทำให้หน้าเลื่อนจน row ซ้ำ/หาย
+    """
+    cols = {c: [] for c in EMAIL_EXPORT_COLUMNS}
+    max_id = int(meta.get("max_id") or 0)
+    if not max_id:
+        return cols
+    min_id = int(meta.get("min_id") or 1)
+    ranges = [(lo, min(lo + per_page - 1, max_id)) for lo in range(min_id, max_id + 1, per_page)]
+
+    def fetch(bounds):
+        lo, hi = bounds
+        return _get_emails_export_page({"min_id": lo, "max_id": hi, "per_page": hi - lo + 1, "page": 1})
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="api-export") as ex:
+        for resp in ex.map(fetch, ranges):
+            if resp is None:
+                return None
+            _append_email_rows(cols, resp["data"])
+    return _sort_email_columns(cols)
+
+def _fetch_email_delta(per_page: int, updated_since: str, max_id: int) -> Optional[dict]:
+    """Row ที่ email หรือ place เปลี่ยนตั้งแต่ updated_since (id <= max_id), keyset ตาม id desc ทีละหน้า"""
+    cols = {c: [] for c in EMAIL_EXPORT_COLUMNS}
+    params = {"updated_since": updated_since, "max_id": max_id, "order": "id", "per_page": per_page, "page": 1}
+    while True:
+        resp = _get_emails_export_page(params)
+        if resp is None:
+            return None
+        rows = resp["data"]
+        _append_email_rows(cols, rows)
+        if len(rows) < per_page:
+            return cols
+        params["before_id"] = rows[-1]["id"]
+
+def _fetch_email_columns_paged(per_page: int, workers: int) -> Optional[dict]:
+    """Server รุ่นเก่า (ไม่มี max_id ใน meta): page number ขนานกัน, ไม่ใช้ cache"""
+    first = _get_emails_export_page({"per_page": per_page, "page": 1})
+    if first is None:
+        return None
+    cols = {c: [] for c in EMAIL_EXPORT_COLUMNS}
+    _append_email_rows(cols, first["data"])
+    last_page = int(first.get("last_page") or 1)
+    if last_page > 1:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="api-export") as ex:
+            # map() keeps page order, so rows stay in server order (created_at desc)
+            for resp in ex.map(lambda n: _get_emails_export_page({"per_page": per_page, "page": n}),
+                               range(2, last_page + 1)):
+                if resp is None:
+                    return None
+                _append_email_rows(cols, resp["data"])
+    return cols
+
+def _matches_fingerprint(cols: dict, meta: dict) -> bool:
+    """id set ของ cols ตรงกับ server (count + max id + sum of ids) — delete ที่มี insert มาแทนก็ไม่ผ่าน"""
+    ids = [int(i) for i in cols["id"] if i is not None]
+    if meta.get("total_all") is None or meta.get("ids_sum") is None:
+        return False
+    return (len(ids) == int(meta["total_all"]) and max(ids, default=0) == int(meta.get("max_id") or 0)
+            and sum(ids) == int(meta["ids_sum"]))
+
+def _load_email_cache(path: Path) -> Optional[dict]:
+    """JSON cache file (ไม่ใช้ pickle: path มาจาก env และไฟล์อาจถูกแก้จากภายนอก)"""
+    try:
+        cache = json.loads(path.read_text(encoding="utf-8"))
+        cols = cache.get("columns") if isinstance(cache, dict) else None
+        if not isinstance(cols, dict) or set(cols) != set(EMAIL_EXPORT_COLUMNS):
+            return None
+        if not all(isinstance(v, list) and len(v) == len(cols["id"]) for v in cols.values()):
+            return None
+        return cache
+    except Exception:
+        pass
+    return None
+
+def _save_email_cache(path: Path, cols: dict, meta: dict) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps({"columns": cols, **meta}, ensure_ascii=False, separators=(",", ":")),
+                       encoding="utf-8")
+        os.replace(tmp, path)
+    except Exception:
+        pass
+
+def _merge_email_columns(cached: dict, delta: dict) -> dict:
+    """แทนที่ row ที่เปลี่ยน (ตาม id) และเพิ่ม row ใหม่ แล้วเรียง found_at desc, id desc"""
+    pos = {v: i for i, v in enumerate(cached["id"])}
+    merged = {c: list(cached[c]) for c in EMAIL_EXPORT_COLUMNS}
+    for j, row_id in enumerate(delta["id"]):
+        i = pos.get(row_id)
+        if i is None:
+            pos[row_id] = len(merged["id"])
+            for c in EMAIL_EXPORT_COLUMNS:
+                merged[c].append(delta[c][j])
+        else:
+            for c in EMAIL_EXPORT_COLUMNS:
+                merged[c][i] = delta[c][j]
+    return _sort_email_columns(merged)
+
+def get_emails_dataframe_from_api(per_page: int = 1000, workers: int = 4, cache_path: Optional[str] = None):
+    """
+    ดึงข้อมูลอีเมลรวม place เป็นชุดที่เหมาะสำหรับสร้าง DataFrame
+    (เหมือน get_emails_dataframe ที่อ่านจาก SQLite)
+    ดึงครบทุก row ภายใต้ snapshot id <= max_id (ช่วง id ละ per_page ขนานกัน `workers` threads).
+    cache_path (หรือ env API_EMAILS_CACHE): cache แบบ columnar (JSON) บนดิสก์ คีย์ด้วย max(updated_at) ของ
+    emails และ places บน server — โหลดครั้งถัดไปดึงเฉพาะ row ที่อีเมลหรือ place เปลี่ยน (updated_since);
+    ถ้า id set ไม่ตรงกับ fingerprint ของ server (มีการลบ) จะดึงใหม่ทั้งหมด.
+    Returns DataFrame or None on error.
+    """
+    import pandas as pd
+    meta = _get_email_export_meta()
+    if meta is None:
+        return None
+    if meta.get("max_id") is None:
+        cols = _fetch_email_columns_paged(per_page, workers)
+        if cols is None:
+            return None
+        return pd.DataFrame(cols, columns=EMAIL_EXPORT_COLUMNS) if cols["id"] else pd.DataFrame()
+
+    cache_path = cache_path or os.getenv("API_EMAILS_CACHE")
+    path = Path(cache_path) if cache_path else None
+    cache = _load_email_cache(path) if path else None
+    meta_cached = {"max_updated_at": meta.get("max_updated_at")}
+
+    cols = None
+    if cache and cache.get("max_updated_at"):
+        delta = _fetch_email_delta(per_page, cache["max_updated_at"], int(meta["max_id"]))
+        if delta is None:
+            return None
+        merged = _merge_email_columns(cache["columns"], delta) if delta["id"] else cache["columns"]
+        if _matches_fingerprint(merged, meta):
+            cols = merged
+            if delta["id"] or meta.get("max_updated_at") != cache.get("max_updated_at"):
+                _save_email_cache(path, cols, meta_cached)
+    if cols is None:
+        cols = _fetch_email_snapshot(per_page, workers, meta)
+        if cols is None:
+            return None
+        if path:
+            _save_email_cache(path, cols, meta_cached)
+    if not cols["id"]:
+        return pd.DataFrame()
+    return pd.DataFrame(cols, columns=EMAIL_EXPORT_COLUMNS)
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Asyncio variant of api_client (aiohttp).
+ฟังก์ชันชื่อเดียวกับ api_client แต่เป็น coroutine — ใช้ใน stage ที่รันบน event loop
+เพื่อไม่ให้การเรียก API บล็อก loop และไม่ต้องเปิด thread ต่อ 1 request.
+
+    from api_client import aio
+    places = await aio.get_places(status='NEW')
+    await aio.create_email(place_id, email, 'WEBSITE')
+    await aio.close()
+
+ทุก coroutine ใช้ ClientSession เดียวกันต่อ event loop (connection pool + keep-alive)
+และจำกัดจำนวน request ที่วิ่งพร้อมกันด้วย API_AIO_CONCURRENCY (default = API_POOL_SIZE).
+Metrics, circuit breaker และ adaptive write limiter ใช้ตัวเดียวกับ api_client (api_client.get_metrics()).
+"""
+import json
+import time
+import asyncio
+from typing import Optional, Any
+
+import aiohttp
+
+from . import get_api_base_url, _env_int, _metrics, _breaker, _write_limiter, _is_overload, endpoint_key
+
+_sessions: dict = {}
+
+
+def _limits() -> tuple[int, int]:
+    pool_size = max(1, _env_int("API_POOL_SIZE", 10))
+    concurrency = max(1, _env_int("API_AIO_CONCURRENCY", pool_size))
+    return pool_size, concurrency
+
+
+def _get_session() -> tuple[aiohttp.ClientSession, asyncio.Semaphore]:
+    """ClientSession + Semaphore ของ event loop ปัจจุบัน (aiohttp session ผูกกับ loop)"""
+    loop = asyncio.get_running_loop()
+    entry = _sessions.get(loop)
+    if entry is None or entry[0].closed:
+        pool_size, concurrency = _limits()
+        connector = aiohttp.TCPConnector(limit=pool_size, limit_per_host=pool_size, keepalive_timeout=30)
+        session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"Accept": "application/json"},
+            timeout=aiohttp.ClientTimeout(total=60),
+        )
+        entry = (session, asyncio.Semaphore(concurrency))
+        _sessions[loop] = entry
+    return entry
+
+
+async def close() -> None:
+    """ปิด ClientSession ของ event loop ปัจจุบัน (เรียกก่อน loop จบ)"""
+    entry = _sessions.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[0].close()
+
+
+async def _req(method: str, path: str, ok: tuple = (200,), **kwargs) -> tuple[int, Any]:
+    """ส่ง request แล้วคืน (status, json-or-None). json เป็น None ถ้า status ไม่อยู่ใน ok"""
+    base = get_api_base_url()
+    url = path if path.startswith("http") else f"{base}{path}"
+    timeout = kwargs.pop("timeout", None)
+    if timeout is not None:
+        kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+    endpoint = endpoint_key(method, path)
+    _breaker.before_call(endpoint)
+    limited = method.upper() != "GET"
+    acquired = reported = False
+    try:
+        if limited:
+            # รอ write slot ก่อนเข้า sem — write ที่รอ AIMD limit ไม่กิน slot ของ GET (get_places, claim)
+            await _write_limiter.aacquire()
+            acquired = True
+        session, sem = _get_session()
+        async with sem:
+            start = time.perf_counter()
+            try:
+                async with session.request(method, url, **kwargs) as r:
+                    body = await r.read()
+            except Exception:
+                elapsed = time.perf_counter() - start
+                if acquired:
+                    acquired = False
+                    _write_limiter.release(elapsed, True)
+                reported = True
+                _breaker.after_call(elapsed, True)
+                _metrics.record(endpoint, elapsed, None, True)
+                raise
+            elapsed = time.perf_counter() - start
+            if acquired:
+                acquired = False
+                _write_limiter.release(elapsed, _is_overload(r.status))
+            error = r.status >= 500
+            reported = True
+            _breaker.after_call(elapsed, error)
+            sent = kwargs.get("data")
+            _metrics.record(endpoint, elapsed, r.status, error, len(sent) if isinstance(sent, bytes) else 0, len(body))
+    finally:
+        # ถูก cancel (ระหว่างรอ sem / limiter หรือกลาง request): คืน slot โดยไม่นับเป็น sample
+        if acquired:
+            # elapsed=inf: ไม่เพิ่มและไม่ลด limit
+            _write_limiter.release(float("inf"), False)
+        if not reported:
+            # คืน probe slot ของ half-open — ไม่งั้น breaker ปฏิเสธทุก call ไปตลอด process
+            _breaker.cancel_call()
+    if r.status not in ok:
+        return r.status, None
+    return r.status, json.loads(body) if body else None
+
+
+async def _json(method: str, path: str, ok: tuple = (200,), **kwargs) -> Optional[Any]:
+    _, data = await _req(method, path, ok=ok, **kwargs)
+    return data
+
+
+# ---------- Stats ----------
+async def get_stats() -> Optional[dict]:
+    return await _json("GET", "/api/stats")
+
+
+# ---------- Places ----------
+async def get_places(status: Optional[str] = None, per_page: int = 500, page: Optional[int] = None) -> Optional[dict]:
+    """GET /api/places. Returns { data: [...], total, per_page, current_page }"""
+    params = {"per_page": per_page}
+    if status:
+        params["status"] = status
+    if page:
+        params["page"] = page
+    return await _json("GET", "/api/places", params=params)
+
+
+async def claim_places(n: int, worker_id: str, lease_seconds: int = 600) -> Optional[list]:
+    data = await _json("POST", "/api/places/claim", json={"n": n, "worker_id": worker_id, "lease_seconds": lease_seconds})
+    return None if data is None else (data.get("data") or [])
+
+
+async def get_place(place_id: str) -> Optional[dict]:
+    return await _json("GET", f"/api/places/{place_id}")
+
+
+async def update_place(place_id: str, data: dict) -> Optional[dict]:
+    return await _json("PATCH", f"/api/places/{place_id}", json=data)
+
+
+async def update_places_status_bulk(updates: list) -> Optional[dict]:
+    return await _json("POST", "/api/places/bulk-status", json={"updates": updates})
+
+
+async def import_places(payload: list) -> tuple[Optional[dict], Optional[str]]:
+    """POST /api/places/import. Returns (result_dict, error_message)."""
+    try:
+        status, data = await _req("POST", "/api/places/import", ok=(200, 201), json={"places": payload})
+        if data is not None:
+            return (data, None)
+        return (None, f"HTTP {status}")
+    except Exception as e:
+        return (None, str(e))
+
+
+async def clear_all() -> Optional[dict]:
+    return await _json("POST", "/api/places/clear")
+
+
+# ---------- Emails ----------
+async def get_emails(place_id: Optional[str] = None, source: Optional[str] = None, per_page: int = 2000, include_place: bool = False) -> Optional[dict]:
+    params = {"per_page": per_page}
+    if place_id:
+        params["place_id"] = place_id
+    if source:
+        params["source"] = source
+    if include_place:
+        params["include_place"] = "1"
+    return await _json("GET", "/api/emails", params=params)
+
+
+async def create_email(place_id: str, email: str, source: str) -> Optional[dict]:
+    return await _json("POST", "/api/emails", ok=(200, 201), json={"place_id": place_id, "email": email, "source": source})
+
+
+async def create_emails_bulk(rows: list) -> Optional[dict]:
+    return await _json("POST", "/api/emails/bulk", ok=(200, 201), json={"emails": rows})
+
+
+async def update_email(email_id: int, data: dict) -> Optional[dict]:
+    return await _json("PATCH", f"/api/emails/{email_id}", json=data)
+
+
+async def delete_email(email_id: int) -> bool:
+    status, _ = await _req("DELETE", f"/api/emails/{email_id}")
+    return status == 200
+
+
+async def bulk_delete_emails(ids: list) -> Optional[dict]:
+    return await _json("POST", "/api/emails/bulk-delete", json={"ids": ids})
+
+
+# ---------- Discovered URLs ----------
+async def get_discovered_urls(
+    status: Optional[str] = None,
+    place_id: Optional[str] = None,
+    url_type: Optional[str] = None,
+    per_page: int = 500,
+    page: Optional[int] = None,
+) -> Optional[dict]:
+    params = {"per_page": per_page}
+    if status:
+        params["status"] = status
+    if place_id:
+        params["place_id"] = place_id
+    if url_type:
+        params["url_type"] = url_type
+    if page:
+        params["page"] = page
+    return await _json("GET", "/api/discovered-urls", params=params)
+
+
+async def claim_discovered_urls(n: int, worker_id: str, lease_seconds: int = 600) -> Optional[list]:
+    data = await _json("POST", "/api/discovered-urls/claim", json={"n": n, "worker_id": worker_id, "lease_seconds": lease_seconds})
+    return None if data is None else (data.get("data") or [])
+
+
+async def create_discovered_url(place_id: str, url: str, url_type: str, found_by_stage: str) -> Optional[dict]:
+    return await _json("POST", "/api/discovered-urls", ok=(200, 201), json={
+        "place_id": place_id, "url": url, "url_type": url_type, "found_by_stage": found_by_stage
+    })
+
+
+async def create_discovered_urls_bulk(rows: list) -> Optional[dict]:
+    return await _json("POST", "/api/discovered-urls/bulk", ok=(200, 201), json={"urls": rows})
+
+
+async def update_discovered_url(id: int, status: str) -> Optional[dict]:
+    return await _json("PATCH", f"/api/discovered-urls/{id}", json={"status": status})
+
+
+async def update_discovered_urls_status_bulk(updates: list) -> Optional[dict]:
+    return await _json("POST", "/api/discovered-urls/bulk-status", json={"updates": updates})
+
+
+# ---------- Health ----------
+async def health_check() -> Optional[dict]:
+    return await _json("GET", "/health", timeout=5)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Adaptive (AIMD) concurrency limiter for API writes.
+
+ทุก stage ในโปรเซสเดียวกันใช้ limiter ตัวเดียว (ผ่าน api_client._req): จำนวน write ที่วิ่งพร้อมกัน
+ค่อยๆ เพิ่มทีละ 1 ต่อรอบ (additive increase) ตราบที่ latency ยังต่ำกว่า target และถูกหารครึ่ง
+(multiplicative decrease) เมื่อเจอ timeout / connection error / 429 / 5xx — throughput จึงวิ่งตาม
+ความสามารถจริงของ Laravel worker แทนการ sleep แบบตั้งค่าด้วยมือ.
+"""
+import time
+import asyncio
+import threading
+from typing import Optional
+
+
+class AdaptiveLimiter:
+    """
+    limit เป็น float: success ที่ latency <= latency_target เพิ่ม 1/limit (≈ +1 ต่อ limit requests),
+    success ที่ช้ากว่า target (หรือตอนที่ใช้ limit ไม่ถึงครึ่ง) ไม่เพิ่ม, overload คูณ backoff
+    (นับเฉพาะ request ที่เริ่มหลังการลดครั้งล่าสุด เพื่อไม่ให้ error ชุดเดียวกันจาก request ที่วิ่ง
+    พร้อมกันหั่น limit ซ้ำหลายรอบ).
+    """
+
+    def __init__(self, enabled: bool = True, initial: int = 2, min_limit: int = 1, max_limit: int = 10,
+                 latency_target: float = 2.0, backoff: float = 0.5):
+        self.enabled = enabled
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.latency_target = latency_target
+        self.backoff = min(0.95, max(0.1, backoff))
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self._inflight = 0
+        self._cond = threading.Condition()
+        # (loop, asyncio.Event) ของ aacquire() ที่รอ slot อยู่ — release() ปลุกข้าม thread
+        self._waiters: set = set()
+        self._last_cut = 0.0
+        self.stats = {"acquired": 0, "waited": 0, "wait_s": 0.0, "increases": 0, "decreases": 0, "peak_inflight": 0}
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """รอจนกว่า in-flight < limit. Returns False ถ้าหมด timeout"""
+        if not self.enabled:
+            return True
+        start = time.monotonic()
+        with self._cond:
+            if self._inflight >= int(self._limit):
+                self.stats["waited"] += 1
+                deadline = None if timeout is None else start + timeout
+                while self._inflight >= int(self._limit):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self.stats["wait_s"] += time.monotonic() - start
+            self._inflight += 1
+            self.stats["acquired"] += 1
+            self.stats["peak_inflight"] = max(self.stats["peak_inflight"], self._inflight)
+        return True
+
+    async def aacquire(self) -> None:
+        """acquire() สำหรับ asyncio: รอ slot บน event loop (ถูกปลุกโดย release) แทนการ poll"""
+        if not self.enabled:
+            return
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = (loop, event)
+        start = None
+        try:
+            while True:
+                with self._cond:
+                    if self._inflight < int(self._limit):
+                        self._inflight += 1
+                        self.stats["acquired"] += 1
+                        self.stats["peak_inflight"] = max(self.stats["peak_inflight"], self._inflight)
+                        if start is not None:
+                            self.stats["wait_s"] += time.monotonic() - start
+                        return
+                    if start is None:
+                        start = time.monotonic()
+                        self.stats["waited"] += 1
+                    # clear ภายใต้ lock: release() ที่เกิดหลังจากนี้จะ set event เสมอ (ไม่มี wakeup หาย)
+                    event.clear()
+                    self._waiters.add(waiter)
+                await event.wait()
+        finally:
+            with self._cond:
+                self._waiters.discard(waiter)
+
+    def release(self, elapsed_s: float, overloaded: bool) -> None:
+        if not self.enabled:
+            return
+        with self._cond:
+            # เพิ่ม limit เฉพาะตอนที่ใช้ limit อยู่จริง (in-flight >= ครึ่งหนึ่ง) — ไม่งั้น limit จะโตไปเรื่อยๆ
+            # ระหว่างที่ caller ส่งน้อยกว่า limit อยู่แล้ว แล้วปล่อย burst ใส่ API ทีหลัง
+            utilized = self._inflight * 2 >= self._limit
+            self._inflight = max(0, self._inflight - 1)
+            if overloaded:
+                now = time.monotonic()
+                # request ที่เริ่มก่อนการลดครั้งล่าสุดถูกส่งภายใต้ limit เดิม — ไม่นับซ้ำ
+                if now - elapsed_s >= self._last_cut:
+                    self._limit = max(float(self.min_limit), self._limit * self.backoff)
+                    self._last_cut = now
+                    self.stats["decreases"] += 1
+            elif utilized and elapsed_s <= self.latency_target and self._limit < self.max_limit:
+                before = int(self._limit)
+                self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+                if int(self._limit) > before:
+                    self.stats["increases"] += 1
+            self._cond.notify_all()
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # loop ปิดไปแล้ว
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return dict(
+                self.stats,
+                wait_s=round(self.stats["wait_s"], 3),
+                enabled=self.enabled,
+                limit=round(self._limit, 2),
+                inflight=self._inflight,
+                min_limit=self.min_limit,
+                max_limit=self.max_limit,
+            )
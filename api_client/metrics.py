@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Client-side instrumentation for api_client: per-endpoint latency histogram,
+status/error counts and bytes, plus a circuit breaker that fails fast while the
+API is overloaded (error rate หรือ p95 latency สูงเกิน threshold).
+
+ใช้ผ่าน api_client (get_metrics / dump_metrics / circuit_state) — โมดูลนี้ไม่รู้จัก HTTP library.
+"""
+import re
+import time
+import threading
+from collections import deque
+from typing import Optional
+
+# Histogram bucket upper bounds (milliseconds); the last bucket is open-ended.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+_ACTION_SEGMENT = re.compile(r"^[a-z][a-z-]{0,23}$")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"API circuit open ({endpoint}); retry in {retry_in:.1f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+def endpoint_key(method: str, path: str) -> str:
+    """'GET /api/places/ChIJ...?x=1' -> 'GET /api/places/{id}' (ids ไม่แตก histogram เป็นพันๆ key)"""
+    path = path.split("?", 1)[0]
+    if "://" in path:
+        path = "/" + path.split("://", 1)[1].partition("/")[2]
+    parts = path.strip("/").split("/")
+    # /api/<resource>/<id|action>/...: keep lowercase action words (claim, bulk-status), mask the rest
+    for i in range(2 if parts[:1] == ["api"] else 1, len(parts)):
+        if not _ACTION_SEGMENT.match(parts[i]):
+            parts[i] = "{id}"
+    return f"{method.upper()} /{'/'.join(parts)}"
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class _EndpointStats:
+    __slots__ = ("count", "errors", "status", "bytes_sent", "bytes_received", "total_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.status: dict = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def quantile(self, q: float) -> float:
+        """ประมาณ quantile จาก histogram (ค่าขอบบนของ bucket)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target and n:
+                bound = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+                return round(min(bound, self.max_ms), 1)
+        return round(self.max_ms, 1)
+
+    def as_dict(self) -> dict:
+        labels = [f"<={b}" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "status": dict(self.status),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency_ms": {
+                "mean": round(self.total_ms / self.count, 1) if self.count else 0.0,
+                "p50": self.quantile(0.50),
+                "p95": self.quantile(0.95),
+                "p99": self.quantile(0.99),
+                "max": round(self.max_ms, 1),
+            },
+            "buckets": {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class ApiMetrics:
+    """Thread-safe per-endpoint counters. record() ถูกเรียกจาก _req ทุกครั้ง (sync และ aio)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: dict = {}
+        self._started = time.time()
+
+    def record(self, endpoint: str, elapsed_s: float, status: Optional[int], error: bool,
+               bytes_sent: int = 0, bytes_received: int = 0) -> None:
+        ms = elapsed_s * 1000.0
+        bucket = len(LATENCY_BUCKETS_MS)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                bucket = i
+                break
+        key = str(status) if status is not None else "exception"
+        with self._lock:
+            st = self._endpoints.get(endpoint)
+            if st is None:
+                st = self._endpoints[endpoint] = _EndpointStats()
+            st.count += 1
+            st.errors += 1 if error else 0
+            st.status[key] = st.status.get(key, 0) + 1
+            st.bytes_sent += bytes_sent
+            st.bytes_received += bytes_received
+            st.total_ms += ms
+            st.max_ms = max(st.max_ms, ms)
+            st.buckets[bucket] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            endpoints = {k: v.as_dict() for k, v in sorted(self._endpoints.items())}
+        totals = {
+            "count": sum(e["count"] for e in endpoints.values()),
+            "errors": sum(e["errors"] for e in endpoints.values()),
+            "bytes_sent": sum(e["bytes_sent"] for e in endpoints.values()),
+            "bytes_received": sum(e["bytes_received"] for e in endpoints.values()),
+        }
+        return {"since": self._started, "uptime_s": round(time.time() - self._started, 1),
+                "totals": totals, "endpoints": endpoints}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+            self._started = time.time()
+
+
+class CircuitBreaker:
+    """
+    closed -> open เมื่อใน window ล่าสุด (window_s วินาที, อย่างน้อย min_calls ครั้ง)
+    error rate >= error_rate หรือ p95 latency >= p95_s.
+    open: ทุก request fail fast (CircuitOpenError) จนครบ cooldown_s
+    half-open: ปล่อย probe ทีละ 1 request — สำเร็จ = closed, ล้มเหลว = open อีกรอบ.
+
+    Error = exception (timeout/connection) หรือ HTTP 5xx; 4xx ไม่นับ (เป็นปัญหาของ request ไม่ใช่ server).
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, enabled: bool = True, window_s: float = 30.0, min_calls: int = 20,
+                 error_rate: float = 0.5, p95_s: float = 20.0, cooldown_s: float = 15.0):
+        self.enabled = enabled
+        self.window_s = window_s
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.p95_s = p95_s
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self._calls: deque = deque()  # (monotonic ts, elapsed_s, error)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_inflight = False
+        self._reason = ""
+        self.trips = 0
+        self.rejected = 0
+
+    def _trim(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window_s:
+            self._calls.popleft()
+
+    def retry_in(self) -> float:
+        """วินาทีที่เหลือก่อนจะลอง probe ได้ (0 = ส่งได้เลย)"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.cooldown_s - (time.monotonic() - self._opened_at))
+
+    def is_open(self) -> bool:
+        """True ถ้า request ถัดไปจะถูกปฏิเสธ (ไม่กิน probe slot ของ half-open)"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if self._state == self.OPEN:
+                return time.monotonic() - self._opened_at < self.cooldown_s
+            return self._state == self.HALF_OPEN and self._probe_inflight
+
+    def before_call(self, endpoint: str) -> None:
+        """เรียกก่อนส่ง request — raise CircuitOpenError ถ้ายังอยู่ในช่วง open"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if self._state == self.OPEN and now - self._opened_at >= self.cooldown_s:
+                self._state = self.HALF_OPEN
+                self._probe_inflight = False
+            if self._state == self.HALF_OPEN and not self._probe_inflight:
+                self._probe_inflight = True
+                return
+            self.rejected += 1
+            retry = max(0.0, self.cooldown_s - (now - self._opened_at))
+        raise CircuitOpenError(endpoint, retry)
+
+    def after_call(self, elapsed_s: float, error: bool) -> None:
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probe_inflight = False
+                if error:
+                    self._trip(now, "probe failed")
+                else:
+                    self._state = self.CLOSED
+                    self._calls.clear()
+                return
+            if self._state == self.OPEN:
+                return
+            self._calls.append((now, elapsed_s, error))
+            self._trim(now)
+            n = len(self._calls)
+            if n < self.min_calls:
+                return
+            errors = sum(1 for c in self._calls if c[2])
+            if self.error_rate > 0 and errors / n >= self.error_rate:
+                self._trip(now, f"error rate {errors}/{n}")
+                return
+            if self.p95_s > 0:
+                p95 = _percentile(sorted(c[1] for c in self._calls), 0.95)
+                if p95 >= self.p95_s:
+                    self._trip(now, f"p95 {p95:.1f}s")
+
+    def cancel_call(self) -> None:
+        """Call ที่ถูกยกเลิกก่อนได้ผล (asyncio cancel): ไม่นับเป็น sample แต่คืน probe slot ของ half-open"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probe_inflight = False
+
+    def _trip(self, now: float, reason: str) -> None:
+        self._state = self.OPEN
+        self._opened_at = now
+        self._reason = reason
+        self._calls.clear()
+        self.trips += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            state = self._state
+            if state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown_s:
+                state = self.HALF_OPEN
+            return {
+                "enabled": self.enabled,
+                "state": state,
+                "reason": self._reason,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "window_calls": len(self._calls),
+            }
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Local write-ahead spool for stage results (SQLite, WAL).
+
+ผลลัพธ์ของ stage (emails, discovered URLs, status) ถูก append ลงไฟล์ก่อน แล้วค่อยถูกส่งขึ้น API
+เป็น batch — ถ้า API ช้า/รีสตาร์ท/โปรเซสตาย ข้อมูลยังอยู่ในไฟล์และถูกส่งต่อในรอบถัดไป.
+
+แต่ละ batch ได้ key (uuid) ตอนถูกจองครั้งแรกและใช้ key เดิมทุกครั้งที่ retry → ส่งเป็น
+Idempotency-Key ให้ API (middleware IdempotentRequest) ทำให้ batch ถูกเขียนครั้งเดียวแม้ response หาย.
+"""
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    batch TEXT,
+    claimed_at REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_spool_kind_batch ON spool (kind, batch, seq);
+"""
+
+
+class Spool:
+    """
+    Append-only queue บน SQLite. หลาย process (worker หลายตัว) ใช้ไฟล์เดียวกันได้:
+    การจอง batch ทำใน BEGIN IMMEDIATE และ batch ที่ถูกจองไว้นานกว่า lease_seconds
+    (shipper ของ process ที่ตายไป) จะถูกส่งใหม่ด้วย key เดิม.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 120.0):
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def append(self, kind: str, item: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO spool (kind, payload, created_at) VALUES (?, ?, ?)",
+                (kind, json.dumps(item, ensure_ascii=False), time.time()),
+            )
+
+    def pending(self, kind: Optional[str] = None) -> int:
+        with self._lock:
+            if kind:
+                return self._conn.execute("SELECT COUNT(*) FROM spool WHERE kind=?", (kind,)).fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def claim_batch(self, kind: str, n: int) -> tuple[Optional[str], list]:
+        """
+        จอง batch ถัดไปของ kind นี้. Batch ที่เคยจองแล้ว (retry / lease หมด) มาก่อน และได้ key เดิม.
+        Returns (batch_key, [item, ...]) หรือ (None, []) ถ้าไม่มีงาน
+        """
+        now = time.time()
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                row = cur.execute(
+                    "SELECT batch FROM spool WHERE kind=? AND batch IS NOT NULL AND claimed_at < ? ORDER BY seq LIMIT 1",
+                    (kind, now - self.lease_seconds),
+                ).fetchone()
+                if row:
+                    batch = row[0]
+                    cur.execute("UPDATE spool SET claimed_at=?, attempts=attempts+1 WHERE batch=?", (now, batch))
+                else:
+                    batch = uuid.uuid4().hex
+                    cur.execute(
+                        """
+                        UPDATE spool SET batch=?, claimed_at=?, attempts=attempts+1
+                        WHERE seq IN (SELECT seq FROM spool WHERE kind=? AND batch IS NULL ORDER BY seq LIMIT ?)
+                        """,
+                        (batch, now, kind, n),
+                    )
+                    if cur.rowcount == 0:
+                        cur.execute("COMMIT")
+                        return None, []
+                items = [json.loads(p) for (p,) in cur.execute(
+                    "SELECT payload FROM spool WHERE batch=? ORDER BY seq", (batch,)
+                )]
+                cur.execute("COMMIT")
+                return batch, items
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+    def ack(self, batch: str) -> None:
+        """Batch ส่งสำเร็จ — ลบออกจาก spool"""
+        with self._lock:
+            self._conn.execute("DELETE FROM spool WHERE batch=?", (batch,))
+
+    def retain(self, batch: str, items: list) -> None:
+        """ลบ rows ของ batch ที่ไม่อยู่ใน items (ส่งสำเร็จแล้ว) — ที่เหลือยัง retry ด้วย key เดิม"""
+        with self._lock:
+            rows = self._conn.execute("SELECT seq, payload FROM spool WHERE batch=?", (batch,)).fetchall()
+            done = [(seq,) for seq, p in rows if json.loads(p) not in items]
+            self._conn.executemany("DELETE FROM spool WHERE seq=?", done)
+
+    def release(self, batch: str) -> None:
+        """Batch ส่งไม่สำเร็จ — ให้ retry ได้ทันทีโดยยังใช้ key เดิม"""
+        with self._lock:
+            self._conn.execute("UPDATE spool SET claimed_at=0 WHERE batch=?", (batch,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
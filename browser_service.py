@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared long-lived browser service (Stage 2 / Stage 3 / Stage 4).
+
+แต่ละ stage รันเป็น subprocess แยกกันและ launch Chromium ของตัวเอง → ทุกรอบของ pipeline เสีย cold start 3 ครั้ง.
+ที่นี่มี process เดียวที่ถือ Chromium ไว้ตลอด และเปิด CDP endpoint (--remote-debugging-port);
+stage ต่อเข้าไปด้วย connect_over_cdp แล้วสร้าง context ของตัวเอง (cookies/cache แยกกัน) บน browser ที่อุ่นอยู่แล้ว.
+ถ้า service ไม่ได้รันหรือต่อไม่ได้ stage จะ launch browser เองเหมือนเดิม.
+browser.close() บน browser ที่ต่อผ่าน CDP แค่ปิด context ของ stage นั้นและ disconnect — Chromium ของ service ยังอยู่.
+
+Service:
+  python browser_service.py --port 9333
+  python browser_service.py --status          # ตรวจว่า service รันอยู่ + จำนวน context/page
+
+Client:
+    import browser_service
+    url = browser_service.resolve(flag)                      # flag จาก --browser-service หรือ env BROWSER_SERVICE
+    browser, shared = browser_service.launch(p, LAUNCH_ARGS, url)           # sync Playwright
+    browser, shared = await browser_service.alaunch(p, LAUNCH_ARGS, url)    # async Playwright
+
+Env:
+  BROWSER_SERVICE        URL ของ service (http://127.0.0.1:9333) หรือ 1 = default URL; ว่าง/0 = launch เอง
+  BROWSER_SERVICE_PORT   port ของ service (default 9333)
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+from typing import Optional
+
+DEFAULT_PORT = 9333
+DEFAULT_HOST = '127.0.0.1'
+
+# Flags ที่ทุก stage ใช้ร่วมกัน — service launch ด้วยชุดนี้ เพื่อให้ stage ที่ต่อเข้ามาได้ browser แบบเดียวกับที่ launch เอง
+LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-gpu',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-web-security',
+    '--disable-features=IsolateOrigins,site-per-process',
+]
+
+_OFF = ('', '0', 'false', 'no', 'off')
+_ON = ('1', 'true', 'yes', 'on')
+
+
+def default_url() -> str:
+    try:
+        port = int(os.getenv('BROWSER_SERVICE_PORT', str(DEFAULT_PORT)))
+    except ValueError:
+        port = DEFAULT_PORT
+    return f'http://{DEFAULT_HOST}:{port}'
+
+
+def resolve(flag: Optional[str] = None) -> Optional[str]:
+    """
+    URL ของ service จาก flag (--browser-service) หรือ env BROWSER_SERVICE; None = ไม่ใช้ service.
+    '1' / 'true' = default URL; 'host:port' ไม่มี scheme จะเติม http:// ให้
+    """
+    value = (flag if flag is not None else os.getenv('BROWSER_SERVICE', '')).strip()
+    if value.lower() in _OFF:
+        return None
+    if value.lower() in _ON:
+        return default_url()
+    return value if '://' in value else f'http://{value}'
+
+
+def version(url: str, timeout: float = 1.0) -> Optional[dict]:
+    """/json/version ของ endpoint (Browser, webSocketDebuggerUrl, ...) — None ถ้าต่อไม่ได้"""
+    import urllib.request  # ไม่ import ตอนโหลด module: stage ที่ไม่ใช้ service ไม่ต้องจ่าย
+    if url.startswith(('ws://', 'wss://')):
+        url = 'http' + url[2:]
+    try:
+        with urllib.request.urlopen(url.rstrip('/') + '/json/version', timeout=timeout) as resp:
+            return json.loads(resp.read().decode('utf-8', 'replace'))
+    except Exception:
+        return None
+
+
+def launch(playwright, args, url: Optional[str] = None, log=None):
+    """
+    Sync Playwright: ต่อ service ที่ url ถ้ารันอยู่ ไม่งั้น launch Chromium เอง.
+    Returns (browser, shared) — shared=True เมื่อเป็น browser ของ service
+    """
+    if url:
+        if version(url):
+            try:
+                browser = playwright.chromium.connect_over_cdp(url)
+                if log:
+                    log(f"[BROWSER] Connected to browser service {url}")
+                return browser, True
+            except Exception as e:
+                if log:
+                    log(f"[BROWSER] Browser service {url} failed ({e}); launching Chromium")
+        elif log:
+            log(f"[BROWSER] Browser service {url} not running; launching Chromium")
+    return playwright.chromium.launch(headless=True, args=args), False
+
+
+async def alaunch(playwright, args, url: Optional[str] = None, log=None):
+    """Async Playwright version of launch()"""
+    if url:
+        if version(url):
+            try:
+                browser = await playwright.chromium.connect_over_cdp(url)
+                if log:
+                    log(f"[BROWSER] Connected to browser service {url}")
+                return browser, True
+            except Exception as e:
+                if log:
+                    log(f"[BROWSER] Browser service {url} failed ({e}); launching Chromium")
+        elif log:
+            log(f"[BROWSER] Browser service {url} not running; launching Chromium")
+    return await playwright.chromium.launch(headless=True, args=args), False
+
+
+def wait_ready(url: str, timeout: float = 30.0) -> bool:
+    """รอจน endpoint ตอบ (ใช้ตอน start service เป็น subprocess)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if version(url, timeout=0.5):
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def status(url: str) -> int:
+    info = version(url)
+    if not info:
+        print(f"[SERVICE] {url} not running")
+        return 1
+    import urllib.request
+    try:
+        with urllib.request.urlopen(url.rstrip('/') + '/json/list', timeout=1.0) as resp:
+            targets = json.loads(resp.read().decode('utf-8', 'replace'))
+    except Exception:
+        targets = []
+    contexts = {t.get('browserContextId') for t in targets if t.get('type') == 'page'}
+    pages = sum(1 for t in targets if t.get('type') == 'page')
+    print(f"[SERVICE] {url} {info.get('Browser', '?')}: {len(contexts)} contexts, {pages} pages")
+    return 0
+
+
+def serve(port: int, host: str = DEFAULT_HOST) -> int:
+    """Launch Chromium ที่เปิด CDP endpoint แล้วถือไว้จนโดน Ctrl+C / SIGTERM หรือ browser ปิด"""
+    from playwright.sync_api import sync_playwright
+
+    url = f'http://{host}:{port}'
+    if version(url):
+        print(f"[SERVICE] Already running at {url}")
+        return 0
+    stop = {'flag': False}
+
+    def _stop(*_):
+        stop['flag'] = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    with sync_playwright() as p:
+        browser = p.chromium.launch(
+            headless=True,
+            args=LAUNCH_ARGS + [f'--remote-debugging-port={port}', f'--remote-debugging-address={host}'],
+        )
+        if not wait_ready(url, timeout=15):
+            print(f"[SERVICE] Chromium started but {url} is not reachable")
+            browser.close()
+            return 1
+        print(f"[SERVICE] Browser service ready: {url} ({browser.version})", flush=True)
+        print("[SERVICE] Stages: --browser-service or BROWSER_SERVICE=1 (Ctrl+C to stop)", flush=True)
+        try:
+            while not stop['flag'] and browser.is_connected():
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        if browser.is_connected():
+            browser.close()
+    print("[SERVICE] Stopped")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared Chromium for Stage 2 / 3 / 4 (CDP endpoint)')
+    parser.add_argument('--port', type=int, default=int(os.getenv('BROWSER_SERVICE_PORT', str(DEFAULT_PORT))),
+                        help='CDP port (default 9333)')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='bind address (default 127.0.0.1)')
+    parser.add_argument('--status', action='store_true', help='ตรวจว่า service รันอยู่หรือไม่')
+    args = parser.parse_args()
+    if args.status:
+        return status(f'http://{args.host}:{args.port}')
+    return serve(args.port, args.host)
+
+
+if __name__ == '__main__':
+    if sys.platform == 'win32':
+        try:
+            sys.stdout.reconfigure(encoding='utf-8')
+        except Exception:
+            pass
+    sys.exit(main())
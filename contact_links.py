@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Link-guided contact page discovery (Stage 2 Phase 3).
+
+แทนการเดา /contact, /contact-us, /about, /about-us (404 บ่อย และพลาดหน้าจริงของเว็บไทยที่ใช้ path อื่น
+หรือ anchor "ติดต่อเรา" / "เกี่ยวกับเรา") ให้จัดอันดับลิงก์ของ homepage เอง:
+  - anchor text / title / aria-label / alt ของรูปในลิงก์ (ไทย + อังกฤษ)
+  - path ของลิงก์ (รวม path ภาษาไทยที่ถูก percent-encode)
+  - ถ้า homepage ไม่มีลิงก์ที่น่าจะใช่ → sitemap.xml
+ลิงก์ mailto: บน homepage ไม่ต้องตามต่อ — extract_emails ได้อีเมลจาก homepage ไปแล้ว.
+
+    rank_links(html, base_url)            # [(score, url, label), ...] มาก → น้อย
+    sitemap_links(xml, base_url)          # [(score, url, 'sitemap'), ...]
+"""
+import re
+from typing import Optional
+from urllib.parse import urljoin, urlsplit, unquote
+
+import lxml.html
+
+from interception import site_of
+
+# (keyword, weight) — ตรวจกับ anchor text ตัวพิมพ์เล็ก; ใช้ weight สูงสุดที่เจอ
+TEXT_KEYWORDS = (
+    ('ช่องทางการติดต่อ', 10), ('ติดต่อเรา', 10), ('contact us', 10), ('ติดต่อ', 9), ('contact', 9),
+    ('get in touch', 8), ('reach us', 7), ('อีเมล', 7), ('e-mail', 7), ('email', 7),
+    ('สอบถาม', 6), ('enquiry', 6), ('inquiry', 6),
+    ('เกี่ยวกับเรา', 6), ('about us', 6), ('เกี่ยวกับ', 5), ('about', 5), ('who we are', 5),
+    ('find us', 4), ('แผนที่', 3), ('location', 3), ('ข้อมูลบริษัท', 4), ('company', 3),
+    ('profile', 2), ('support', 2), ('สาขา', 2),
+)
+PATH_KEYWORDS = (
+    ('contact', 6), ('ติดต่อ', 6), ('kontakt', 5), ('about', 4), ('เกี่ยวกับ', 4),
+    ('inquiry', 3), ('enquiry', 3), ('company', 2), ('profile', 2), ('location', 2), ('support', 2),
+)
+_SKIP_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.zip', '.rar',
+                    '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.mp4', '.mp3')
+_SKIP_SCHEMES = ('mailto:', 'tel:', 'javascript:', 'sms:', 'line:', 'whatsapp:', 'data:')
+_LOC_RE = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>', re.IGNORECASE)
+
+
+def _key(url: str) -> str:
+    """URL สำหรับ dedupe: ไม่สน fragment, scheme, www. และ '/' ท้าย"""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return host + parts.path.rstrip('/') + ('?' + parts.query if parts.query else '')
+
+
+def _keyword_score(text: str, keywords) -> int:
+    return max((weight for word, weight in keywords if word in text), default=0)
+
+
+def score_path(url: str) -> float:
+    """คะแนนจาก path อย่างเดียว (ใช้กับ sitemap และเป็นส่วนหนึ่งของคะแนนลิงก์)"""
+    parts = urlsplit(url)
+    path = unquote(parts.path).lower()
+    if path.endswith(_SKIP_EXTENSIONS):
+        return 0
+    score = _keyword_score(path, PATH_KEYWORDS)
+    if not score:
+        return 0
+    depth = len([seg for seg in path.split('/') if seg])
+    score -= 0.5 * max(0, depth - 1)
+    if parts.query:
+        score -= 1
+    return max(score, 0.1)
+
+
+def _usable(url: str, base_url: str, base_site: str) -> bool:
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        return False
+    if site_of((parts.hostname or '').lower()) != base_site:
+        return False
+    return _key(url) != _key(base_url) and not unquote(parts.path).lower().endswith(_SKIP_EXTENSIONS)
+
+
+def rank_links(html: str, base_url: str, limit: Optional[int] = None) -> list:
+    """
+    จัดอันดับลิงก์ใน homepage ที่น่าจะเป็นหน้าติดต่อ/เกี่ยวกับเรา (เฉพาะ site เดียวกัน, ไม่ซ้ำ).
+    Returns [(score, url, label), ...] เรียงจากคะแนนมากไปน้อย (เท่ากัน = ลำดับในหน้า)
+    """
+    if not html:
+        return []
+    try:
+        doc = lxml.html.document_fromstring(html)
+    except Exception:
+        return []
+    base_href = doc.xpath('string(//base/@href)').strip()
+    base = urljoin(base_url, base_href) if base_href else base_url
+    base_site = site_of((urlsplit(base_url).hostname or '').lower())
+    best = {}
+    for order, anchor in enumerate(doc.xpath('//a[@href]')):
+        href = (anchor.get('href') or '').strip()
+        if not href or href.startswith('#') or href.lower().startswith(_SKIP_SCHEMES):
+            continue
+        url = urljoin(base, href).split('#', 1)[0]
+        if not _usable(url, base_url, base_site):
+            continue
+        label = ' '.join(anchor.text_content().split())
+        text = ' '.join([label, anchor.get('title') or '', anchor.get('aria-label') or '',
+                         ' '.join(anchor.xpath('.//img/@alt'))]).lower()
+        text_score = _keyword_score(text, TEXT_KEYWORDS)
+        path_score = score_path(url)
+        if not (text_score or path_score):
+            continue
+        score = text_score + path_score
+        key = _key(url)
+        if key not in best or score > best[key][0]:
+            best[key] = (score, order if key not in best else best[key][1], url, label[:40] or 'link')
+    ranked = sorted(best.values(), key=lambda item: (-item[0], item[1]))
+    return [(score, url, label) for score, _, url, label in ranked][:limit]
+
+
+def sitemap_links(xml: str, base_url: str, limit: Optional[int] = None) -> list:
+    """หน้าที่น่าจะเป็นหน้าติดต่อจาก sitemap.xml (ให้คะแนนจาก path). Returns [(score, url, 'sitemap'), ...]"""
+    if not xml:
+        return []
+    base_site = site_of((urlsplit(base_url).hostname or '').lower())
+    best = {}
+    for order, loc in enumerate(_LOC_RE.findall(xml)):
+        url = loc.replace('&amp;', '&')
+        if url.lower().endswith('.xml') or not _usable(url, base_url, base_site):
+            continue
+        score = score_path(url)
+        if score and _key(url) not in best:
+            best[_key(url)] = (score, order, url)
+    ranked = sorted(best.values(), key=lambda item: (-item[0], item[1]))
+    return [(score, url, 'sitemap') for score, _, url in ranked][:limit]
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent crawl result cache (SQLite, WAL) shared by Stage 2 / Stage 4 across places and runs.
+
+ร้าน chain/แฟรนไชส์จาก gosom มักใช้ website เดียวกัน และทุก run ต้อง crawl เว็บของทุก place ที่เป็น NEW ใหม่หมด.
+ผล crawl (อีเมล + Facebook URLs ที่เจอ) ถูกเก็บตาม URL ที่ normalize แล้ว:
+  - kind 'site': ผลของ Stage 2 crawl_website (homepage → contact → about)
+  - kind 'page': ผลของ Stage 4 scrape_website_url (หน้าเดียว)
+ผลที่ไม่เจออีเมลถูกเก็บเป็น negative entry ที่หมดอายุเร็วกว่า; เว็บที่โหลดไม่ได้เลยไม่ถูก cache.
+
+ตาราง page_validators เก็บ ETag / Last-Modified / content hash + HTML (zlib) + ผล extract ต่อ URL
+ให้ TieredFetcher ส่ง conditional GET และข้ามการ extract เมื่อหน้าไม่เปลี่ยน (หลัง cache ข้างบนหมดอายุ).
+
+    cache = CrawlCache.from_env()
+    hit = cache.get('site', url)        # CacheEntry หรือ None
+    cache.put('site', url, emails, facebook_urls)
+
+Env:
+  CRAWL_CACHE               0 = ปิด (default 1)
+  CRAWL_CACHE_PATH          ไฟล์ SQLite (default crawl_cache.db)
+  CRAWL_CACHE_TTL_DAYS      อายุของผลที่เจออีเมล (default 30)
+  CRAWL_CACHE_NEGATIVE_HOURS อายุของผลที่ไม่เจออีเมล (default 24)
+  CRAWL_VALIDATORS_DAYS     อายุของ validators ต่อ URL (default 90, 0 = ปิด conditional re-crawl)
+"""
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_cache (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    emails TEXT NOT NULL,
+    facebook_urls TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS idx_crawl_cache_expires ON crawl_cache (expires_at);
+CREATE TABLE IF NOT EXISTS page_validators (
+    key TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    digest TEXT NOT NULL,
+    html BLOB NOT NULL,
+    extractor TEXT NOT NULL,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Tracking params ที่ตัดออกจาก cache key: ตรงทั้งชื่อ / ขึ้นต้นด้วย prefix (ไม่ใช่ 'ref*' ทั้งหมด — reference, refid เป็นค่าจริง)
+_TRACKING_PARAMS = frozenset(('ref', 'fbclid', 'gclid', 'igshid'))
+_TRACKING_PREFIXES = ('utm_', 'mc_')
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def normalize_url(url: str) -> str:
+    """
+    Cache key ของ URL: ไม่สน scheme/www./port ปกติ/fragment/tracking params/ '/' ท้าย path
+    'https://www.Shop.co.th/?utm_source=gmb' → 'shop.co.th'
+    """
+    url = (url or '').strip()
+    if '://' not in url:
+        url = 'https://' + url
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower().rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/')
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k.lower() not in _TRACKING_PARAMS and not k.lower().startswith(_TRACKING_PREFIXES)]
+    return host + path + ('?' + urlencode(sorted(query)) if query else '')
+
+
+class CacheEntry(NamedTuple):
+    emails: list
+    facebook_urls: list
+    fetched_at: float
+
+    @property
+    def negative(self) -> bool:
+        return not self.emails
+
+    @property
+    def age_hours(self) -> float:
+        return (time.time() - self.fetched_at) / 3600
+
+
+class PageValidators(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    digest: str
+    html: str
+    extractor: str
+    data: list
+
+
+class CrawlCache:
+    """
+    ttl / negative_ttl เป็นวินาที. หลาย process (Stage 2 workers, Stage 4) ใช้ไฟล์เดียวกันได้ (WAL).
+    enabled=False → get() คืน None เสมอและ put() ไม่ทำอะไร (ไม่เปิดไฟล์)
+    """
+
+    def __init__(self, path: str = 'crawl_cache.db', ttl: float = 30 * 86400, negative_ttl: float = 86400,
+                 enabled: bool = True, validators_ttl: float = 90 * 86400):
+        self.path = str(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.validators_ttl = validators_ttl
+        self.enabled = enabled
+        self.stats = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'stored': 0}
+        self._lock = threading.Lock()
+        self._conn = None
+        if not enabled:
+            return
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute("DELETE FROM crawl_cache WHERE expires_at < ?", (time.time(),))
+        self._conn.execute("DELETE FROM page_validators WHERE expires_at < ?", (time.time(),))
+
+    @classmethod
+    def from_env(cls) -> 'CrawlCache':
+        enabled = os.getenv('CRAWL_CACHE', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+        return cls(
+            path=os.getenv('CRAWL_CACHE_PATH', 'crawl_cache.db'),
+            ttl=_env_float('CRAWL_CACHE_TTL_DAYS', 30) * 86400,
+            negative_ttl=_env_float('CRAWL_CACHE_NEGATIVE_HOURS', 24) * 3600,
+            enabled=enabled,
+            validators_ttl=_env_float('CRAWL_VALIDATORS_DAYS', 90) * 86400,
+        )
+
+    def get(self, kind: str, url: str, count_miss: bool = True) -> Optional[CacheEntry]:
+        """count_miss=False: lookup ล่วงหน้า (Stage 2 browserless pass) ที่ miss แล้วจะมี get() จริงตามมา"""
+        if not self._conn:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT emails, facebook_urls, fetched_at FROM crawl_cache WHERE kind=? AND key=? AND expires_at >= ?",
+                (kind, normalize_url(url), time.time()),
+            ).fetchone()
+            if not row:
+                if count_miss:
+                    self.stats['misses'] += 1
+                return None
+            entry = CacheEntry(json.loads(row[0]), json.loads(row[1]), row[2])
+            self.stats['negative_hits' if entry.negative else 'hits'] += 1
+            return entry
+
+    def put(self, kind: str, url: str, emails: list, facebook_urls: Optional[list] = None) -> None:
+        if not self._conn:
+            return
+        now = time.time()
+        ttl = self.ttl if emails else self.negative_ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO crawl_cache (kind, key, emails, facebook_urls, fetched_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, normalize_url(url), json.dumps(list(emails), ensure_ascii=False),
+                 json.dumps(list(facebook_urls or []), ensure_ascii=False), now, now + ttl),
+            )
+            self.stats['stored'] += 1
+
+    # ----- per-URL validators (conditional re-crawl) -----
+    @property
+    def validators_enabled(self) -> bool:
+        return self._conn is not None and self.validators_ttl > 0
+
+    def get_validators(self, url: str) -> Optional[PageValidators]:
+        if not self.validators_enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, digest, html, extractor, data FROM page_validators WHERE key=? AND expires_at >= ?",
+                (normalize_url(url), time.time()),
+            ).fetchone()
+        if not row:
+            return None
+        try:
+            html = zlib.decompress(row[3]).decode('utf-8', errors='replace')
+        except zlib.error:
+            return None
+        return PageValidators(row[0], row[1], row[2], html, row[4], json.loads(row[5]))
+
+    def put_validators(self, url: str, etag: Optional[str], last_modified: Optional[str], digest: str,
+                       html: str, extractor: str, data: list) -> None:
+        if not self.validators_enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO page_validators "
+                "(key, etag, last_modified, digest, html, extractor, data, fetched_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (normalize_url(url), etag, last_modified, digest, zlib.compress(html.encode('utf-8'), 6), extractor,
+                 json.dumps(list(data or []), ensure_ascii=False), now, now + self.validators_ttl),
+            )
+
+    def touch_validators(self, url: str) -> None:
+        """หน้าไม่เปลี่ยน (304 / hash เท่าเดิม) — ต่ออายุ entry"""
+        if not self.validators_enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE page_validators SET fetched_at=?, expires_at=? WHERE key=?",
+                               (now, now + self.validators_ttl, normalize_url(url)))
+
+    def summary(self) -> str:
+        if not self.enabled:
+            return '[CACHE] crawl cache disabled'
+        s = self.stats
+        lookups = s['hits'] + s['negative_hits'] + s['misses']
+        if not lookups:
+            return '[CACHE] no lookups'
+        reused = s['hits'] + s['negative_hits']
+        return (f"[CACHE] {reused}/{lookups} crawls reused ({reused / lookups * 100:.0f}%): "
+                f"{s['hits']} with emails, {s['negative_hits']} negative | {s['stored']} stored")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Shared email extraction for Stage 2 / Stage 3 / Stage 4.
+
+เดิมแต่ละ stage มี regex ของตัวเอง, parse HTML ทั้งหน้าด้วย BeautifulSoup, รัน regex ทั้งบน text
+และ raw HTML แล้ว validate ทุก candidate (ซ้ำกันก็ validate ซ้ำ). ที่นี่:
+  - pattern ถูก compile ครั้งเดียวตอน import
+  - สแกน raw HTML รอบเดียว (ครอบคลุม text, mailto: และ script); สร้าง text (ตัด tag ด้วย regex,
+    ไม่สร้าง soup) เฉพาะหน้าที่มี email แบบ entity (&#64;), ถูก tag คั่น หรือเขียนแบบ "[at] / [dot]" (ดู scan_plan)
+  - dedupe candidate ก่อน validate และ cache ผล validate (LRU) ข้ามหน้า/ข้าม record
+
+    from email_extract import extract_emails, normalize_email
+    extract_emails(html)                          # ['info@example.com', ...] ตามลำดับในหน้า
+    extract_emails(html, exclude=('facebook',))   # ตัดอีเมลที่มีคำเหล่านี้
+
+Env:
+  EMAIL_CACHE_SIZE  จำนวนผล validate ที่ cache ไว้ (default 65536)
+"""
+import os
+import re
+import html as _html
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from email_validator import validate_email, EmailNotValidError
+
+EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+ENCODED_EMAIL_RE = re.compile(
+    r'\b[A-Za-z0-9._%+-]+\s*[\[\(]?\s*at\s*[\]\)]?\s*[A-Za-z0-9.-]+\s*[\[\(]?\s*dot\s*[\]\)]?\s*[A-Za-z]{2,}\b',
+    re.IGNORECASE,
+)
+_DECODE_AT_RE = re.compile(r'\s*[\[\(]?\s*at\s*[\]\)]?\s*')
+_DECODE_DOT_RE = re.compile(r'\s*[\[\(]?\s*dot\s*[\]\)]?\s*')
+
+# อีเมลที่เห็นใน text แต่ไม่อยู่ติดกันใน raw HTML: &#64; / &#x40; / &commat; หรือ tag คั่นรอบ @
+_TEXT_ONLY_HINT = re.compile(r'&(?:#0*64|#x0*40|commat);|@\s*<|>\s*@', re.IGNORECASE)
+# "at" แล้วตามด้วย "dot" ที่มีวงเล็บหรือเว้นวรรคคั่น (user [at] shop [dot] com, info (at) shop (dot) com)
+# — หน้าที่ไม่มีรูปนี้ข้าม html_text + ENCODED_EMAIL_RE ได้เลย. แค่ "dot" เจอแทบทุกหน้า (dotnet, anecdote, JS)
+_ENCODED_HINT = re.compile(r'[\[\(\s]at[\]\)\s][^<]{0,80}?[\[\(\s]dot[\]\)\s]', re.IGNORECASE)
+_NON_TEXT_RE = re.compile(r'<(script|style|noscript)\b.*?</\1\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]*>')
+
+
+def _cache_size() -> int:
+    try:
+        return max(0, int(os.getenv('EMAIL_CACHE_SIZE', '65536')))
+    except ValueError:
+        return 65536
+
+
+@lru_cache(maxsize=_cache_size())
+def normalize_email(email: str) -> Optional[str]:
+    """Validate (syntax only) และ normalize email. ผลถูก cache — เรียกซ้ำด้วยค่าเดิมไม่ validate ใหม่"""
+    try:
+        return validate_email(email, check_deliverability=False).normalized
+    except EmailNotValidError:
+        return None
+
+
+def decode_email(text: str) -> str:
+    """แปลง encoded email: 'info [at] example [dot] com' → 'info@example.com'"""
+    decoded = text.lower()
+    decoded = _DECODE_AT_RE.sub('@', decoded)
+    decoded = _DECODE_DOT_RE.sub('.', decoded)
+    return decoded.strip()
+
+
+def html_text(html: str) -> str:
+    """Visible text แบบเร็ว (ไม่สร้าง DOM): ตัด script/style/comment และ tag แล้ว decode entity"""
+    text = _TAG_RE.sub('', _NON_TEXT_RE.sub('', html))
+    return _html.unescape(text) if '&' in text else text
+
+
+def scan_plan(html: str) -> tuple[bool, bool]:
+    """(need_text, encoded): หน้านี้ต้องสร้าง text เพื่อหา email แบบ entity/ถูก tag คั่น และ/หรือแบบ at/dot ไหม"""
+    return _TEXT_ONLY_HINT.search(html) is not None, _ENCODED_HINT.search(html) is not None
+
+
+def find_candidates(html: str) -> list:
+    """Candidate emails (lowercase, ไม่ซ้ำ, ตามลำดับที่เจอ) ก่อน validate"""
+    if not html:
+        return []
+    seen = {}
+    if '@' in html:
+        for email in EMAIL_RE.findall(html):
+            seen.setdefault(email.lower(), None)
+    need_text, encoded = scan_plan(html)
+    if need_text or encoded:
+        text = html_text(html)
+        if need_text:
+            for email in EMAIL_RE.findall(text):
+                seen.setdefault(email.lower(), None)
+        if encoded:
+            for match in ENCODED_EMAIL_RE.findall(text):
+                seen.setdefault(decode_email(match), None)
+    return [email.strip() for email in seen]
+
+
+def extract_emails(html: str, exclude: Iterable[str] = ()) -> list:
+    """Validated, normalized emails จาก HTML (ตามลำดับในหน้า). exclude: ตัดอีเมลที่มี substring เหล่านี้"""
+    exclude = tuple(exclude)
+    result = {}
+    for email in find_candidates(html):
+        if exclude and any(word in email for word in exclude):
+            continue
+        normalized = normalize_email(email)
+        if normalized:
+            result.setdefault(normalized, None)
+    return list(result)
+
+
+def cache_info():
+    """สถิติ LRU ของ normalize_email (hits, misses, maxsize, currsize)"""
+    return normalize_email.cache_info()
@@ -3,14 +3,27 @@
 """
 Facebook Playwright Scraper - FAST VERSION
 ใช้ Playwright scrape Facebook โดยไม่ต้อง login (เร็วกว่า Selenium 3.3 เท่า)
+
+Incremental: แต่ละ place เก็บ fb_status (DONE / NO_EMAIL / FAILED) + fb_scraped_at
+แต่ละ run จะ scrape เฉพาะหน้าที่ยังไม่เคย scrape, เก่ากว่า FB_RESCRAPE_DAYS (default 30)
+หรือ FAILED เก่ากว่า FB_RETRY_HOURS (default 24). --all = scrape ทุกหน้าเหมือนเดิม
 """
 
+import os
 import sys
+import asyncio
 import argparse
 import sqlite3
 import re
 import time
+import threading
+from datetime import datetime, timedelta, timezone
 from playwright.sync_api import sync_playwright
+import fb_extract
+import browser_service
+from host_scheduler import FACEBOOK, FB_DEFAULT_RATE, FB_DEFAULT_RATE_MAX, HostScheduler, facebook_pool_budget
+from interception import InterceptionPolicy
+from page_readiness import PageReadiness
 
 # Fix Windows console encoding
 if sys.platform == 'win32':
@@ -21,10 +34,16 @@ if sys.platform == 'win32':
 
 
 class FacebookPlaywrightScraper:
-    def __init__(self, db_path='pipeline.db', verbose=True, use_api=False):
+    def __init__(self, db_path='pipeline.db', verbose=True, use_api=False, rescrape_all=False,
+                 browser_service_url=None):
         """Initialize scraper"""
-        import os
         self.db_path = db_path
+        self.rescrape_all = rescrape_all
+        try:
+            self.rescrape_days = float(os.getenv('FB_RESCRAPE_DAYS', '30'))
+            self.retry_hours = float(os.getenv('FB_RETRY_HOURS', '24'))
+        except ValueError:
+            self.rescrape_days, self.retry_hours = 30.0, 24.0
         self.verbose = verbose
         self.use_api = use_api or bool(os.environ.get('CHECKIN_API_URL') or os.environ.get('API_BASE_URL'))
         self._api = None
@@ -36,20 +55,31 @@ class FacebookPlaywrightScraper:
         # Database
         self.conn = None
         self.cursor = None
+        # Buffered API writer, spool-backed (created in run() when using API)
+        self._writer = None
         
-        # Regex patterns
-        self.email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        self.phone_pattern = r'\b(?:0\d{1,2}[\s-]?\d{3}[\s-]?\d{4}|\+66[\s-]?\d{1,2}[\s-]?\d{3}[\s-]?\d{4})\b'
         # Website URL pattern (NOT Facebook)
         self.website_pattern = r'https?://(?!(?:www\.|m\.|mobile\.)?facebook\.com)[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}[^\s\"\'>]*'
         
+        # About page readiness: email in DOM / page quiet / 5 s cap แทนการรอ 2.5 s ตายตัว
+        self.ready = PageReadiness(cap_ms=5000, min_ms=1000, fixed_ms=2500)
+        # facebook.com budget (FB_RATE / FB_CONCURRENCY) แทน sleep 0.5 s ระหว่างหน้า
+        self.scheduler = HostScheduler.from_env()
+        # Request blocking + bandwidth accounting (shared with Stage 2 / Stage 4)
+        self.intercept = InterceptionPolicy.from_env()
+        # Shared long-lived Chromium (browser_service.py) when running; otherwise launch our own
+        self.browser_service_url = browser_service.resolve(browser_service_url)
+        
         # Stats
         self.stats = {
             'total': 0,
             'success': 0,
             'emails_found': 0,
-            'phones_found': 0
+            'phones_found': 0,
+            'failed': 0
         }
+        # record_result ถูกเรียกจากหลาย thread พร้อมกันใน run_pool (API mode)
+        self._stats_lock = threading.Lock()
     
     def log(self, message):
         """Print log message"""
@@ -69,24 +99,69 @@ class FacebookPlaywrightScraper:
         self.cursor = self.conn.cursor()
         self.log(f"[DB] Connected: {self.db_path}")
     
+    def _due_cutoffs(self):
+        """(rescrape ก่อนเวลานี้, retry FAILED ก่อนเวลานี้) เป็น UTC datetime"""
+        now = datetime.now(timezone.utc)
+        return now - timedelta(days=self.rescrape_days), now - timedelta(hours=self.retry_hours)
+
     def get_facebook_urls(self):
-        """Get Facebook URLs from places (DB or API)"""
+        """
+        Facebook pages ที่ต้อง scrape (DB or API). Returns (rows, total):
+        rows เป็น iterable ของ (place_id, name, website) — API ใช้ PageIterator (filter ฝั่ง server, ทีละหน้า)
+        """
+        due, retry = self._due_cutoffs()
         if self.use_api and self._api:
-            r = self._api.get_places(per_page=2000)
-            data = (r or {}).get('data') or []
-            results = [(p.get('place_id'), p.get('name', ''), p.get('website') or '') for p in data if 'facebook.com' in (p.get('website') or '')]
-            self.log(f"[DB] Found {len(results)} Facebook pages (API)")
-            return results
+            filters = {} if self.rescrape_all else {'fb_due_before': due.isoformat(), 'fb_retry_before': retry.isoformat()}
+            rows = self._api.iter_places(
+                per_page=500, facebook=True,
+                transform=lambda p: (p.get('place_id'), p.get('name', ''), p.get('website') or ''),
+                **filters,
+            )
+            total = rows.total
+            self.log(f"[DB] Found {total if total is not None else '?'} Facebook pages to scrape (API)")
+            return rows, total
         query = """
             SELECT place_id, name, website 
             FROM places 
-            WHERE website LIKE '%facebook.com%'
-            ORDER BY name
+            WHERE (website LIKE '%facebook.com%' OR website LIKE '%fb.com/%')
+        """
+        due_clause = """
+              AND (fb_scraped_at IS NULL OR fb_scraped_at < ?
+                   OR (fb_status = 'FAILED' AND fb_scraped_at < ?))
         """
-        self.cursor.execute(query)
+        try:
+            if self.rescrape_all:
+                self.cursor.execute(query + " ORDER BY place_id")
+            else:
+                self.cursor.execute(query + due_clause + " ORDER BY place_id",
+                                    (int(due.timestamp()), int(retry.timestamp())))
+        except sqlite3.OperationalError as e:
+            # fb_status / fb_scraped_at ยังไม่มี (ยังไม่ได้รัน migration 0004)
+            self.log(f"[WARNING] {e} — run scripts/run_migrations.py; scraping all Facebook pages")
+            self.cursor.execute(query + " ORDER BY place_id")
         results = self.cursor.fetchall()
-        self.log(f"[DB] Found {len(results)} Facebook pages")
-        return results
+        self.log(f"[DB] Found {len(results)} Facebook pages to scrape")
+        return results, len(results)
+
+    def save_fb_status(self, place_id, fb_status):
+        """บันทึกผล scrape ของ place (DONE / NO_EMAIL / FAILED) + เวลา เพื่อให้ run ถัดไปข้ามได้"""
+        if self.use_api and self._api:
+            try:
+                if self._writer:
+                    self._writer.set_place_fb_status(place_id, fb_status)
+                else:
+                    self._api.update_place(place_id, {'fb_status': fb_status})
+            except Exception as e:
+                self.log(f"   [WARNING] Save fb_status error: {e}")
+            return
+        try:
+            self.cursor.execute("""
+                UPDATE places SET fb_status = ?, fb_scraped_at = strftime('%s', 'now')
+                WHERE place_id = ?
+            """, (fb_status, place_id))
+            self.conn.commit()
+        except sqlite3.OperationalError:
+            pass
     
     def save_email(self, place_id, email):
         """Save email to database or API"""
@@ -94,7 +169,10 @@ class FacebookPlaywrightScraper:
             return
         if self.use_api and self._api:
             try:
-                self._api.create_email(place_id, email, 'FACEBOOK_PLAYWRIGHT')
+                if self._writer:
+                    self._writer.add_email(place_id, email, 'FACEBOOK_PLAYWRIGHT')
+                else:
+                    self._api.create_email(place_id, email, 'FACEBOOK_PLAYWRIGHT')
                 self.log(f"   [SAVE] {email}")
             except Exception as e:
                 self.log(f"   [ERROR] Save failed: {e}")
@@ -135,7 +213,10 @@ class FacebookPlaywrightScraper:
         """บันทึก discovered URL ลง database หรือ API"""
         if self.use_api and self._api:
             try:
-                self._api.create_discovered_url(place_id, url, url_type, 'STAGE3')
+                if self._writer:
+                    self._writer.add_discovered_url(place_id, url, url_type, 'STAGE3')
+                else:
+                    self._api.create_discovered_url(place_id, url, url_type, 'STAGE3')
                 return True
             except Exception as e:
                 self.log(f"   [WARNING] Save discovered URL error: {e}")
@@ -153,7 +234,10 @@ class FacebookPlaywrightScraper:
             return False
     
     def close_db(self):
-        """Close database (no-op when using API)"""
+        """Close database (no-op when using API; flushes buffered API writes)"""
+        if self._writer:
+            self._writer.close()
+            self._writer = None
         if self.use_api:
             return
         if self.conn:
@@ -163,21 +247,12 @@ class FacebookPlaywrightScraper:
     # ==================== Scraping ====================
     
     def extract_data(self, html):
-        """Extract email and phone from HTML"""
-        data = {'email': None, 'phone': None}
-        
-        # Find emails
-        emails = re.findall(self.email_pattern, html)
-        emails = [e for e in emails if 'facebook' not in e.lower() and 'fb.com' not in e.lower()]
-        if emails:
-            data['email'] = emails[0]
-        
-        # Find phones
-        phones = re.findall(self.phone_pattern, html)
-        if phones:
-            data['phone'] = phones[0]
-        
-        return data
+        """Extract email and phone from HTML (contact links / About fields ก่อน, ไม่สแกน JS ทั้งหน้า)"""
+        contacts = fb_extract.extract_contacts(html)
+        return {
+            'email': contacts.emails[0] if contacts.emails else None,
+            'phone': contacts.phones[0] if contacts.phones else None,
+        }
     
     def _facebook_about_url(self, fb_url):
         """ไปที่หน้า About ของ Facebook (มีอีเมล/เบอร์อยู่ที่แท็บ About)"""
@@ -193,108 +268,203 @@ class FacebookPlaywrightScraper:
             self.log(f"   [SCRAPE] {about_url}")
             
             # Navigate to About page (email/phone อยู่ที่แท็บ About)
-            page.goto(about_url, wait_until='domcontentloaded', timeout=12000)
-            page.wait_for_timeout(2500)  # รอให้ About โหลด
-            
-            # Get content
-            html = page.content()
-            data = self.extract_data(html)
-            
-            # 🔗 NEW: Find and save Website URLs
-            website_urls = self.find_website_urls(html)
-            if website_urls:
-                self.log(f"   [FOUND] {len(website_urls)} Website URL(s) → saving to discovered_urls")
-                for web_url in website_urls[:5]:  # Save max 5 URLs
-                    self.save_discovered_url(place_id, web_url, 'WEBSITE')
-            
-            return data
+            with self.scheduler.slot(about_url):
+                page.goto(about_url, wait_until='domcontentloaded', timeout=12000)
+                reason = self.ready.wait(page, about_url)  # รอให้ About โหลด
+                
+                # Get content
+                html = page.content()
+            self.log(f"   [READY] {reason}")
+            return self.process_html(html, place_id)
             
         except Exception as e:
             self.log(f"   [ERROR] {e}")
-            return {'email': None, 'phone': None}
+            return {'email': None, 'phone': None, 'error': str(e)}
     
-    # ==================== Main ====================
+    async def scrape_page_async(self, page, fb_url, place_id):
+        """scrape_page บน page ของ context ใน pool (async Playwright)"""
+        try:
+            about_url = self._facebook_about_url(fb_url)
+            self.log(f"   [SCRAPE] {about_url}")
+            async with self.scheduler.aslot(about_url):
+                await page.goto(about_url, wait_until='domcontentloaded', timeout=12000)
+                reason = await self.ready.await_ready(page, about_url)
+                html = await page.content()
+            self.log(f"   [READY] {reason}")
+            return await self.blocking_async(self.process_html, html, place_id)
+        except Exception as e:
+            self.log(f"   [ERROR] {e}")
+            return {'email': None, 'phone': None, 'error': str(e)}
     
-    def run(self):
-        """Main execution"""
-        print("="*70)
-        print("[START] Facebook Playwright Scraper (FAST) 🚀")
-        print("="*70)
-        
-        # Connect DB
-        self.connect_db()
-        
-        # Get URLs
-        fb_urls = self.get_facebook_urls()
-        if not fb_urls:
-            print("[INFO] No Facebook pages found")
-            return
+    async def blocking_async(self, fn, *args):
+        """DB/API call จาก worker ของ pool. API mode: รันใน thread — writer flush เป็น HTTP แบบ sync
+        และ round-trip เดียวจะหยุดทุก context ถ้ารันบน loop. SQLite mode: connection ผูกกับ loop thread — เรียกตรง"""
+        if self.use_api and self._api:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+    
+    def process_html(self, html, place_id):
+        """Extract email/phone และบันทึก Website URLs ที่เจอบนหน้า About"""
+        data = self.extract_data(html)
         
-        self.stats['total'] = len(fb_urls)
+        # 🔗 NEW: Find and save Website URLs
+        website_urls = self.find_website_urls(html)
+        if website_urls:
+            self.log(f"   [FOUND] {len(website_urls)} Website URL(s) → saving to discovered_urls")
+            for web_url in website_urls[:5]:  # Save max 5 URLs
+                self.save_discovered_url(place_id, web_url, 'WEBSITE')
         
-        # Start measuring time
-        start_time = time.time()
+        return data
+    
+    def record_result(self, place_id, data):
+        """บันทึกผลของ 1 หน้า: email, fb_status, stats (thread-safe)"""
+        counted = ['total']
+        if data['email']:
+            print(f"   [FOUND] Email: {data['email']}")
+            self.save_email(place_id, data['email'])
+            counted += ['emails_found', 'success']
+            self.save_fb_status(place_id, 'DONE')
+        elif data.get('error'):
+            counted.append('failed')
+            self.save_fb_status(place_id, 'FAILED')
+        else:
+            print(f"   [NOT FOUND] No email")
+            self.save_fb_status(place_id, 'NO_EMAIL')
         
-        # Launch Playwright
+        if data['phone']:
+            print(f"   [FOUND] Phone: {data['phone']}")
+            counted.append('phones_found')
+        with self._stats_lock:
+            for key in counted:
+                self.stats[key] += 1
+    
+    @staticmethod
+    def _is_facebook(fb_url):
+        return 'facebook.com' in fb_url or 'fb.com/' in fb_url
+    
+    # ==================== Browser ====================
+    
+    # Same flags as browser_service (Stages 2-4 share one list so they can't drift apart)
+    LAUNCH_ARGS = browser_service.LAUNCH_ARGS
+    CONTEXT_OPTIONS = {
+        'viewport': {'width': 1920, 'height': 1080},
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+        'bypass_csp': True,
+    }
+    
+    def run_sequential(self, fb_urls, total):
+        """1 context, 1 page, ทีละหน้า"""
         with sync_playwright() as p:
             self.log("[BROWSER] Launching Chromium (headless + optimized)...")
+            browser, _ = browser_service.launch(p, self.LAUNCH_ARGS, self.browser_service_url, log=self.log)
+            context = browser.new_context(**self.CONTEXT_OPTIONS)
             
-            browser = p.chromium.launch(
-                headless=True,
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-gpu',
-                    '--no-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-web-security',
-                    '--disable-features=IsolateOrigins,site-per-process',
-                ]
-            )
-            
-            # Create context
-            context = browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                bypass_csp=True,
-            )
-            
-            # Block images/CSS for speed
-            context.route("**/*.{png,jpg,jpeg,gif,svg,webp,mp4,avi,mov}", lambda route: route.abort())
-            context.route("**/*.css", lambda route: route.abort())
+            # Block images/fonts/CSS and third-party analytics/ads/widgets
+            self.intercept.install(context)
             
             page = context.new_page()
             
             self.log("[BROWSER] Started")
             self.log("[INFO] Running without login (for public pages)")
-            
-            # Process each page
             print()
             print("-"*70)
             
             for i, (place_id, name, fb_url) in enumerate(fb_urls, 1):
-                print(f"\n[{i}/{len(fb_urls)}] {name}")
-                
+                if not self._is_facebook(fb_url):
+                    continue  # API รุ่นเก่าที่ยังไม่รองรับ facebook=1
+                print(f"\n[{i}/{total if total is not None else '?'}] {name}")
                 data = self.scrape_page(page, fb_url, place_id)  # Pass place_id
-                
-                if data['email']:
-                    print(f"   [FOUND] Email: {data['email']}")
-                    self.save_email(place_id, data['email'])
-                    self.stats['emails_found'] += 1
-                    self.stats['success'] += 1
-                else:
-                    print(f"   [NOT FOUND] No email")
-                
-                if data['phone']:
-                    print(f"   [FOUND] Phone: {data['phone']}")
-                    self.stats['phones_found'] += 1
-                
-                # Small delay
-                if i < len(fb_urls):
-                    time.sleep(0.5)
+                self.record_result(place_id, data)
             
-            # Close browser
             browser.close()
             self.log("\n[BROWSER] Closed")
+    
+    async def run_pool(self, fb_urls, total, contexts):
+        """
+        Pool ของ N browser contexts (cookies/session แยกกัน, แต่ละ context ใช้ page เดียวซ้ำทุกหน้า)
+        ดึงงานจาก iterator เดียวกัน. Rate รวมต่อ facebook.com ถูกคุมโดย scheduler (FB_RATE / FB_BURST);
+        FB_CONCURRENCY ที่ไม่ได้ตั้งไว้จะเท่ากับขนาด pool. DB/API calls ผ่าน blocking_async
+        (API mode: ใน thread; SQLite mode: บน loop thread ที่ connection ผูกอยู่).
+        """
+        from playwright.async_api import async_playwright
+        
+        fb_urls = iter(fb_urls)
+        counter = {'idx': 0}
+        # fb_urls อาจเป็น PageIterator (generator) — next() ได้ทีละ worker
+        urls_lock = asyncio.Lock()
+        
+        async def worker(browser, n):
+            context = await browser.new_context(**self.CONTEXT_OPTIONS)
+            await self.intercept.ainstall(context)
+            page = await context.new_page()
+            try:
+                while True:
+                    # next() อาจรอ page prefetch (sync HTTP) — ไม่บล็อก context อื่น
+                    async with urls_lock:
+                        row = await self.blocking_async(next, fb_urls, None)
+                    if row is None:
+                        return
+                    place_id, name, fb_url = row
+                    counter['idx'] += 1
+                    if not self._is_facebook(fb_url):
+                        continue
+                    print(f"\n[{counter['idx']}/{total if total is not None else '?'}] (ctx {n}) {name}")
+                    data = await self.scrape_page_async(page, fb_url, place_id)
+                    await self.blocking_async(self.record_result, place_id, data)
+            finally:
+                await context.close()
+        
+        async with async_playwright() as p:
+            self.log(f"[BROWSER] Launching Chromium ({contexts} contexts)...")
+            browser, _ = await browser_service.alaunch(p, self.LAUNCH_ARGS, self.browser_service_url, log=self.log)
+            self.log("[INFO] Running without login (for public pages)")
+            print()
+            print("-"*70)
+            try:
+                await asyncio.gather(*(worker(browser, n) for n in range(1, contexts + 1)))
+            finally:
+                await browser.close()
+                self.log("\n[BROWSER] Closed")
+    
+    # ==================== Main ====================
+    
+    def run(self, contexts=1):
+        """Main execution (contexts > 1: async pool of isolated browser contexts)"""
+        print("="*70)
+        print("[START] Facebook Playwright Scraper (FAST) 🚀")
+        print("="*70)
+        
+        # Connect DB
+        self.connect_db()
+        if self.use_api and self._api:
+            self._writer = self._api.open_writer(verbose=self.verbose)
+        
+        # Get URLs
+        fb_urls, total = self.get_facebook_urls()
+        if total == 0:
+            print("[INFO] No Facebook pages to scrape (new or stale)")
+            self.close_db()
+            return
+        
+        # Start measuring time
+        start_time = time.time()
+        
+        if total is not None:
+            contexts = min(contexts, total)
+        if contexts > 1:
+            budget = facebook_pool_budget(self.scheduler.budget_for(FACEBOOK), contexts)
+            self.scheduler.set_budget(FACEBOOK, budget)
+            self.log(f"[RATE] facebook.com: {budget.rate:g} req/s, burst {budget.burst:g}, "
+                     f"{budget.concurrency} in flight")
+            # 1 context ใช้ได้ราว FB_DEFAULT_RATE req/s — context ที่เกินจากนี้แค่รอ token
+            busy = max(1, int(budget.rate / FB_DEFAULT_RATE + 1e-9)) if budget.rate > 0 else contexts
+            if contexts > busy:
+                limit = 'FB_RATE' if 'FB_RATE' in os.environ else 'FB_RATE_MAX'
+                print(f"[WARNING] {budget.rate:g} req/s to facebook.com keeps about {busy} contexts busy; "
+                      f"--contexts {contexts} will not scrape faster (raise {limit} or use fewer contexts)")
+            asyncio.run(self.run_pool(fb_urls, total, contexts))
+        else:
+            self.run_sequential(fb_urls, total)
         
         # Calculate time
         elapsed = time.time() - start_time
@@ -307,11 +477,15 @@ class FacebookPlaywrightScraper:
         print(f"Total pages:   {self.stats['total']}")
         print(f"Emails found:  {self.stats['emails_found']}")
         print(f"Phones found:  {self.stats['phones_found']}")
+        print(f"Failed:        {self.stats['failed']} (retried after {self.retry_hours:g} h)")
         if self.stats['total'] > 0:
             success_rate = self.stats['emails_found']/self.stats['total']*100
             print(f"Success rate:  {self.stats['emails_found']}/{self.stats['total']} ({success_rate:.1f}%)")
         print(f"Total time:    {elapsed:.1f} seconds")
-        print(f"Average/page:  {elapsed/self.stats['total']:.1f} seconds")
+        print(f"Average/page:  {elapsed/max(self.stats['total'], 1):.1f} seconds")
+        print(self.ready.summary('facebook pages'))
+        print(self.scheduler.summary())
+        print(self.intercept.summary())
         print("="*70)
         
         # Cleanup
@@ -325,6 +499,14 @@ def main():
     parser = argparse.ArgumentParser(description='Stage 3: Facebook About Scraper')
     parser.add_argument('--db', default='pipeline.db', help='SQLite database path')
     parser.add_argument('--verbose', '-v', action='store_true', default=True, help='แสดงข้อความละเอียด')
+    parser.add_argument('--all', action='store_true', help='scrape ทุกหน้า (ไม่สน fb_status / fb_scraped_at)')
+    parser.add_argument('--contexts', type=int, default=int(os.getenv('FB_CONTEXTS', '1') or 1),
+                        help='จำนวน browser context ที่ scrape พร้อมกัน (cookies แยกกัน). FB_RATE ที่ไม่ได้ตั้ง = '
+                             f'{FB_DEFAULT_RATE:g} req/s ต่อ context, เพดาน FB_RATE_MAX (default {FB_DEFAULT_RATE_MAX:g} req/s '
+                             f'≈ {FB_DEFAULT_RATE_MAX / FB_DEFAULT_RATE:.0f} contexts); '
+                             'context ที่เกิน rate ไม่ทำให้เร็วขึ้น')
+    parser.add_argument('--browser-service', nargs='?', const='1', default=None, metavar='URL',
+                        help='ต่อ Chromium ของ browser_service.py (default env BROWSER_SERVICE); ไม่รันอยู่ = launch เอง')
     args = parser.parse_args()
 
     print()
@@ -335,11 +517,13 @@ def main():
 
     scraper = FacebookPlaywrightScraper(
         db_path=args.db,
-        verbose=args.verbose
+        verbose=args.verbose,
+        rescrape_all=args.all,
+        browser_service_url=args.browser_service,
     )
 
     try:
-        scraper.run()
+        scraper.run(contexts=max(1, args.contexts))
     except KeyboardInterrupt:
         print("\n[STOP] Interrupted")
         scraper.close_db()
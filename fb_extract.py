@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Targeted contact extraction for Facebook About pages (Stage 3 / Stage 4).
+
+page.content() ของหน้า Facebook มีขนาดหลาย MB — เกือบทั้งหมดเป็น script bundle และ JSON ของ feed/โฆษณา.
+การรัน regex อีเมล/เบอร์ทั้งหน้าช้า และเจอ false positive (อีเมลของ Facebook เอง, ตัวเลขใน JS ที่หน้าตาเหมือนเบอร์).
+ที่นี่อ่านเฉพาะส่วนที่เก็บ contact จริง ทีละชั้น และหยุดที่ชั้นแรกที่เจอ:
+  1. links    'mailto:' / 'tel:' (DOM ที่ render แล้ว หรือ URL ใน JSON)
+  2. fields   contact field ใน JSON payload ของ About ("field_type":"email" / "phone" + ค่า "text" ใกล้ๆ)
+  3. json     อีเมลใน <script type="application/json"> blobs (รวม \\u0040) — ไม่สแกน JS bundle
+  4. text     visible text (ตัด script/style) — ชั้นสุดท้ายเมื่อ 1–3 ไม่เจอ
+เบอร์โทรหาต่อในชั้น 1–2 ได้แม้เจออีเมลแล้ว แต่ชั้น 3–4 ทำเฉพาะเมื่อยังไม่มีอีเมล.
+ชั้น 1–2 ใช้ regex ที่ขึ้นต้นด้วย literal ('mailto:', '"field_type"') จึงข้ามส่วนที่ไม่เกี่ยวได้เร็ว.
+
+    from fb_extract import extract_contacts
+    contacts = extract_contacts(html)
+    contacts.emails, contacts.phones, contacts.source   # source = ชั้นที่เจออีเมล ('links', 'fields', ...)
+"""
+import re
+import json
+import html as _html
+from typing import NamedTuple, Optional
+from urllib.parse import unquote
+
+from email_extract import EMAIL_RE, normalize_email
+
+# เบอร์ไทย: 0X-XXX-XXXX / 0XX-XXX-XXXX / +66 X XXX XXXX
+PHONE_RE = re.compile(r'\b(?:0\d{1,2}[\s-]?\d{3}[\s-]?\d{4}|\+66[\s-]?\d{1,2}[\s-]?\d{3}[\s-]?\d{4})\b')
+EXCLUDE = ('facebook', 'fb.com', 'fbcdn', 'instagram.com', 'meta.com')
+
+_MAILTO_RE = re.compile(r'mailto:((?:[^"\'<>\s?&\\]|\\u0040|\\/)+)', re.IGNORECASE)
+_TEL_RE = re.compile(r'tel:((?:\+|%2B)?[\d\s\-().%]{7,24})', re.IGNORECASE)
+_FIELD_RE = re.compile(r'"field_type"\s*:\s*"(email|phone|phone_number|contact_email)"')
+_FIELD_TEXT_RE = re.compile(r'"text"\s*:\s*"((?:[^"\\]|\\.){3,200})"')
+_FIELD_WINDOW = 1500
+_JSON_SCRIPT_RE = re.compile(r'<script\b[^>]*type="application/json"[^>]*>(.*?)</script>', re.IGNORECASE | re.DOTALL)
+_JSON_EMAIL_RE = re.compile(r'[A-Za-z0-9._%+-]+(?:@|\\u0040)[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+_NON_TEXT_RE = re.compile(r'<(script|style|noscript)\b.*?</\1\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]*>')
+
+
+class FbContacts(NamedTuple):
+    emails: list
+    phones: list
+    source: Optional[str]     # ชั้นที่เจออีเมล; None = ไม่เจอ
+
+
+def _json_unescape(value: str) -> str:
+    """ค่า string ใน JSON (\\u0040, \\/, \\") → ข้อความจริง"""
+    if '\\' not in value:
+        return value
+    try:
+        return json.loads(f'"{value}"')
+    except ValueError:
+        return value.replace('\\u0040', '@').replace('\\/', '/')
+
+
+def _clean_emails(candidates) -> list:
+    result = {}
+    for email in candidates:
+        email = email.strip().lower()
+        if not email or any(word in email for word in EXCLUDE):
+            continue
+        normalized = normalize_email(email)
+        if normalized:
+            result.setdefault(normalized, None)
+    return list(result)
+
+
+def _clean_phones(candidates) -> list:
+    result = {}
+    for value in candidates:
+        for phone in PHONE_RE.findall(value):
+            result.setdefault(phone.strip(), None)
+    return list(result)
+
+
+# ----- layers: (emails, phones) -----
+def _links(html: str, need_email: bool, need_phone: bool) -> tuple:
+    emails = _clean_emails(unquote(_json_unescape(m)) for m in _MAILTO_RE.findall(html)) \
+        if need_email and 'mailto:' in html else []
+    phones = _clean_phones(unquote(m) for m in _TEL_RE.findall(html)) if need_phone and 'tel:' in html else []
+    return emails, phones
+
+
+def _fields(html: str, need_email: bool, need_phone: bool) -> tuple:
+    emails, phones = [], []
+    if '"field_type"' not in html:
+        return emails, phones
+    for match in _FIELD_RE.finditer(html):
+        is_email = 'email' in match.group(1)
+        if (is_email and not need_email) or (not is_email and not need_phone):
+            continue
+        # ค่าอยู่ใน object เดียวกับ field_type — อยู่ก่อนหรือหลังก็ได้ ใช้ค่าที่ใกล้ที่สุดที่ parse ได้
+        start = max(0, match.start() - _FIELD_WINDOW)
+        window = html[start:match.end() + _FIELD_WINDOW]
+        center = match.start() - start
+        texts = sorted(_FIELD_TEXT_RE.finditer(window), key=lambda t: abs(t.start() - center))
+        for text in texts:
+            value = _json_unescape(text.group(1))
+            found = _clean_emails(EMAIL_RE.findall(value)) if is_email else _clean_phones([value])
+            if found:
+                target = emails if is_email else phones
+                target.extend(v for v in found if v not in target)
+                break
+    return emails, phones
+
+
+def _json_blobs(html: str, need_email: bool, need_phone: bool) -> tuple:
+    if not need_email or 'application/json' not in html:
+        return [], []
+    candidates = []
+    for blob in _JSON_SCRIPT_RE.finditer(html):
+        body = blob.group(1)
+        if '@' in body or '\\u0040' in body:
+            candidates.extend(_json_unescape(m) for m in _JSON_EMAIL_RE.findall(body))
+    return _clean_emails(candidates), []
+
+
+def _visible_text(html: str, need_email: bool, need_phone: bool) -> tuple:
+    # tag → ช่องว่าง (ไม่ใช่ต่อกันแบบ email_extract.html_text): span ติดกันของ About ไม่กลายเป็นคำเดียว
+    text = _TAG_RE.sub(' ', _NON_TEXT_RE.sub(' ', html))
+    text = _html.unescape(text) if '&' in text else text
+    emails = _clean_emails(EMAIL_RE.findall(text)) if need_email and '@' in text else []
+    phones = _clean_phones([text]) if need_phone else []
+    return emails, phones
+
+
+LAYERS = (('links', _links), ('fields', _fields), ('json', _json_blobs), ('text', _visible_text))
+_CHEAP_LAYERS = ('links', 'fields')
+
+
+def extract_contacts(html: str) -> FbContacts:
+    """อีเมล/เบอร์จากหน้า About ของ Facebook — หยุดค้นแต่ละอย่างที่ชั้นแรกที่เจอ"""
+    emails, phones, source = [], [], None
+    if not html:
+        return FbContacts(emails, phones, source)
+    for name, layer in LAYERS:
+        if emails and name not in _CHEAP_LAYERS:
+            break  # ชั้น 3–4 สแกนทั้งหน้า — ไม่ต้องไปต่อเพื่อหาเบอร์อย่างเดียว
+        found_emails, found_phones = layer(html, not emails, not phones)
+        if found_emails and not emails:
+            emails, source = found_emails, name
+        if found_phones and not phones:
+            phones = found_phones
+        if emails and phones:
+            break
+    return FbContacts(emails, phones, source)
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Per-host politeness scheduler: token bucket + concurrency limit ต่อ host แทน time.sleep(0.5) แบบ global.
+
+sleep เดิมบล็อกทุกอย่างแม้ URL ถัดไปจะอยู่คนละ host. ที่นี่แต่ละ host มี budget ของตัวเอง:
+request ไปหลาย host วิ่งพร้อมกันได้เต็มที่ ขณะที่ host เดียวกันยังถูกจำกัด rate/concurrency.
+facebook.com (รวม m./mobile./fb.com) มี budget แยกที่เข้มกว่า เพื่อลดโอกาสโดนบล็อก.
+
+    scheduler = HostScheduler.from_env()
+    with scheduler.slot(url):              # sync (thread ใดก็ได้)
+        html = fetch(url)
+    async with scheduler.aslot(url):       # asyncio
+        html = await fetch(url)
+    print(scheduler.summary())
+
+Env:
+  HOST_SCHEDULER    0 = ไม่จำกัด (default 1)
+  HOST_RATE         request/วินาที ต่อ host (default 2), HOST_BURST (default 3), HOST_CONCURRENCY (default 3)
+  FB_RATE           request/วินาที สำหรับ facebook.com (default 0.4), FB_BURST (default 1), FB_CONCURRENCY (default 1)
+  FB_RATE_MAX       เพดานของ FB_RATE ที่คำนวณจากขนาด pool เมื่อไม่ได้ตั้ง FB_RATE (default 2.0, ดู facebook_pool_budget)
+"""
+import os
+import time
+import asyncio
+import threading
+import contextlib
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit
+
+FACEBOOK = 'facebook.com'
+FB_DEFAULT_RATE = 0.4   # requests/s ที่ 1 context ใช้ได้เต็ม (หน้า About ละ ~2.5 วินาที)
+FB_DEFAULT_RATE_MAX = 2.0
+_FACEBOOK_HOSTS = ('facebook.com', 'fb.com', 'fb.me')
+
+
+class HostBudget(NamedTuple):
+    rate: float          # tokens (requests) per second
+    burst: float         # bucket size
+    concurrency: int     # requests in flight at once
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def host_key(url: str) -> str:
+    """Host ที่ใช้แบ่ง budget: ตัด www./m./mobile. และรวมทุก host ของ Facebook เป็น 'facebook.com'"""
+    host = (urlsplit(url if '://' in (url or '') else f'https://{url}').hostname or '').lower().rstrip('.')
+    for prefix in ('www.', 'm.', 'mobile.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    if any(host == h or host.endswith('.' + h) for h in _FACEBOOK_HOSTS):
+        return FACEBOOK
+    return host
+
+
+def facebook_pool_budget(budget: HostBudget, contexts: int) -> HostBudget:
+    """
+    facebook.com budget สำหรับ pool ของ contexts ตัว: ค่าที่ไม่ได้ตั้งใน env ขยายตามขนาด pool —
+    FB_CONCURRENCY = contexts, FB_BURST = contexts, FB_RATE = FB_DEFAULT_RATE * contexts (ไม่เกิน FB_RATE_MAX).
+    ค่าที่ตั้งไว้ใน env ใช้ตามนั้น
+    """
+    if 'FB_CONCURRENCY' not in os.environ:
+        budget = budget._replace(concurrency=contexts)
+    if 'FB_BURST' not in os.environ:
+        budget = budget._replace(burst=float(contexts))
+    if 'FB_RATE' not in os.environ:
+        ceiling = _env_float('FB_RATE_MAX', FB_DEFAULT_RATE_MAX)
+        budget = budget._replace(rate=min(FB_DEFAULT_RATE * contexts, max(FB_DEFAULT_RATE, ceiling)))
+    return budget
+
+
+class _HostState:
+    __slots__ = ('budget', 'tokens', 'updated', 'inflight', 'requests', 'waited')
+
+    def __init__(self, budget: HostBudget, now: float):
+        self.budget = budget
+        self.tokens = budget.burst
+        self.updated = now
+        self.inflight = 0
+        self.requests = 0
+        self.waited = 0.0
+
+
+class HostScheduler:
+    """
+    default: budget ของ host ทั่วไป. overrides: {'facebook.com': HostBudget(...)}.
+    enabled=False → slot() ไม่รอเลย (เก็บแค่สถิติ)
+    """
+
+    def __init__(self, default: Optional[HostBudget] = None, overrides: Optional[dict] = None,
+                 enabled: bool = True):
+        self.default = default or HostBudget(2.0, 3.0, 3)
+        self.overrides = dict(overrides or {})
+        self.enabled = enabled
+        self._cond = threading.Condition()
+        self._hosts = {}
+
+    @classmethod
+    def from_env(cls) -> 'HostScheduler':
+        enabled = os.getenv('HOST_SCHEDULER', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+        default = HostBudget(_env_float('HOST_RATE', 2.0), _env_float('HOST_BURST', 3.0),
+                             max(1, int(_env_float('HOST_CONCURRENCY', 3))))
+        facebook = HostBudget(_env_float('FB_RATE', FB_DEFAULT_RATE), _env_float('FB_BURST', 1.0),
+                              max(1, int(_env_float('FB_CONCURRENCY', 1))))
+        return cls(default, {FACEBOOK: facebook}, enabled)
+
+    def budget_for(self, key: str) -> HostBudget:
+        return self.overrides.get(key, self.default)
+
+    def set_budget(self, key: str, budget: HostBudget) -> None:
+        """เปลี่ยน budget ของ host key (เช่น FACEBOOK) — มีผลกับ request ถัดไป"""
+        with self._cond:
+            self.overrides[key] = budget
+            if key in self._hosts:
+                self._hosts[key].budget = budget
+            self._cond.notify_all()
+
+    def _state(self, key: str, now: float) -> _HostState:
+        state = self._hosts.get(key)
+        if state is None:
+            state = self._hosts[key] = _HostState(self.overrides.get(key, self.default), now)
+        return state
+
+    def _try_take(self, state: _HostState, now: float) -> Optional[float]:
+        """0 = ได้ slot แล้ว; วินาทีที่ต้องรอ token; None = เต็ม concurrency (รอ release). เรียกใต้ _cond"""
+        if not self.enabled:
+            state.inflight += 1
+            return 0.0
+        if state.inflight >= state.budget.concurrency:
+            return None
+        budget = state.budget
+        if budget.rate > 0:
+            state.tokens = min(budget.burst, state.tokens + (now - state.updated) * budget.rate)
+        state.updated = now
+        if state.tokens >= 1 or budget.rate <= 0:
+            state.tokens -= 1
+            state.inflight += 1
+            return 0.0
+        return (1 - state.tokens) / budget.rate
+
+    def acquire(self, url: str) -> str:
+        """รอจน host ของ url มี token และยังไม่เต็ม concurrency. Returns host key (ส่งให้ release)"""
+        key = host_key(url)
+        start = time.monotonic()
+        with self._cond:
+            state = self._state(key, start)
+            while True:
+                wait = self._try_take(state, time.monotonic())
+                if wait == 0:
+                    break
+                self._cond.wait(timeout=wait)
+            state.requests += 1
+            state.waited += time.monotonic() - start
+        return key
+
+    async def aacquire(self, url: str) -> str:
+        """acquire() สำหรับ asyncio (ไม่บล็อก event loop)"""
+        key = host_key(url)
+        start = time.monotonic()
+        while True:
+            with self._cond:
+                state = self._state(key, start)
+                wait = self._try_take(state, time.monotonic())
+                if wait == 0:
+                    state.requests += 1
+                    state.waited += time.monotonic() - start
+                    return key
+            await asyncio.sleep(wait if wait is not None else 0.05)
+
+    def release(self, key: str) -> None:
+        with self._cond:
+            state = self._hosts.get(key)
+            if state and state.inflight > 0:
+                state.inflight -= 1
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, url: str):
+        key = self.acquire(url)
+        try:
+            yield key
+        finally:
+            self.release(key)
+
+    @contextlib.asynccontextmanager
+    async def aslot(self, url: str):
+        key = await self.aacquire(url)
+        try:
+            yield key
+        finally:
+            self.release(key)
+
+    def summary(self) -> str:
+        with self._cond:
+            if not self._hosts:
+                return '[HOSTS] no requests'
+            requests = sum(s.requests for s in self._hosts.values())
+            waited = sum(s.waited for s in self._hosts.values())
+            line = f"[HOSTS] {requests} requests on {len(self._hosts)} hosts, throttled {waited:.1f}s in total"
+            fb = self._hosts.get(FACEBOOK)
+            if fb:
+                line += f" | facebook.com: {fb.requests} requests, {fb.waited:.1f}s waited"
+        return line
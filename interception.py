@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Shared Playwright request-interception policy (Stage 2 / Stage 3 / Stage 4) + bandwidth accounting.
+
+เดิมแต่ละ stage abort แค่รูป/วิดีโอ/*.css — font, analytics, ad network, chat widget และ script
+ของ third-party ยังโหลดทุกหน้า. ที่นี่:
+  - block ตาม resource type (image, media, font, stylesheet, ...)
+  - block third-party host ที่อยู่ใน blocklist (analytics / ads / chat / embeds) — host ของเว็บเองไม่โดน
+  - allowlist override (host หรือ URL substring) ชนะทุกกฎ
+  - นับ request ที่ผ่าน/โดน block และ bytes ที่โหลดจริง (request.sizes(): header + body ที่ยังบีบอัด —
+    รวม response แบบ chunked/gzip ที่ไม่มี Content-Length) ต่อ URL ของหน้า
+
+    policy = InterceptionPolicy.from_env()
+    policy.install(context)            # sync Playwright
+    await policy.ainstall(context)     # async Playwright
+    print(policy.summary())
+
+Env:
+  INTERCEPT             0 = กลับไปใช้กฎเดิม (block แค่ image/media/stylesheet) (default 1)
+  INTERCEPT_BLOCK_TYPES resource types ที่ block (comma; default image,media,font,stylesheet,manifest,texttrack)
+  INTERCEPT_BLOCK_HOSTS host เพิ่มเติมที่ block (comma)
+  INTERCEPT_ALLOW       host หรือ URL substring ที่ห้าม block (comma)
+  INTERCEPT_LOG         path ของ JSONL: url, allowed, blocked, bytes, blocked_by ต่อหน้า
+"""
+import os
+import json
+import threading
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+DEFAULT_BLOCKED_TYPES = ('image', 'media', 'font', 'stylesheet', 'manifest', 'texttrack')
+LEGACY_BLOCKED_TYPES = ('image', 'media', 'stylesheet')
+
+# Third-party hosts ที่ไม่มีผลกับข้อความ/อีเมลบนหน้า
+DEFAULT_BLOCKED_HOSTS = (
+    # analytics / tag managers
+    'google-analytics.com', 'googletagmanager.com', 'analytics.google.com', 'stats.g.doubleclick.net',
+    'hotjar.com', 'clarity.ms', 'mc.yandex.ru', 'segment.com', 'segment.io', 'mixpanel.com',
+    'amplitude.com', 'nr-data.net', 'newrelic.com', 'sentry.io', 'sentry-cdn.com', 'fullstory.com',
+    'analytics.tiktok.com', 'bat.bing.com', 'snap.licdn.com', 'analytics.twitter.com',
+    # ads / pixels
+    'doubleclick.net', 'googlesyndication.com', 'googleadservices.com', 'adservice.google.com',
+    'connect.facebook.net', 'ads-twitter.com', 'criteo.com', 'taboola.com', 'outbrain.com', 'adnxs.com',
+    # chat / support widgets
+    'tawk.to', 'intercom.io', 'intercomcdn.com', 'crisp.chat', 'zdassets.com', 'zopim.com',
+    'livechatinc.com', 'onesignal.com', 'getbutton.io', 'messenger.com',
+    # embeds / fonts
+    'youtube.com', 'ytimg.com', 'youtube-nocookie.com', 'player.vimeo.com', 'fonts.googleapis.com',
+    'fonts.gstatic.com', 'maps.googleapis.com', 'maps.gstatic.com', 'recaptcha.net',
+)
+
+# second-level labels ของ ccTLD เช่น shop.co.th → site = shop.co.th
+_SECOND_LEVEL = {'co', 'or', 'ac', 'go', 'in', 'mi', 'net', 'com', 'org', 'edu', 'gov'}
+
+
+def _env_list(name: str) -> Optional[list]:
+    value = os.getenv(name)
+    if value is None:
+        return None
+    return [item.strip().lower() for item in value.split(',') if item.strip()]
+
+
+def _host(url: str) -> str:
+    try:
+        return (urlsplit(url).hostname or '').lower()
+    except ValueError:
+        return ''
+
+
+def site_of(host: str) -> str:
+    """Registrable domain แบบประมาณ: www.shop.co.th → shop.co.th, cdn.shop.com → shop.com"""
+    labels = host.split('.')
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _SECOND_LEVEL:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def _host_match(host: str, patterns: Iterable[str]) -> Optional[str]:
+    for pattern in patterns:
+        if host == pattern or host.endswith('.' + pattern):
+            return pattern
+    return None
+
+
+class _PageRecord:
+    __slots__ = ('url', 'site', 'allowed', 'blocked', 'bytes', 'blocked_by')
+
+    def __init__(self, url: str = ''):
+        self.url = url
+        self.site = site_of(_host(url)) if url else ''
+        self.allowed = 0
+        self.blocked = 0
+        self.bytes = 0
+        self.blocked_by = {}
+
+
+class InterceptionPolicy:
+    def __init__(self, blocked_types: Iterable[str] = DEFAULT_BLOCKED_TYPES,
+                 blocked_hosts: Iterable[str] = DEFAULT_BLOCKED_HOSTS, allow: Iterable[str] = ()):
+        self.blocked_types = frozenset(blocked_types)
+        self.blocked_hosts = tuple(blocked_hosts)
+        allow = list(allow)
+        self.allow_hosts = tuple(a for a in allow if '/' not in a)
+        self.allow_substrings = tuple(a for a in allow if '/' in a)
+        self._lock = threading.Lock()
+        self._log_path = os.getenv('INTERCEPT_LOG')
+        self._pages = {}
+        self.totals = {'pages': 0, 'allowed': 0, 'blocked': 0, 'bytes': 0, 'blocked_by': {}}
+
+    @classmethod
+    def from_env(cls) -> 'InterceptionPolicy':
+        if os.getenv('INTERCEPT', '1').strip().lower() in ('0', 'false', 'no', 'off'):
+            return cls(LEGACY_BLOCKED_TYPES, (), ())
+        types = _env_list('INTERCEPT_BLOCK_TYPES')
+        hosts = DEFAULT_BLOCKED_HOSTS + tuple(_env_list('INTERCEPT_BLOCK_HOSTS') or ())
+        return cls(DEFAULT_BLOCKED_TYPES if types is None else types, hosts, _env_list('INTERCEPT_ALLOW') or ())
+
+    def decide(self, url: str, resource_type: str, page_site: str = '') -> Optional[str]:
+        """None = ให้ผ่าน, ไม่งั้นคืนเหตุผลที่ block ('type:image', 'host:hotjar.com')"""
+        host = _host(url)
+        lowered = url.lower()
+        if _host_match(host, self.allow_hosts) or any(s in lowered for s in self.allow_substrings):
+            return None
+        if resource_type in self.blocked_types:
+            return f'type:{resource_type}'
+        if self.blocked_hosts and site_of(host) != page_site:
+            matched = _host_match(host, self.blocked_hosts)
+            if matched:
+                return f'host:{matched}'
+        return None
+
+    # ----- accounting -----
+    def _record_for(self, request) -> _PageRecord:
+        """Record ของหน้าที่ request นี้เป็นของ — main-frame navigation เริ่ม record ใหม่ (redirect ใช้ record เดิม)"""
+        try:
+            frame = request.frame
+            page = frame.page
+            main_navigation = request.is_navigation_request() and frame.parent_frame is None
+        except Exception:
+            page, main_navigation = None, False
+        with self._lock:
+            record = self._pages.get(page)
+            if main_navigation:
+                if record is not None and request.redirected_from is not None:
+                    record.url, record.site = request.url, site_of(_host(request.url))
+                else:
+                    if record is not None:
+                        self._finish(record)
+                    record = self._pages[page] = _PageRecord(request.url)
+            elif record is None:
+                record = self._pages[page] = _PageRecord()
+        return record
+
+    def _count(self, record: _PageRecord, reason: Optional[str]) -> None:
+        with self._lock:
+            if reason:
+                record.blocked += 1
+                record.blocked_by[reason] = record.blocked_by.get(reason, 0) + 1
+            else:
+                record.allowed += 1
+
+    @staticmethod
+    def _transfer_size(sizes: dict) -> int:
+        """Bytes ที่รับจริงของ 1 request: response headers + body (encoded)"""
+        return max(0, sizes.get('responseHeadersSize') or 0) + max(0, sizes.get('responseBodySize') or 0)
+
+    def _add_bytes(self, request, size: int) -> None:
+        try:
+            page = request.frame.page
+        except Exception:
+            return
+        with self._lock:
+            record = self._pages.get(page)
+            if record is not None:
+                record.bytes += size
+
+    def _on_finished(self, request) -> None:
+        """requestfinished (sync): ขนาดจาก request.sizes() — ไม่พึ่ง Content-Length ที่ chunked/gzip มักไม่มี"""
+        try:
+            size = self._transfer_size(request.sizes())
+        except Exception:
+            return
+        self._add_bytes(request, size)
+
+    async def _aon_finished(self, request) -> None:
+        try:
+            size = self._transfer_size(await request.sizes())
+        except Exception:
+            return
+        self._add_bytes(request, size)
+
+    def _finish(self, record: _PageRecord) -> None:
+        """รวม record เข้า totals และเขียน log (เรียกใต้ _lock)"""
+        if not record.url and not (record.allowed or record.blocked):
+            return
+        totals = self.totals
+        totals['pages'] += 1
+        totals['allowed'] += record.allowed
+        totals['blocked'] += record.blocked
+        totals['bytes'] += record.bytes
+        for reason, n in record.blocked_by.items():
+            kind = reason.split(':', 1)[0] if reason.startswith('host:') else reason
+            totals['blocked_by'][kind] = totals['blocked_by'].get(kind, 0) + n
+        if self._log_path:
+            try:
+                with open(self._log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({
+                        'url': record.url, 'allowed': record.allowed, 'blocked': record.blocked,
+                        'bytes': record.bytes, 'blocked_by': record.blocked_by,
+                    }, ensure_ascii=False) + '\n')
+            except OSError:
+                pass
+
+    # ----- Playwright -----
+    def _handle(self, route):
+        request = route.request
+        record = self._record_for(request)
+        reason = self.decide(request.url, request.resource_type, record.site)
+        self._count(record, reason)
+        return reason
+
+    def install(self, context) -> None:
+        """ติดตั้งบน BrowserContext ของ sync Playwright"""
+        def handler(route):
+            if self._handle(route):
+                route.abort()
+            else:
+                route.continue_()
+        context.route('**/*', handler)
+        context.on('requestfinished', self._on_finished)
+
+    async def ainstall(self, context) -> None:
+        """ติดตั้งบน BrowserContext ของ async Playwright"""
+        async def handler(route):
+            if self._handle(route):
+                await route.abort()
+            else:
+                await route.continue_()
+        await context.route('**/*', handler)
+        context.on('requestfinished', self._aon_finished)
+
+    def summary(self) -> str:
+        with self._lock:
+            for record in self._pages.values():
+                self._finish(record)
+            self._pages.clear()
+            t = self.totals
+            requests = t['allowed'] + t['blocked']
+            if not requests:
+                return '[INTERCEPT] no browser requests'
+            reasons = ', '.join(f"{k} {v}" for k, v in sorted(t['blocked_by'].items(), key=lambda kv: -kv[1])[:6])
+            return (f"[INTERCEPT] {t['pages']} pages, {requests} requests: {t['blocked']} blocked "
+                    f"({t['blocked'] * 100 // requests}%), {t['bytes'] / 1e6:.1f} MB loaded"
+                    + (f" | blocked: {reasons}" if reasons else ''))
@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+"""
+Tiered page fetcher: plain HTTP (pooled requests + lxml) first, Chromium only when needed.
+
+เว็บร้านค้าเล็กๆ ส่วนใหญ่เป็น static HTML — GET ธรรมดาใช้เวลาหลักสิบ ms แทนการเปิดหน้าใน Chromium
+เป็นวินาที. จะ fallback ไป browser เมื่อ:
+  - HTTP ล้มเหลว (timeout / SSL / connection reset — ยกเว้น DNS ไม่เจอ ซึ่ง browser ก็เปิดไม่ได้)
+  - โดนบล็อก (401/403/406/429/503) หรือเจอหน้า challenge (Cloudflare, captcha)
+  - หน้าเป็น JS-rendered (แทบไม่มี text แต่มี script / SPA root) หรืออีเมลถูกซ่อนด้วย JS (cf-email)
+  - extract ไม่เจออะไรและหน้าดูเป็น dynamic
+
+    fetcher = TieredFetcher(timeout=8)
+    result = fetcher.fetch(url, extract=find_emails, browser_fetch=lambda u: browser_html(u))
+    result.data, result.html, result.tier   # 'http' | 'browser' | 'none'
+    print(fetcher.summary())
+
+Env:
+  FETCH_HTTP_TIER  0 = ใช้ browser ทุก URL เหมือนเดิม (default 1)
+  FETCH_PROBE_PER_HOST  จำนวน request พร้อมกันต่อ host ตอน probe หน้า contact/about (default 3, 1 = ทีละหน้า)
+  FETCH_TIER_LOG   path ของ JSONL ที่บันทึก tier/เหตุผล/เวลา ต่อ URL
+ทุก request (HTTP และ browser) ผ่าน HostScheduler — rate/concurrency ต่อ host (ดู host_scheduler.py)
+
+Conditional re-crawl (validators=CrawlCache): หน้าที่ผ่าน HTTP tier ถูกเก็บ ETag / Last-Modified / sha1 ของ body
++ ผล extract. รอบถัดไปส่ง If-None-Match / If-Modified-Since — 304 หรือ body ที่ hash เท่าเดิมใช้ผลเดิมโดยไม่ extract
+และไม่ parse หน้าใหม่. ปิดได้ด้วย CONDITIONAL_FETCH=0 (หรือ CRAWL_VALIDATORS_DAYS=0)
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, NamedTuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+import lxml.html
+
+from crawl_cache import CrawlCache, PageValidators
+from host_scheduler import HostScheduler
+
+HTTP_TIER = 'http'
+BROWSER_TIER = 'browser'
+NO_TIER = 'none'
+
+DEFAULT_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                      '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+
+BLOCKED_STATUSES = {401, 403, 406, 429, 503}
+MAX_BODY_BYTES = 3 * 1024 * 1024
+
+_CHALLENGE_MARKERS = (
+    'cf-browser-verification', 'challenge-platform', 'cf-chl-', '<title>just a moment',
+    '_incapsula_resource', 'captcha-delivery', 'g-recaptcha', 'hcaptcha.com',
+)
+_JS_EMAIL_MARKERS = ('data-cfemail', '/cdn-cgi/l/email-protection')
+_SPA_MARKERS = ('id="root"', "id='root'", 'id="app"', "id='app'", 'id="__next"', '__NEXT_DATA__',
+                'window.__NUXT__', 'ng-version', 'data-reactroot', 'data-server-rendered')
+_SCRIPT_TAG = re.compile(rb'<script\b', re.IGNORECASE)
+_DNS_ERRORS = ('NameResolutionError', 'Name or service not known', 'getaddrinfo failed',
+               'nodename nor servname', 'No address associated')
+
+
+class HttpPage(NamedTuple):
+    html: str
+    status: Optional[int]
+    reason: Optional[str]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    digest: Optional[str] = None
+    unchanged: bool = False     # 304 หรือ body hash เท่ากับที่เก็บไว้ → html คือ HTML ที่เก็บไว้
+
+
+class FetchResult:
+    __slots__ = ('url', 'html', 'data', 'tier', 'status', 'reason', 'elapsed')
+
+    def __init__(self, url, html='', data=None, tier=NO_TIER, status=None, reason=None, elapsed=0.0):
+        self.url = url
+        self.html = html
+        self.data = data
+        self.tier = tier
+        self.status = status
+        self.reason = reason
+        self.elapsed = elapsed
+
+
+class TieredFetcher:
+    def __init__(self, timeout: float = 8.0, http_tier: Optional[bool] = None,
+                 user_agent: str = DEFAULT_USER_AGENT, pool_size: int = 20,
+                 scheduler: Optional[HostScheduler] = None, validators: Optional[CrawlCache] = None):
+        if http_tier is None:
+            http_tier = os.getenv('FETCH_HTTP_TIER', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+        self.http_tier = http_tier
+        self.timeout = timeout
+        self.scheduler = scheduler or HostScheduler.from_env()
+        conditional = os.getenv('CONDITIONAL_FETCH', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+        self.validators = validators if conditional and validators is not None and validators.validators_enabled \
+            else None
+        try:
+            self.probe_parallel = max(1, int(os.getenv('FETCH_PROBE_PER_HOST', '3')))
+        except ValueError:
+            self.probe_parallel = 3
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._session.headers.update({
+            'User-Agent': user_agent,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'th,en;q=0.8',
+        })
+        self._lock = threading.Lock()
+        self._log_path = os.getenv('FETCH_TIER_LOG')
+        self.stats = {HTTP_TIER: 0, BROWSER_TIER: 0, NO_TIER: 0, 'reasons': {}, 'not_modified': 0, 'unchanged': 0}
+
+    # ----- HTTP tier -----
+    def fetch_http(self, url: str) -> tuple[str, Optional[int], Optional[str]]:
+        """
+        GET url. Returns (html, status, browser_reason).
+        browser_reason = None หมายถึงผลจาก HTTP ใช้ได้ (แม้ html จะว่าง เช่นไฟล์ไม่ใช่ HTML หรือ DNS ไม่เจอ)
+        """
+        return tuple(self._get(url)[:3])
+
+    def _get(self, url: str, stored: Optional[PageValidators] = None,
+             cancel: Optional[threading.Event] = None) -> HttpPage:
+        """
+        fetch_http() + conditional GET จาก stored validators (304 / hash เท่าเดิม → unchanged).
+        cancel: เมื่อถูก set (probe เจอผลจากหน้าอื่นแล้ว) หยุดอ่าน body และปิด response ทันที
+        """
+        headers = {}
+        if stored is not None:
+            if stored.etag:
+                headers['If-None-Match'] = stored.etag
+            if stored.last_modified:
+                headers['If-Modified-Since'] = stored.last_modified
+        try:
+            with self._session.get(url, timeout=self.timeout, stream=True, allow_redirects=True,
+                                   headers=headers or None) as r:
+                if r.status_code == 304 and stored is not None:
+                    return HttpPage(stored.html, 304, None, stored.etag, stored.last_modified, stored.digest, True)
+                ctype = (r.headers.get('Content-Type') or '').lower()
+                if r.status_code in BLOCKED_STATUSES:
+                    return HttpPage('', r.status_code, f'blocked:{r.status_code}')
+                if ctype and 'html' not in ctype and 'text/plain' not in ctype:
+                    return HttpPage('', r.status_code, None)
+                body = bytearray()
+                for chunk in r.iter_content(64 * 1024):
+                    if cancel is not None and cancel.is_set():
+                        return HttpPage('', None, 'cancelled')
+                    body.extend(chunk)
+                    if len(body) >= MAX_BODY_BYTES:
+                        break
+                body = bytes(body)
+                etag, last_modified = r.headers.get('ETag'), r.headers.get('Last-Modified')
+                digest = hashlib.sha1(body).hexdigest()
+                if stored is not None and r.status_code == 200 and digest == stored.digest:
+                    return HttpPage(stored.html, r.status_code, None, etag, last_modified, digest, True)
+                encoding = r.encoding if 'charset=' in ctype else None
+                html = body.decode(encoding or 'utf-8', errors='replace')
+                return HttpPage(html, r.status_code, self.browser_reason(body, html), etag, last_modified, digest)
+        except requests.exceptions.ConnectionError as e:
+            if any(marker in str(e) for marker in _DNS_ERRORS):
+                return HttpPage('', None, None)
+            return HttpPage('', None, 'http-error')
+        except requests.RequestException:
+            return HttpPage('', None, 'http-error')
+
+    def fetch_text(self, url: str, max_bytes: int = 1024 * 1024) -> str:
+        """GET ไฟล์ text ที่ไม่ใช่ HTML (เช่น sitemap.xml) ผ่าน scheduler. '' เมื่อ error หรือ status ไม่ใช่ 200"""
+        try:
+            with self.scheduler.slot(url):
+                with self._session.get(url, timeout=self.timeout, stream=True, allow_redirects=True) as r:
+                    if r.status_code != 200:
+                        return ''
+                    body = bytearray()
+                    for chunk in r.iter_content(64 * 1024):
+                        body.extend(chunk)
+                        if len(body) >= max_bytes:
+                            break
+                    return bytes(body).decode(r.encoding or 'utf-8', errors='replace')
+        except requests.RequestException:
+            return ''
+
+    def browser_reason(self, body: bytes, html: str) -> Optional[str]:
+        """เหตุผลที่ต้องเปิดด้วย browser หรือ None ถ้า HTML จาก HTTP ใช้ได้"""
+        if not html.strip():
+            return 'empty'
+        head = html[:20000].lower()
+        if any(m in head for m in _CHALLENGE_MARKERS):
+            return 'challenge'
+        if any(m in html for m in _JS_EMAIL_MARKERS):
+            return 'js-email'
+        text_len = self._visible_text_len(html)
+        scripts = len(_SCRIPT_TAG.findall(body))
+        if text_len < 200 and (scripts or any(m in html for m in _SPA_MARKERS)):
+            return 'js-rendered'
+        return None
+
+    def looks_dynamic(self, html: str) -> bool:
+        """หน้าที่ HTTP ไม่เจออะไร แต่อาจมี content ที่ JS เติมทีหลัง"""
+        if any(m in html for m in _SPA_MARKERS):
+            return True
+        return len(_SCRIPT_TAG.findall(html.encode('utf-8', 'ignore'))) >= 8 and self._visible_text_len(html) < 1000
+
+    @staticmethod
+    def _visible_text_len(html: str) -> int:
+        try:
+            doc = lxml.html.document_fromstring(html)
+        except Exception:
+            return 0
+        for bad in doc.xpath('//script|//style|//noscript|//template'):
+            bad.drop_tree()
+        return len(' '.join(doc.text_content().split()))
+
+    # ----- tiers -----
+    def _stored(self, url: str) -> Optional[PageValidators]:
+        return self.validators.get_validators(url) if self.validators is not None else None
+
+    def _try_http(self, url: str, extract: Callable[[str], Any], fetched: Optional[HttpPage] = None,
+                  stored: Optional[PageValidators] = None,
+                  cancel: Optional[threading.Event] = None) -> tuple[Optional[FetchResult], str]:
+        """
+        HTTP tier. Returns (result, None) ถ้าใช้ผลจาก HTTP ได้ หรือ (None, เหตุผลที่ต้องใช้ browser).
+        fetched / stored: ผลของ _get และ validators ที่ดึงมาแล้ว (async path รอ slot บน event loop เอง)
+        cancel: probe ที่ไม่ต้องการผลแล้ว — ไม่ GET ต่อ, คืน slot ทันที และไม่เขียน validators
+        """
+        if not self.http_tier:
+            return None, 'http-tier-off'
+        extractor = getattr(extract, '__qualname__', '')
+        if fetched is None:
+            stored = self._stored(url)
+            with self.scheduler.slot(url):
+                if cancel is not None and cancel.is_set():
+                    return None, 'cancelled'
+                fetched = self._get(url, stored, cancel)
+            if cancel is not None and cancel.is_set():
+                return None, 'cancelled'
+        if fetched.unchanged:
+            with self._lock:
+                self.stats['not_modified' if fetched.status == 304 else 'unchanged'] += 1
+            if stored.extractor == extractor and (fetched.etag, fetched.last_modified) == stored[:2]:
+                self.validators.touch_validators(url)
+                return FetchResult(url, stored.html, stored.data, HTTP_TIER, fetched.status), None
+            data = stored.data if stored.extractor == extractor else extract(stored.html)
+            self.validators.put_validators(url, fetched.etag, fetched.last_modified, fetched.digest,
+                                           stored.html, extractor, data)
+            return FetchResult(url, stored.html, data, HTTP_TIER, fetched.status), None
+        html, status, reason = fetched[:3]
+        if reason is None:
+            data = extract(html) if html else []
+            if data or not html or not self.looks_dynamic(html):
+                if html and self.validators is not None and status == 200:
+                    self.validators.put_validators(url, fetched.etag, fetched.last_modified, fetched.digest,
+                                                   html, extractor, data)
+                return FetchResult(url, html, data, HTTP_TIER if html else NO_TIER, status), None
+            reason = 'dynamic-no-result'
+        return None, reason
+
+    async def _atry_http(self, url: str, extract: Callable[[str], Any],
+                         cancel: Optional[threading.Event] = None) -> tuple[Optional[FetchResult], str]:
+        """_try_http() สำหรับ asyncio: รอ slot ของ host บน event loop, GET/extract ใน thread"""
+        if not self.http_tier:
+            return None, 'http-tier-off'
+        stored = await asyncio.to_thread(self._stored, url) if self.validators is not None else None
+        async with self.scheduler.aslot(url):
+            fetched = await asyncio.to_thread(self._get, url, stored, cancel)
+        return await asyncio.to_thread(self._try_http, url, extract, fetched, stored)
+
+    def _browser(self, url: str, browser_fetch: Callable[[str], str]) -> str:
+        with self.scheduler.slot(url):
+            return browser_fetch(url)
+
+    def fetch(self, url: str, extract: Callable[[str], Any], browser_fetch: Callable[[str], str]) -> FetchResult:
+        """HTTP ก่อน; browser_fetch(url) -> html เมื่อจำเป็น. result.data = extract(html)"""
+        start = time.perf_counter()
+        result, reason = self._try_http(url, extract)
+        if result is not None:
+            return self._done(result, start)
+        try:
+            html = self._browser(url, browser_fetch)
+        except Exception:
+            self._done(FetchResult(url, '', [], NO_TIER, None, reason), start)
+            raise
+        return self._done(FetchResult(url, html, extract(html) if html else [], BROWSER_TIER, None, reason), start)
+
+    async def afetch(self, url: str, extract: Callable[[str], Any], browser_fetch) -> FetchResult:
+        """fetch() สำหรับ asyncio: HTTP/extract ทำใน thread, browser_fetch เป็น coroutine function"""
+        start = time.perf_counter()
+        result, reason = await self._atry_http(url, extract)
+        if result is not None:
+            return self._done(result, start)
+        return await self._abrowser(url, reason, extract, browser_fetch, start)
+
+    async def _abrowser(self, url, reason, extract, browser_fetch, start) -> FetchResult:
+        try:
+            async with self.scheduler.aslot(url):
+                html = await browser_fetch(url)
+        except Exception:
+            self._done(FetchResult(url, '', [], NO_TIER, None, reason), start)
+            raise
+        data = await asyncio.to_thread(extract, html) if html else []
+        return self._done(FetchResult(url, html, data, BROWSER_TIER, None, reason), start)
+
+    # ----- speculative probing -----
+    def probe(self, urls: list, extract: Callable[[str], Any], browser_fetch: Callable[[str], str],
+              max_parallel: int = 3) -> Iterator[tuple[int, FetchResult]]:
+        """
+        ยิง HTTP tier ของทุก URL พร้อมกัน (สูงสุด max_parallel ต่อครั้ง — ทุก URL เป็น host เดียวกัน)
+        แล้ว yield (index, result) ตามลำดับความสำคัญของ urls. Browser fallback ทำบน thread ของผู้เรียก
+        ตามลำดับ (sync Playwright ใช้ข้าม thread ไม่ได้). ผู้เรียก break เมื่อเจอ data → URL ที่เหลือถูกยกเลิก.
+        Browser error ของ URL หนึ่งได้ result ว่าง (tier 'none') แทนการหยุดทั้ง probe.
+        """
+        start = time.perf_counter()
+        pool = ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix='probe')
+        # cancel_futures ทิ้งได้เฉพาะ GET ที่ยังไม่เริ่ม; ที่วิ่งอยู่เช็ค event นี้แล้วปิด response / คืน slot
+        cancel = threading.Event()
+        try:
+            futures = [pool.submit(self._try_http, url, extract, cancel=cancel) for url in urls]
+            for i, (url, future) in enumerate(zip(urls, futures)):
+                result, reason = future.result()
+                if result is not None:
+                    yield i, self._done(result, start)
+                    continue
+                try:
+                    html = self._browser(url, browser_fetch)
+                    result = FetchResult(url, html, extract(html) if html else [], BROWSER_TIER, None, reason)
+                except Exception:
+                    result = FetchResult(url, '', [], NO_TIER, None, reason)
+                yield i, self._done(result, start)
+        finally:
+            cancel.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def aprobe(self, urls: list, extract: Callable[[str], Any], browser_fetch,
+                     max_parallel: int = 3) -> AsyncIterator[tuple[int, FetchResult]]:
+        """probe() สำหรับ asyncio (ใช้กับ contextlib.aclosing เพื่อยกเลิก URL ที่เหลือทันทีเมื่อ break)"""
+        start = time.perf_counter()
+        sem = asyncio.Semaphore(max(1, max_parallel))
+        # task.cancel() ไม่หยุด GET ที่วิ่งอยู่ใน thread — event นี้ให้ _get หยุดอ่าน body
+        cancel = threading.Event()
+
+        async def http(url):
+            async with sem:
+                return await self._atry_http(url, extract, cancel)
+
+        tasks = [asyncio.create_task(http(url)) for url in urls]
+        try:
+            for i, (url, task) in enumerate(zip(urls, tasks)):
+                result, reason = await task
+                if result is not None:
+                    yield i, self._done(result, start)
+                    continue
+                try:
+                    result = await self._abrowser(url, reason, extract, browser_fetch, start)
+                except Exception:
+                    result = FetchResult(url, '', [], NO_TIER, None, reason)
+                yield i, result
+        finally:
+            cancel.set()
+            for task in tasks:
+                task.cancel()
+
+    # ----- stats -----
+    def _done(self, result: FetchResult, start: float) -> FetchResult:
+        result.elapsed = time.perf_counter() - start
+        with self._lock:
+            self.stats[result.tier] += 1
+            if result.reason:
+                self.stats['reasons'][result.reason] = self.stats['reasons'].get(result.reason, 0) + 1
+            if self._log_path:
+                try:
+                    with open(self._log_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps({
+                            'url': result.url, 'tier': result.tier, 'reason': result.reason,
+                            'status': result.status, 'ms': round(result.elapsed * 1000, 1),
+                        }, ensure_ascii=False) + '\n')
+                except OSError:
+                    pass
+        return result
+
+    def summary(self) -> str:
+        with self._lock:
+            total = self.stats[HTTP_TIER] + self.stats[BROWSER_TIER] + self.stats[NO_TIER]
+            if not total:
+                return '[FETCH] no pages fetched'
+            parts = [f"{tier} {self.stats[tier]} ({self.stats[tier] * 100 // total}%)"
+                     for tier in (HTTP_TIER, BROWSER_TIER, NO_TIER) if self.stats[tier]]
+            reasons = ', '.join(f"{k} {v}" for k, v in sorted(self.stats['reasons'].items(), key=lambda kv: -kv[1]))
+            reused = self.stats['not_modified'] + self.stats['unchanged']
+            revalidated = (f" | reused unchanged: {reused} ({self.stats['not_modified']} via 304, "
+                           f"{self.stats['unchanged']} same hash)") if reused else ''
+        return (f"[FETCH] {total} pages: " + ', '.join(parts) + (f" | browser because: {reasons}" if reasons else '')
+                + revalidated)
+
+    def close(self) -> None:
+        self._session.close()
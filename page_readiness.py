@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Event-driven page readiness แทน page.wait_for_timeout(N) แบบตายตัว.
+
+หลัง page.goto() ให้รอจนกว่า:
+  - มีลิงก์ mailto: หรือข้อความที่หน้าตาเหมือนอีเมลใน DOM  → 'mailto' / 'email'
+  - DOM ไม่เปลี่ยนและไม่มี resource ใหม่โหลดติดกัน quiet_ms    → 'quiet'
+  - ครบ cap_ms (hard cap)                                        → 'cap'
+หน้าเร็วจึงไม่ต้องจ่าย 1.5–2.5 s เต็ม และหน้าช้าได้เวลามากขึ้นจนถึง cap.
+
+    ready = PageReadiness(cap_ms=3000)
+    page.goto(url, wait_until='commit')
+    ready.wait(page, url)            # sync Playwright
+    await ready.await_ready(page, url)   # async Playwright
+    print(ready.summary())
+
+Env:
+  PAGE_READY          0 = กลับไปใช้ fixed wait (fixed_ms) แบบเดิม (default 1)
+  PAGE_READY_QUIET_MS ช่วงเงียบที่ถือว่าหน้าโหลดเสร็จ (default 500)
+  PAGE_READY_LOG      path ของ JSONL: url, ms, reason ต่อหน้า
+"""
+import os
+import json
+import time
+import threading
+from typing import Optional
+
+# รันใน page: resolve เป็นเหตุผลที่หน้า "พร้อม" (mailto | email | quiet | cap)
+_READY_JS = r"""
+(opts) => new Promise((resolve) => {
+    const emailRe = /[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}/;
+    const start = performance.now();
+    let lastChange = start;
+    let resources = -1;
+    let observer = null;
+    let timer = null;
+    const finish = (reason) => {
+        if (timer) clearInterval(timer);
+        if (observer) observer.disconnect();
+        resolve(reason);
+    };
+    const found = () => {
+        if (document.querySelector('a[href^="mailto:" i]')) return 'mailto';
+        const body = document.body;
+        if (body && emailRe.test(body.textContent || '')) return 'email';
+        return null;
+    };
+    const tick = () => {
+        const hit = found();
+        if (hit) return finish(hit);
+        const now = performance.now();
+        const count = performance.getEntriesByType('resource').length;
+        if (count !== resources) {
+            resources = count;
+            lastChange = now;
+        }
+        if (now - start >= opts.cap) return finish('cap');
+        if (document.readyState !== 'loading' && now - lastChange >= opts.quiet && now - start >= opts.min) {
+            return finish('quiet');
+        }
+    };
+    observer = new MutationObserver(() => { lastChange = performance.now(); });
+    observer.observe(document, {subtree: true, childList: true, characterData: true});
+    timer = setInterval(tick, opts.poll);
+    tick();
+})
+"""
+
+
+def _env_flag(name: str, default: str = '1') -> bool:
+    return os.getenv(name, default).strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+class PageReadiness:
+    """
+    cap_ms: เวลารอสูงสุดหลัง goto (hard cap). quiet_ms: DOM/network เงียบนานเท่านี้ = พร้อม.
+    min_ms: เวลารอขั้นต่ำก่อนยอมรับ 'quiet' (หน้าอย่าง Facebook ที่ render เป็นช่วงๆ).
+    fixed_ms: เวลารอแบบตายตัวเมื่อปิดด้วย PAGE_READY=0 (default = cap_ms).
+    """
+
+    def __init__(self, cap_ms: int = 3000, quiet_ms: Optional[int] = None, min_ms: int = 0,
+                 poll_ms: int = 100, fixed_ms: Optional[int] = None):
+        self.enabled = _env_flag('PAGE_READY')
+        self.cap_ms = cap_ms
+        self.fixed_ms = cap_ms if fixed_ms is None else fixed_ms
+        if quiet_ms is None:
+            try:
+                quiet_ms = int(os.getenv('PAGE_READY_QUIET_MS', '500'))
+            except ValueError:
+                quiet_ms = 500
+        self.quiet_ms = quiet_ms
+        self.min_ms = min_ms
+        self.poll_ms = poll_ms
+        self._lock = threading.Lock()
+        self._log_path = os.getenv('PAGE_READY_LOG')
+        self.stats = {'pages': 0, 'total_ms': 0.0, 'reasons': {}, 'samples': []}
+
+    def _opts(self) -> dict:
+        return {'cap': self.cap_ms, 'quiet': self.quiet_ms, 'min': self.min_ms, 'poll': self.poll_ms}
+
+    def wait(self, page, url: Optional[str] = None) -> str:
+        """Sync Playwright: รอจนหน้าพร้อม. Returns เหตุผล"""
+        start = time.perf_counter()
+        if not self.enabled:
+            page.wait_for_timeout(self.fixed_ms)
+            return self._record(url, start, 'fixed')
+        try:
+            reason = page.evaluate(_READY_JS, self._opts())
+        except Exception:
+            # navigation/redirect ทำลาย execution context กลางทาง — รอส่วนที่เหลือแบบเดิม
+            remaining = self.cap_ms - (time.perf_counter() - start) * 1000
+            if remaining > 0:
+                page.wait_for_timeout(min(remaining, self.quiet_ms * 2))
+            reason = 'context-lost'
+        return self._record(url, start, reason)
+
+    async def await_ready(self, page, url: Optional[str] = None) -> str:
+        """Async Playwright version of wait()"""
+        start = time.perf_counter()
+        if not self.enabled:
+            await page.wait_for_timeout(self.fixed_ms)
+            return self._record(url, start, 'fixed')
+        try:
+            reason = await page.evaluate(_READY_JS, self._opts())
+        except Exception:
+            remaining = self.cap_ms - (time.perf_counter() - start) * 1000
+            if remaining > 0:
+                await page.wait_for_timeout(min(remaining, self.quiet_ms * 2))
+            reason = 'context-lost'
+        return self._record(url, start, reason)
+
+    def _record(self, url: Optional[str], start: float, reason: str) -> str:
+        ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.stats['pages'] += 1
+            self.stats['total_ms'] += ms
+            self.stats['reasons'][reason] = self.stats['reasons'].get(reason, 0) + 1
+            if len(self.stats['samples']) < 10000:
+                self.stats['samples'].append(ms)
+            if self._log_path:
+                try:
+                    with open(self._log_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps({'url': url, 'ms': round(ms, 1), 'reason': reason}, ensure_ascii=False) + '\n')
+                except OSError:
+                    pass
+        return reason
+
+    def summary(self, label: str = 'browser pages') -> str:
+        with self._lock:
+            n = self.stats['pages']
+            if not n:
+                return f'[READY] no {label}'
+            samples = sorted(self.stats['samples'])
+            p50 = samples[len(samples) // 2]
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            reasons = ', '.join(f"{k} {v}" for k, v in sorted(self.stats['reasons'].items(), key=lambda kv: -kv[1]))
+        cap = self.cap_ms if self.enabled else self.fixed_ms
+        return f"[READY] {n} {label}: time-to-ready p50 {p50:.0f} ms, p95 {p95:.0f} ms (cap {cap} ms) | {reasons}"
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: api_client pooled session vs. per-call requests.request.
+รัน stand-in API ในเครื่อง (ไม่ต้องมี Laravel) แล้ววัด calls/sec ของ create_email
+Usage from map-main: python scripts/bench_api_client.py --calls 2000 --threads 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+if sys.platform == "win32":
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception:
+        pass
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """ตอบทุก request แบบ JSON สั้นๆ คล้าย POST /api/emails (HTTP/1.1 keep-alive)"""
+    protocol_version = "HTTP/1.1"
+    # Send headers+body in one segment, otherwise Nagle/delayed-ACK adds ~40ms per keep-alive call
+    disable_nagle_algorithm = True
+
+    def _reply(self, code=201):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        body = json.dumps({"id": 1, "ok": True}).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply(200)
+
+    def do_POST(self):
+        self._reply(201)
+
+    def do_PATCH(self):
+        self._reply(200)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connect_delay = 0.0
+
+    def get_request(self):
+        # Simulate per-connection setup cost (TCP/TLS handshake on a slow host).
+        conn = super().get_request()
+        if self.connect_delay:
+            time.sleep(self.connect_delay)
+        return conn
+
+
+def run_calls(fn, calls, threads):
+    start = time.perf_counter()
+    errors = 0
+    if threads <= 1:
+        for i in range(calls):
+            if not fn(i):
+                errors += 1
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as ex:
+            for ok in ex.map(fn, range(calls)):
+                if not ok:
+                    errors += 1
+    return time.perf_counter() - start, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark api_client session pooling")
+    parser.add_argument("--calls", type=int, default=2000, help="จำนวน calls ต่อโหมด")
+    parser.add_argument("--threads", type=int, default=1, help="จำนวน threads ที่ยิงพร้อมกัน")
+    parser.add_argument("--connect-delay-ms", type=float, default=0.0, help="หน่วงเวลาต่อ connection ใหม่ (จำลอง handshake)")
+    args = parser.parse_args()
+
+    server = StandInServer(("127.0.0.1", 0), StandInHandler)
+    server.connect_delay = args.connect_delay_ms / 1000.0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    os.environ["CHECKIN_API_URL"] = base
+    os.environ.setdefault("API_POOL_SIZE", str(max(1, args.threads)))
+    import api_client
+
+    payload = {"place_id": "bench", "email": "bench@example.com", "source": "BENCH"}
+
+    def per_call(i):
+        # Previous behavior: module-level requests.request => new connection per call
+        r = requests.request("POST", f"{base}/api/emails", json=payload, timeout=60)
+        return r.status_code in (200, 201)
+
+    def pooled(i):
+        return api_client.create_email(payload["place_id"], payload["email"], payload["source"]) is not None
+
+    print("=" * 60)
+    print(f"Stand-in API: {base}  calls={args.calls}  threads={args.threads}  connect_delay={args.connect_delay_ms}ms")
+    print("=" * 60)
+    results = {}
+    for name, fn in (("per-call", per_call), ("pooled", pooled)):
+        fn(0)  # warm-up
+        elapsed, errors = run_calls(fn, args.calls, args.threads)
+        results[name] = args.calls / elapsed if elapsed else 0.0
+        print(f"{name:<10} {elapsed:8.2f}s  {results[name]:10.1f} calls/sec  errors={errors}")
+    if results.get("per-call"):
+        print(f"speedup    {results['pooled'] / results['per-call']:.2f}x")
+
+    api_client.close_session()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: targeted Facebook contact extraction (fb_extract) vs. the old full-HTML regex
+(email_extract.extract_emails + phone regex บน page.content() ทั้งหน้า).
+
+Corpus = หน้า About ของ Facebook ที่บันทึกไว้ (.html/.htm). ถ้ามี expected.json ในโฟลเดอร์เดียวกัน
+({"<file name>": {"email": "...", "phone": "..."}, ...}) จะวัด accuracy ด้วย — ไม่งั้นเทียบผลสองวิธีกันเอง.
+ถ้าไม่ระบุ --corpus จะสร้างหน้าจำลองขนาดใกล้เคียงหน้าจริง (script bundle หลาย MB, JSON blobs ของ feed,
+contact อยู่ใน mailto / About field JSON / visible text / ไม่มีเลย) พร้อมคำตอบ
+Usage from map-main:
+  python scripts/bench_fb_extract.py --corpus output/fb_pages --repeat 3
+  python scripts/bench_fb_extract.py --pages 40
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+if sys.platform == "win32":
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception:
+        pass
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import email_extract  # noqa: E402
+import fb_extract  # noqa: E402
+
+LEGACY_PHONE = r'\b(?:0\d{1,2}[\s-]?\d{3}[\s-]?\d{4}|\+66[\s-]?\d{1,2}[\s-]?\d{3}[\s-]?\d{4})\b'
+
+
+def legacy_extract(html):
+    """Stage 3 extract_data ก่อนใช้ fb_extract: regex ทั้งหน้า"""
+    emails = email_extract.extract_emails(html, exclude=('facebook', 'fb.com'))
+    phones = re.findall(LEGACY_PHONE, html)
+    return (emails[0] if emails else None), (phones[0] if phones else None)
+
+
+def targeted_extract(html):
+    contacts = fb_extract.extract_contacts(html)
+    return (contacts.emails[0] if contacts.emails else None), (contacts.phones[0] if contacts.phones else None)
+
+
+def _bundle(rnd, kb, noise_email, noise_phone):
+    """JS bundle ปลอม: โค้ด + (บาง bundle) อีเมล/ตัวเลขของ library ที่ regex ทั้งหน้าจะหยิบไปผิดๆ"""
+    unit = ('__d("CometProfile",["React"],function(a,b,c){var e=%d;c.exports={v:"0.%d",w:function(x){return x*2}}'
+            '},null);' % (rnd.randint(10 ** 14, 10 ** 15), rnd.randint(1, 99)))
+    body = unit * max(1, kb * 1024 // len(unit))
+    if noise_email:
+        body += 'c.exports.report="bugs@sentry-relay.io";'
+    if noise_phone:
+        body += 'var t=[0212345678,0898765432];'
+    return '<script>' + body + '</script>'
+
+
+def _feed_blob(rnd, items):
+    rows = [{"id": str(rnd.randint(10 ** 14, 10 ** 15)), "__typename": "Story",
+             "message": {"text": "โปรโมชั่นวันนี้ ลด 20% ทุกเมนู " * 3},
+             "creation_time": rnd.randint(1_600_000_000, 1_700_000_000),
+             "tracking": "AZ" + "x" * 80} for _ in range(items)]
+    return ('<script type="application/json" data-sjs>'
+            + json.dumps({"require": [["ScheduledServerJS", "handle", None, [{"__bbox": {"result": rows}}]]]})
+            + '</script>')
+
+
+def _about_field(field_type, value, escape_at=True):
+    text = value.replace('@', '\\u0040') if escape_at else value
+    return ('{"__typename":"ProfileFieldSection","field_type":"%s","renderer":{"field":'
+            '{"text_content":{"text":"%s"},"icon":{"uri":"https:\\/\\/static.xx.fbcdn.net\\/rsrc.php\\/x.png"}}}}'
+            % (field_type, text))
+
+
+def synthetic_corpus(pages, seed=11):
+    """
+    หน้า ~1–3 MB: contact ใน mailto 30%, About field JSON 40%, visible text 15%, ไม่มี 15%.
+    35% ของหน้ามีอีเมลของ library และ 50% มีตัวเลขคล้ายเบอร์ใน JS bundle (noise ที่หน้าจริงมี)
+    """
+    rnd = random.Random(seed)
+    corpus = []
+    for n in range(pages):
+        email = f"contact{n}@shop{n % 37}.co.th"
+        phone = f"08{rnd.randint(1, 9)}-{rnd.randint(100, 999)}-{rnd.randint(1000, 9999)}"
+        style = rnd.random()
+        parts = ['<!DOCTYPE html><html id="facebook"><head><title>Shop | Facebook</title>',
+                 '<meta property="og:url" content="https://www.facebook.com/shop%d">' % n]
+        noise_email, noise_phone = rnd.random() < 0.35, rnd.random() < 0.5
+        bundles = rnd.randint(3, 5)
+        parts.extend(_bundle(rnd, rnd.randint(200, 500), noise_email and i == 0, noise_phone and i == 0)
+                     for i in range(bundles))
+        parts.append(_feed_blob(rnd, rnd.randint(50, 200)))
+        parts.append('</head><body><div role="main"><span>Intro</span>')
+        if style < 0.30:
+            truth = (email, phone)
+            parts.append(f'<div><a href="mailto:{email}">{email}</a></div><div><a href="tel:{phone}">{phone}</a></div>')
+        elif style < 0.70:
+            truth = (email, phone)
+            fields = ','.join([_about_field('phone', phone, False), _about_field('email', email)])
+            parts.append('<script type="application/json" data-sjs>{"about_app_sections":[' + fields + ']}</script>')
+        elif style < 0.85:
+            truth = (email, phone)
+            parts.append(f'<div><span>ติดต่อ</span> <span>{email}</span> <span>โทร {phone}</span></div>')
+        else:
+            truth = (None, None)
+            parts.append('<div><span>Page · Restaurant</span></div>')
+        parts.append('<footer>help@facebook.com</footer></div></body></html>')
+        corpus.append((f"synthetic-{n}", ''.join(parts), truth))
+    return corpus
+
+
+def load_corpus(path):
+    root = Path(path)
+    expected = {}
+    if (root / 'expected.json').exists():
+        expected = json.loads((root / 'expected.json').read_text(encoding='utf-8'))
+    files = sorted(p for p in root.rglob('*') if p.suffix.lower() in ('.html', '.htm'))
+    corpus = []
+    for p in files:
+        truth = expected.get(p.name)
+        truth = (truth.get('email'), truth.get('phone')) if truth is not None else None
+        corpus.append((str(p), p.read_text(encoding='utf-8', errors='replace'), truth))
+    return corpus
+
+
+def timed(fn, corpus, repeat):
+    """CPU time (process_time) ที่ดีที่สุดจาก repeat รอบ"""
+    best = None
+    results = None
+    for _ in range(repeat):
+        start = time.process_time()
+        results = [fn(html) for _, html, _ in corpus]
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def score(corpus, results):
+    """(email ถูก, email ผิด/false positive, phone ถูก, phone ผิด) บนหน้าที่มีคำตอบ"""
+    counts = [0, 0, 0, 0]
+    for (_, _, truth), (email, phone) in zip(corpus, results):
+        if truth is None:
+            continue
+        for i, (got, want) in enumerate(((email, truth[0]), (phone, truth[1]))):
+            if got == want:
+                counts[i * 2] += 1
+            elif got is not None:
+                counts[i * 2 + 1] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Facebook contact extraction (full-HTML regex vs fb_extract)')
+    parser.add_argument('--corpus', help='directory of saved Facebook About pages (+ optional expected.json)')
+    parser.add_argument('--pages', type=int, default=40, help='synthetic pages when --corpus is not given')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per implementation (best CPU time is reported)')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.pages)
+    if not corpus:
+        print(f"[ERROR] no .html pages in {args.corpus}")
+        return 1
+    size_mb = sum(len(html) for _, html, _ in corpus) / 1e6
+    labelled = sum(1 for _, _, truth in corpus if truth is not None)
+    print(f"Corpus: {len(corpus)} pages, {size_mb:.1f} MB, {labelled} with expected contacts")
+
+    email_extract.normalize_email.cache_clear()
+    legacy_s, legacy = timed(legacy_extract, corpus, args.repeat)
+    targeted_s, targeted = timed(targeted_extract, corpus, args.repeat)
+    for label, seconds in (('full-HTML regex (legacy)', legacy_s), ('fb_extract (targeted)', targeted_s)):
+        print(f"{label:26s} {seconds:7.3f}s CPU  {len(corpus) / max(seconds, 1e-9):8.1f} pages/s  "
+              f"{size_mb / max(seconds, 1e-9):7.1f} MB/s")
+    print(f"Speedup: {legacy_s / max(targeted_s, 1e-9):.1f}x")
+
+    if labelled:
+        for label, results in (('legacy', legacy), ('fb_extract', targeted)):
+            e_ok, e_bad, p_ok, p_bad = score(corpus, results)
+            print(f"{label:10s} email correct {e_ok}/{labelled}, wrong {e_bad} | "
+                  f"phone correct {p_ok}/{labelled}, wrong {p_bad}")
+    layers = {}
+    for _, html, _ in corpus:
+        source = fb_extract.extract_contacts(html).source or 'none'
+        layers[source] = layers.get(source, 0) + 1
+    print("fb_extract email found by layer: " + ', '.join(f"{k} {v}" for k, v in layers.items()))
+
+    diffs = [(name, a, b) for (name, _, _), a, b in zip(corpus, legacy, targeted) if a != b]
+    print(f"Same (email, phone) on {len(corpus) - len(diffs)}/{len(corpus)} pages")
+    for name, a, b in diffs[:10]:
+        print(f"  {name}: legacy {a} fb_extract {b}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
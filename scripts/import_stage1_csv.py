@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stage 1 CSV -> API importer (streaming, chunked, gzip, resumable).
+อ่าน CSV ทีละแถว ส่งเป็น chunk (gzip) ไปที่ POST /api/places/import
+แต่ละ chunk retry ได้ และเขียน checkpoint — ถ้าล้มกลางทาง รันซ้ำจะเริ่มต่อจาก chunk ที่พัง.
+Usage from map-main: python scripts/import_stage1_csv.py output/results.csv --chunk-size 500
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from pathlib import Path
+
+if sys.platform == "win32":
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception:
+        pass
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# gosom rows can carry very long fields (reviews, opening hours) in one cell
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+IMPORT_CHUNK_SIZE = max(1, int(os.environ.get("PIPELINE_IMPORT_CHUNK", "500")))
+IMPORT_RETRIES = max(0, int(os.environ.get("PIPELINE_IMPORT_RETRIES", "3")))
+IMPORT_TIMEOUT = max(10, int(os.environ.get("PIPELINE_IMPORT_TIMEOUT", "120")))
+
+
+def row_to_place(row: dict) -> dict:
+    """แปลง 1 แถวจาก gosom CSV เป็น payload ของ /api/places/import"""
+    return {
+        "place_id": row.get("place_id") or row.get("cid") or "",
+        "cid": row.get("cid") or "",
+        "title": row.get("title") or "",
+        "name": row.get("title") or "",
+        "website": row.get("website") or "",
+        "phone": row.get("phone") or "",
+        "address": row.get("address") or "",
+        "category": row.get("category") or "",
+        "review_count": row.get("review_count") or None,
+        "review_rating": row.get("review_rating") or None,
+        "latitude": row.get("latitude") or None,
+        "longitude": row.get("longitude") or None,
+        "url": row.get("link") or row.get("website") or "",
+        "raw_data": json.dumps(row, ensure_ascii=False),
+    }
+
+
+def checkpoint_path(csv_path: Path) -> Path:
+    return csv_path.with_name(csv_path.name + ".import.json")
+
+
+def _csv_identity(csv_path: Path, chunk_size: int) -> dict:
+    st = csv_path.stat()
+    return {"csv": str(csv_path.resolve()), "size": st.st_size, "mtime": int(st.st_mtime), "chunk_size": chunk_size}
+
+
+def _load_checkpoint(path: Path, identity: dict) -> dict:
+    """Checkpoint ใช้ได้เฉพาะ CSV ไฟล์เดิม (ขนาด/mtime เท่าเดิม) และ chunk size เดิม"""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if all(data.get(k) == v for k, v in identity.items()):
+            return data
+    except Exception:
+        pass
+    return dict(identity, chunks_done=0, rows_done=0, created=0, updated=0)
+
+
+def _save_checkpoint(path: Path, state: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def iter_chunks(csv_path: Path, chunk_size: int, skip_chunks: int = 0):
+    """Yield (chunk_index, [place, ...]) อ่านไฟล์ทีละแถว (ไม่โหลดทั้งไฟล์เข้า memory)"""
+    with csv_path.open("r", encoding="utf-8", errors="replace", newline="") as f:
+        reader = csv.DictReader(f)
+        chunk = []
+        index = 0
+        for row in reader:
+            if not any((v or "").strip() for v in row.values() if isinstance(v, str)):
+                continue
+            if index < skip_chunks:
+                # Rows of chunks already imported are only counted, not converted
+                chunk.append(None)
+            else:
+                chunk.append(row_to_place(row))
+            if len(chunk) >= chunk_size:
+                if index >= skip_chunks:
+                    yield index, chunk
+                index += 1
+                chunk = []
+        if chunk and index >= skip_chunks:
+            yield index, chunk
+
+
+def _send_chunk(api_client, chunk: list) -> tuple:
+    last_err = None
+    for attempt in range(IMPORT_RETRIES + 1):
+        if attempt:
+            time.sleep(min(30, 2 ** attempt))
+        resp, err = api_client.import_places(chunk, compress=True, timeout=IMPORT_TIMEOUT)
+        if not err:
+            return resp or {}, None
+        last_err = err
+    return None, last_err
+
+
+def import_stage1_csv_to_api(csv_path: Path, chunk_size: int = None, log=None):
+    """Returns (ok, message) แบบเดียวกับของเดิมใน run_pipeline_test.py"""
+    try:
+        import api_client
+    except Exception as e:
+        return False, f"cannot import api_client: {e}"
+
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        return False, "results.csv not found"
+    chunk_size = max(1, chunk_size or IMPORT_CHUNK_SIZE)
+    ckpt = checkpoint_path(csv_path)
+    state = _load_checkpoint(ckpt, _csv_identity(csv_path, chunk_size))
+    resumed_from = state["chunks_done"]
+    if resumed_from and log:
+        log(f"      CSV -> API: resuming at chunk {resumed_from + 1} ({state['rows_done']} rows already imported)")
+
+    try:
+        for index, chunk in iter_chunks(csv_path, chunk_size, skip_chunks=resumed_from):
+            resp, err = _send_chunk(api_client, chunk)
+            if err:
+                return False, f"chunk {index + 1} failed after {IMPORT_RETRIES + 1} attempts: {err} (re-run to resume)"
+            state["chunks_done"] = index + 1
+            state["rows_done"] += len(chunk)
+            state["created"] += int(resp.get("created", 0) or 0)
+            state["updated"] += int(resp.get("updated", 0) or 0)
+            _save_checkpoint(ckpt, state)
+    except Exception as e:
+        return False, str(e)
+
+    if state["rows_done"] == 0:
+        return True, "no rows to import"
+    try:
+        ckpt.unlink()
+    except OSError:
+        pass
+    return True, (
+        f"created={state['created']}, updated={state['updated']}, total={state['rows_done']}, "
+        f"chunks={state['chunks_done']}" + (f", resumed_from_chunk={resumed_from + 1}" if resumed_from else "")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import Stage 1 CSV into the API (chunked, resumable)")
+    parser.add_argument("csv", nargs="?", default=str(PROJECT_ROOT / "output" / "results.csv"), help="path to gosom results.csv")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="จำนวนแถวต่อ request")
+    parser.add_argument("--restart", action="store_true", help="ไม่ใช้ checkpoint เดิม เริ่ม import ใหม่ทั้งหมด")
+    args = parser.parse_args()
+    csv_path = Path(args.csv)
+    if args.restart:
+        try:
+            checkpoint_path(csv_path).unlink()
+        except OSError:
+            pass
+    ok, msg = import_stage1_csv_to_api(csv_path, chunk_size=args.chunk_size, log=print)
+    print(f"CSV -> API: {'OK' if ok else 'FAILED'} ({msg})")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
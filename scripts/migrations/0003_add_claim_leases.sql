@@ -0,0 +1,14 @@
+-- Migration 0003: Lease-based work claiming (claim_places / claim_discovered_urls)
+-- Created: 2026-10-17
+-- claimed_by = worker id, lease_expires_at = unix time; expired PROCESSING rows go back to NEW on next claim
+
+ALTER TABLE places ADD COLUMN claimed_by TEXT;
+ALTER TABLE places ADD COLUMN lease_expires_at INTEGER;
+ALTER TABLE discovered_urls ADD COLUMN claimed_by TEXT;
+ALTER TABLE discovered_urls ADD COLUMN lease_expires_at INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_places_status_lease
+ON places(status, lease_expires_at);
+
+CREATE INDEX IF NOT EXISTS idx_discovered_urls_status_lease
+ON discovered_urls(status, lease_expires_at);
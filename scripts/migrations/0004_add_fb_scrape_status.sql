@@ -0,0 +1,10 @@
+-- Migration 0004: Per-place Facebook scrape status for incremental Stage 3
+-- Created: 2026-10-17
+-- fb_status = DONE / NO_EMAIL / FAILED, fb_scraped_at = unix time of the last Stage 3 attempt
+-- Stage 3 only picks pages never scraped, older than FB_RESCRAPE_DAYS, or FAILED older than FB_RETRY_HOURS
+
+ALTER TABLE places ADD COLUMN fb_status TEXT;
+ALTER TABLE places ADD COLUMN fb_scraped_at INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_places_fb_status_scraped
+ON places(fb_status, fb_scraped_at);
@@ -10,7 +10,6 @@ import subprocess
 import urllib.parse
 import urllib.request
 import json
-import csv
 from pathlib import Path
 
 if sys.platform == "win32":
@@ -46,6 +45,8 @@ PIPELINE_INACTIVITY = os.environ.get("PIPELINE_INACTIVITY", "3m")
 PIPELINE_RADIUS = max(1000, int(os.environ.get("PIPELINE_RADIUS", "7000")))
 PIPELINE_DEPTH = max(1, int(os.environ.get("PIPELINE_DEPTH", "2")))
 TH_LOCATIONS_FILE = PROJECT_ROOT / "data" / "th_locations.json"
+# Stage 2–4 ต่อ Chromium ตัวเดียวของ browser_service.py แทนการ launch เองทีละ stage
+PIPELINE_BROWSER_SERVICE = os.environ.get("PIPELINE_BROWSER_SERVICE", "0").strip().lower() not in ("", "0", "false", "no", "off")
 
 def _load_th_locations():
     try:
@@ -57,48 +58,9 @@ def _load_th_locations():
 
 TH_LOCATIONS = _load_th_locations()
 
-def import_stage1_csv_to_api(csv_path: Path):
-    try:
-        import api_client
-    except Exception as e:
-        return False, f"cannot import api_client: {e}"
-
-    if not csv_path.exists():
-        return False, "results.csv not found"
-    try:
-        text = csv_path.read_text(encoding="utf-8", errors="replace")
-        lines = [ln for ln in text.splitlines() if ln.strip()]
-        if len(lines) <= 1:
-            return True, "no rows to import"
-        reader = csv.DictReader(lines)
-        payload = []
-        for row in reader:
-            payload.append(
-                {
-                    "place_id": row.get("place_id") or row.get("cid") or "",
-                    "cid": row.get("cid") or "",
-                    "title": row.get("title") or "",
-                    "name": row.get("title") or "",
-                    "website": row.get("website") or "",
-                    "phone": row.get("phone") or "",
-                    "address": row.get("address") or "",
-                    "category": row.get("category") or "",
-                    "review_count": row.get("review_count") or None,
-                    "review_rating": row.get("review_rating") or None,
-                    "latitude": row.get("latitude") or None,
-                    "longitude": row.get("longitude") or None,
-                    "url": row.get("link") or row.get("website") or "",
-                    "raw_data": json.dumps(row, ensure_ascii=False),
-                }
-            )
-        resp, err = api_client.import_places(payload)
-        if err:
-            return False, err
-        created = (resp or {}).get("created", 0)
-        updated = (resp or {}).get("updated", 0)
-        return True, f"created={created}, updated={updated}, total={len(payload)}"
-    except Exception as e:
-        return False, str(e)
+# Streaming, chunked (gzip) and resumable CSV -> API import (scripts/import_stage1_csv.py)
+sys.path.insert(0, str(PROJECT_ROOT / "scripts"))
+from import_stage1_csv import import_stage1_csv_to_api
 
 def get_stage1_binary():
     raw = os.environ.get("GOOGLE_MAPS_SCRAPER_BIN", "").strip()
@@ -136,6 +98,40 @@ def run_cmd(cmd, env=None, cwd=None, timeout_sec=300):
         return -1, str(e)
 
 
+def start_browser_service(env, log):
+    """
+    Start browser_service.py (ถ้ายังไม่รัน) แล้วตั้ง BROWSER_SERVICE ใน env ของ stage.
+    Returns Popen ที่ต้องปิดตอนจบ (None = ใช้ service ที่รันอยู่แล้ว หรือ start ไม่ได้ → stage launch เอง)
+    """
+    import browser_service
+    url = browser_service.resolve(env.get("BROWSER_SERVICE") or "1")
+    if browser_service.version(url):
+        env["BROWSER_SERVICE"] = url
+        log(f"Browser service: {url} (already running)")
+        return None
+    parts = urllib.parse.urlsplit(url)
+    proc = subprocess.Popen(
+        [sys.executable, "browser_service.py", "--port", str(parts.port or browser_service.DEFAULT_PORT),
+         "--host", parts.hostname or browser_service.DEFAULT_HOST],
+        cwd=str(PROJECT_ROOT), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    if browser_service.wait_ready(url, timeout=30):
+        env["BROWSER_SERVICE"] = url
+        log(f"Browser service: {url} (started, pid {proc.pid})")
+        return proc
+    proc.terminate()
+    log("Browser service: failed to start; stages launch their own Chromium")
+    return None
+
+def stop_browser_service(proc):
+    if proc is None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
 def _quote_cmd_arg(s):
     s = str(s)
     if " " in s:
@@ -342,7 +338,7 @@ def main():
                 approx_rows = max(0, lines)
                 log(f"      CSV rows (approx): {approx_rows}")
             if approx_rows > 0:
-                ok, msg = import_stage1_csv_to_api(RESULTS_CSV)
+                ok, msg = import_stage1_csv_to_api(RESULTS_CSV, log=log)
                 log(f"      CSV -> API: {'OK' if ok else 'FAILED'} ({msg})")
         else:
             log(f"Result: FAILED (return code {code})")
@@ -352,6 +348,8 @@ def main():
                     log("  " + line)
         log("")
 
+    service = start_browser_service(env, log) if PIPELINE_BROWSER_SERVICE else None
+
     # ---------- Stage 2 ----------
     log("--- Stage 2: Website Email Finder ---")
     cmd = [sys.executable, "stage2_email_finder.py", "--db", str(DB_FILE), "--api", "--verbose"]
@@ -397,6 +395,8 @@ def main():
                 log("  " + line)
     log("")
 
+    stop_browser_service(service)
+
     log("=" * 60)
     log("Summary: see above")
     log("=" * 60)
@@ -5,17 +5,27 @@ Stage 2: Email Finder - PLAYWRIGHT VERSION 🚀
 - ใช้ Playwright แทน requests
 - หลบ bot detection ได้ดีกว่า
 - รัน JavaScript ได้
+- record ที่จบได้โดยไม่โหลดหน้า (อีเมลใน Maps data, ไม่มี website / เป็น social link, อยู่ใน crawl cache)
+  ทำก่อนในรอบเดียว; Playwright / requests / lxml ถูก import และ browser ถูก launch เมื่อมี record ที่ต้องใช้เท่านั้น
 """
+import os
 import sys
+import socket
 import sqlite3
 import json
 import re
 import time
+import asyncio
 import argparse
+import itertools
+import threading
+import contextlib
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
-from email_validator import validate_email, EmailNotValidError
-from playwright.sync_api import sync_playwright
+import email_extract
+import browser_service
+from crawl_cache import CrawlCache
+from interception import InterceptionPolicy
+from page_readiness import PageReadiness
 
 # Fix Windows console encoding
 if sys.platform == 'win32':
@@ -24,9 +34,17 @@ if sys.platform == 'win32':
     except:
         pass
 
+# SQLite busy timeout (seconds): with several workers on one pipeline.db a claim/commit waits for the
+# write lock instead of failing. SQLITE_TIMEOUT overrides (raise it when running many workers).
+try:
+    SQLITE_TIMEOUT = max(1.0, float(os.getenv('SQLITE_TIMEOUT', '30')))
+except ValueError:
+    SQLITE_TIMEOUT = 30.0
+
 
 class EmailFinderPlaywright:
-    def __init__(self, db_path, verbose=False, use_api=False, api_base_url=None):
+    def __init__(self, db_path, verbose=False, use_api=False, api_base_url=None,
+                 worker_id=None, lease_seconds=900, claim_batch=10, browser_service_url=None):
         self.db_path = db_path
         self.verbose = verbose
         self.use_api = use_api
@@ -44,20 +62,71 @@ class EmailFinderPlaywright:
         
         # Settings
         self.page_timeout = 8000  # 8 seconds
-        self.wait_time = 1500  # 1.5 seconds after load
-        
-        # Email regex patterns
-        self.email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        self.encoded_email_pattern = r'\b[A-Za-z0-9._%+-]+\s*[\[\(]?\s*at\s*[\]\)]?\s*[A-Za-z0-9.-]+\s*[\[\(]?\s*dot\s*[\]\)]?\s*[A-Z|a-z]{2,}\b'
+        self.wait_time = 1500  # 1.5 seconds after load (fixed wait when PAGE_READY=0)
         
         # Facebook URL pattern
         self.facebook_pattern = r'https?://(?:www\.|m\.|mobile\.)?facebook\.com/[^\s\"\'>]+'
         
-        # Playwright objects (will be initialized in run())
+        # Playwright objects (started on the first page that needs a browser)
         self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
+        
+        # Shared long-lived Chromium (browser_service.py) when running; otherwise launch our own
+        self.browser_service_url = browser_service.resolve(browser_service_url)
+        
+        # Website results reused across places/runs (chains share a site)
+        self.crawl_cache = CrawlCache.from_env()
+        
+        # Plain HTTP first, Chromium only for JS-rendered / blocked pages (created on the first crawl, see fetcher)
+        self._fetcher = None
+        
+        # Browserless pass: records that never need a page load are finished before any crawl
+        self.browserless = os.getenv('BROWSERLESS_PASS', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+        self.browserless_stats = {'maps': 0, 'no website': 0, 'cached': 0}
+        self._deferred = []
+        # counts ถูกแก้ทั้งจาก worker coroutines และจาก browserless pass ใน thread (run_workers, API mode)
+        self._counts_lock = threading.Lock()
+        
+        # Browser pages: wait until an email/mailto shows up or the page goes quiet, not a fixed 1.5 s
+        self.ready = PageReadiness(cap_ms=self.wait_time * 2, fixed_ms=self.wait_time)
+        
+        # Phase 3: follow the homepage's own contact/about links instead of guessing paths
+        self.contact_discovery = os.getenv('CONTACT_DISCOVERY', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+        try:
+            self.contact_links_max = max(1, int(os.getenv('CONTACT_LINKS_MAX', '3')))
+        except ValueError:
+            self.contact_links_max = 3
+        
+        # Browser request blocking (types + third-party hosts) with per-page request/byte counts
+        self.intercept = InterceptionPolicy.from_env()
+        
+        # Buffered API writer, spool-backed (created in run() when using API)
+        self._writer = None
+        
+        # Work claiming: each worker leases a batch of NEW records, so several
+        # Stage 2 processes (same host or not) never crawl the same place.
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.claim_batch = max(1, claim_batch)
+        self._claimed_pending = []
+        self._claim_supported = None  # decided by the first claim
+        try:
+            self.claim_retry_seconds = max(0.0, float(os.getenv('CLAIM_RETRY_SECONDS', '600')))
+        except ValueError:
+            self.claim_retry_seconds = 600.0
+    
+    @property
+    def fetcher(self):
+        """
+        TieredFetcher (requests + lxml) — import และสร้างเมื่อมีหน้าแรกที่ต้องโหลด.
+        หน้าที่เคยโหลดแล้วถูก revalidate (ETag / Last-Modified / content hash) แทนการ extract ใหม่
+        """
+        if self._fetcher is None:
+            from page_fetcher import TieredFetcher
+            self._fetcher = TieredFetcher(timeout=self.page_timeout / 1000, validators=self.crawl_cache)
+        return self._fetcher
     
     def connect_db(self):
         """Connect to SQLite database or no-op when using API"""
@@ -67,7 +136,8 @@ class EmailFinderPlaywright:
             if self.verbose:
                 print(f"[OK] Using API: {self.api_base_url}")
             return
-        self.conn = sqlite3.connect(self.db_path)
+        # N workers share the DB: wait for the write lock instead of failing with 'database is locked'
+        self.conn = sqlite3.connect(self.db_path, timeout=SQLITE_TIMEOUT)
         self.cursor = self.conn.cursor()
         if self.verbose:
             print(f"[OK] Connected to database: {self.db_path}")
@@ -81,36 +151,32 @@ class EmailFinderPlaywright:
             if self.verbose:
                 print("[OK] Closed database connection")
     
+    # Browser settings (shared by the sync engine and the --workers async engine)
+    # Same flags as browser_service (Stages 2-4 share one list so they can't drift apart)
+    LAUNCH_ARGS = browser_service.LAUNCH_ARGS
+    CONTEXT_OPTIONS = {
+        'viewport': {'width': 1920, 'height': 1080},
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'bypass_csp': True,
+    }
+    
     def init_browser(self):
         """Initialize Playwright browser"""
         if self.verbose:
             print("[BROWSER] Launching Chromium...")
         
+        from playwright.sync_api import sync_playwright
         self.playwright = sync_playwright().start()
         
-        # Launch browser with optimizations
-        self.browser = self.playwright.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-gpu',
-                '--no-sandbox',
-                '--disable-dev-shm-usage',
-                '--disable-web-security',
-                '--disable-features=IsolateOrigins,site-per-process',
-            ]
-        )
+        # Connect to the browser service, or launch a browser with optimizations
+        self.browser, _ = browser_service.launch(self.playwright, self.LAUNCH_ARGS, self.browser_service_url,
+                                                 log=print if self.verbose else None)
         
         # Create context with optimizations
-        self.context = self.browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            bypass_csp=True,
-        )
+        self.context = self.browser.new_context(**self.CONTEXT_OPTIONS)
         
-        # Block images and CSS to speed up
-        self.context.route("**/*.{png,jpg,jpeg,gif,svg,webp,mp4,avi,mov}", lambda route: route.abort())
-        self.context.route("**/*.css", lambda route: route.abort())
+        # Block images/fonts/CSS and third-party analytics/ads/widgets (interception.py)
+        self.intercept.install(self.context)
         
         # Create page
         self.page = self.context.new_page()
@@ -120,6 +186,8 @@ class EmailFinderPlaywright:
     
     def close_browser(self):
         """Close Playwright browser"""
+        if not self.playwright:
+            return
         if self.page:
             self.page.close()
         if self.context:
@@ -154,28 +222,18 @@ class EmailFinderPlaywright:
     def get_new_records(self, limit=None):
         """Get records with status='NEW' (from DB or API)"""
         if self.use_api and self._api:
-            per_page = min(500, limit) if limit else 500
-            page = 1
-            data = []
-            while True:
-                r = self._api.get_places(status='NEW', per_page=per_page, page=page)
-                chunk = (r or {}).get('data') or []
-                if not chunk:
-                    break
-                data.extend(chunk)
-                if limit and len(data) >= limit:
-                    data = data[:limit]
-                    break
-                current_page = int((r or {}).get('current_page') or page)
-                last_page = int((r or {}).get('last_page') or current_page)
-                if current_page >= last_page:
-                    break
-                if len(chunk) < per_page:
-                    break
-                page += 1
-            records = [(p.get('place_id'), p.get('name', ''), p.get('website') or '', p.get('raw_data') or '{}') for p in data]
+            # Stream pages (next page prefetched while the current one is processed)
+            records = self._api.iter_places(
+                status='NEW',
+                per_page=min(500, limit) if limit else 500,
+                limit=limit,
+                transform=lambda p: (p.get('place_id'), p.get('name', ''), p.get('website') or '', p.get('raw_data') or '{}'),
+            )
             if self.verbose:
-                print(f"[INFO] Found {len(records)} records with status='NEW' (API)")
+                if records.total is None:
+                    print("[INFO] Streaming records with status='NEW' (API, total unknown)")
+                else:
+                    print(f"[INFO] Found {records.total} records with status='NEW' (API)")
             return records
         sql = "SELECT place_id, name, website, raw_data FROM places WHERE status='NEW'"
         if limit:
@@ -197,29 +255,118 @@ class EmailFinderPlaywright:
         )
         self.conn.commit()
     
+    def claim_records(self, n):
+        """Claim up to n NEW records for this worker (status=PROCESSING + lease).
+        Expired leases go back to NEW first. Returns None if claiming is not supported — decided on
+        the first claim only. After that, transient failures (API 429/5xx / connection error / open
+        breaker, locked DB) are retried with backoff for up to claim_retry_seconds, then raised."""
+        retry_until = time.monotonic() + self.claim_retry_seconds
+        delay = 1.0
+        transient = (sqlite3.OperationalError,) + (self._api.TRANSIENT_ERRORS if self._api else ())
+        while True:
+            try:
+                records = self._claim_records_once(n)
+                if records is not None or self._claim_supported is None:
+                    self._claim_supported = records is not None
+                    return records
+                error = 'claim endpoint not available'
+            except transient as e:
+                error = e
+            wait = getattr(error, 'retry_in', delay) + 0.1
+            if time.monotonic() + wait > retry_until:
+                raise RuntimeError(f"Claiming records failed for {self.claim_retry_seconds:g}s: {error}")
+            print(f"[WARNING] Claim failed ({error}); retrying in {wait:.0f}s")
+            time.sleep(wait)
+            delay = min(delay * 2, 60.0)
+    
+    def _claim_records_once(self, n):
+        """1 claim attempt: rows, None = claiming not supported (no endpoint / migration 0003 / RETURNING),
+        raise on transient errors"""
+        if self.use_api and self._api:
+            rows = self._api.claim_places(n, self.worker_id, self.lease_seconds)
+            if rows is None:
+                return None
+            return [(p.get('place_id'), p.get('name', ''), p.get('website') or '', p.get('raw_data') or '{}') for p in rows]
+        now = int(time.time())
+        try:
+            self.cursor.execute("BEGIN IMMEDIATE")
+            self.cursor.execute("""
+                UPDATE places SET status='NEW', claimed_by=NULL, lease_expires_at=NULL
+                WHERE status='PROCESSING' AND lease_expires_at IS NOT NULL AND lease_expires_at < ?
+            """, (now,))
+            self.cursor.execute("""
+                UPDATE places
+                SET status='PROCESSING', claimed_by=?, lease_expires_at=?, updated_at=?
+                WHERE place_id IN (
+                    SELECT place_id FROM places WHERE status='NEW' ORDER BY place_id LIMIT ?
+                )
+                RETURNING place_id, name, website, raw_data
+            """, (self.worker_id, now + self.lease_seconds, now, n))
+            records = self.cursor.fetchall()
+            self.conn.commit()
+            return records
+        except sqlite3.OperationalError as e:
+            self.conn.rollback()
+            if 'locked' in str(e) or 'busy' in str(e):
+                raise  # another worker holds the write lock longer than the busy timeout: retry
+            # DB without migration 0003 (or SQLite < 3.35 without RETURNING)
+            if self.verbose and self._claim_supported is None:
+                print(f"[WARNING] Claiming not available ({e}); using list + lock")
+            return None
+    
+    def release_records(self, place_ids):
+        """คืน record ที่ claim ไว้แต่ยังไม่ได้เริ่มทำ กลับเป็น NEW"""
+        if not place_ids:
+            return
+        if self.use_api and self._api:
+            if self._writer:
+                for place_id in place_ids:
+                    self._writer.set_place_status(place_id, 'NEW')
+            else:
+                self._api.update_places_status_bulk([{'place_id': pid, 'status': 'NEW'} for pid in place_ids])
+            return
+        self.cursor.executemany(
+            "UPDATE places SET status='NEW', claimed_by=NULL, lease_expires_at=NULL WHERE place_id=? AND claimed_by=?",
+            [(pid, self.worker_id) for pid in place_ids]
+        )
+        self.conn.commit()
+    
+    def iter_claimed_records(self, first_batch, limit=None):
+        """Yield claimed records, claiming the next batch when the current one is used up"""
+        batch = first_batch
+        taken = 0
+        while batch:
+            self._claimed_pending = list(batch)
+            while self._claimed_pending:
+                record = self._claimed_pending.pop(0)
+                taken += 1
+                yield record
+            n = min(self.claim_batch, limit - taken) if limit else self.claim_batch
+            if n <= 0:
+                break
+            batch = self.claim_records(n)
+    
     # ==================== Phase 2: Extract from Maps Data ====================
     
+    def maps_emails(self, raw_data_json):
+        """อีเมลที่ valid ใน raw_data JSON (ไม่ log; raise เมื่อ JSON เสีย)"""
+        raw_data = json.loads(raw_data_json)
+        emails_str = raw_data.get('emails', '')
+        valid_emails = []
+        if emails_str and isinstance(emails_str, str) and emails_str.strip():
+            for email in re.split(r'[,;]', emails_str):
+                email = email.strip()
+                if email and self.validate_email(email):
+                    valid_emails.append(email)
+        return valid_emails
+    
     def extract_from_maps_data(self, raw_data_json):
         """Parse raw_data JSON และดึงอีเมล"""
         try:
-            raw_data = json.loads(raw_data_json)
-            emails_str = raw_data.get('emails', '')
-            
-            if emails_str and isinstance(emails_str, str) and emails_str.strip():
-                raw_emails = re.split(r'[,;]', emails_str)
-                valid_emails = []
-                
-                for email in raw_emails:
-                    email = email.strip()
-                    if email and self.validate_email(email):
-                        valid_emails.append(email)
-                
-                if valid_emails:
-                    if self.verbose:
-                        print(f"   [OK] Phase 2 (Maps): Found {len(valid_emails)} emails")
-                    return valid_emails
-            
-            return []
+            valid_emails = self.maps_emails(raw_data_json)
+            if valid_emails and self.verbose:
+                print(f"   [OK] Phase 2 (Maps): Found {len(valid_emails)} emails")
+            return valid_emails
             
         except Exception as e:
             if self.verbose:
@@ -230,10 +377,7 @@ class EmailFinderPlaywright:
     
     def decode_email(self, text):
         """แปลง encoded email"""
-        decoded = text.lower()
-        decoded = re.sub(r'\s*[\[\(]?\s*at\s*[\]\)]?\s*', '@', decoded)
-        decoded = re.sub(r'\s*[\[\(]?\s*dot\s*[\]\)]?\s*', '.', decoded)
-        return decoded.strip()
+        return email_extract.decode_email(text)
     
     def find_facebook_urls(self, html):
         """หา Facebook URLs ใน HTML"""
@@ -263,7 +407,10 @@ class EmailFinderPlaywright:
         """บันทึก discovered URL ลง database หรือ API"""
         if self.use_api and self._api:
             try:
-                self._api.create_discovered_url(place_id, url, url_type, 'STAGE2')
+                if self._writer:
+                    self._writer.add_discovered_url(place_id, url, url_type, 'STAGE2')
+                else:
+                    self._api.create_discovered_url(place_id, url, url_type, 'STAGE2')
                 return True
             except Exception as e:
                 if self.verbose:
@@ -282,137 +429,217 @@ class EmailFinderPlaywright:
                 print(f"   [WARNING] Save discovered URL error: {e}")
             return False
     
-    def crawl_page(self, url, place_id=None):
-        """ดึงอีเมลจากหน้า URL ด้วย Playwright"""
+    def save_facebook_urls(self, html, place_id):
+        """🔗 หา Facebook URLs ในหน้าแล้วบันทึกลง discovered_urls. Returns URLs ที่เจอ"""
+        facebook_urls = self.find_facebook_urls(html)
+        if facebook_urls:
+            if self.verbose:
+                print(f"   [FOUND] {len(facebook_urls)} Facebook URL(s) → saving to discovered_urls")
+            for fb_url in facebook_urls:
+                self.save_discovered_url(place_id, fb_url, 'FACEBOOK')
+        return facebook_urls
+    
+    def note_page(self, html, place_id, found):
+        """หน้าที่โหลดได้: save Facebook URLs และจดไว้ใน found (ใช้เก็บลง crawl cache)"""
+        if not html:
+            return
+        facebook_urls = self.save_facebook_urls(html, place_id) if place_id else self.find_facebook_urls(html)
+        if found is not None:
+            found['pages'] += 1
+            found['facebook_urls'].extend(u for u in facebook_urls if u not in found['facebook_urls'])
+    
+    def extract_emails(self, html):
+        """ดึงอีเมลจาก HTML (ไม่แตะ DB/browser — เรียกจาก thread อื่นได้)"""
+        return email_extract.extract_emails(html)
+    
+    def browser_html(self, url):
+        """เปิดหน้าด้วย Playwright แล้วคืน HTML (browser เริ่มตอนเรียกครั้งแรก)"""
+        if self.page is None:
+            self.init_browser()
+        
+        # Navigate with fast settings
+        self.page.goto(url, wait_until='commit', timeout=self.page_timeout)
+        
+        # Wait for content (email/mailto in DOM, DOM+network quiet, or cap)
+        self.ready.wait(self.page, url)
+        
+        # Get page content
+        return self.page.content()
+    
+    def fetch_page(self, url, place_id=None, found=None):
+        """โหลดหน้า URL (HTTP ก่อน, Playwright เมื่อจำเป็น). Returns FetchResult หรือ None เมื่อ error"""
         try:
-            # Navigate with fast settings
-            self.page.goto(url, wait_until='commit', timeout=self.page_timeout)
-            
-            # Wait for content
-            self.page.wait_for_timeout(self.wait_time)
-            
-            # Get page content
-            html = self.page.content()
-            
-            # 🔗 NEW: Find and save Facebook URLs
-            if place_id:
-                facebook_urls = self.find_facebook_urls(html)
-                if facebook_urls:
-                    if self.verbose:
-                        print(f"   [FOUND] {len(facebook_urls)} Facebook URL(s) → saving to discovered_urls")
-                    for fb_url in facebook_urls:
-                        self.save_discovered_url(place_id, fb_url, 'FACEBOOK')
-            
-            # Parse with BeautifulSoup
-            soup = BeautifulSoup(html, 'lxml')
-            text = soup.get_text()
-            
-            # Find normal emails
-            raw_emails = set()
-            raw_emails.update(re.findall(self.email_pattern, text, re.IGNORECASE))
-            raw_emails.update(re.findall(self.email_pattern, html, re.IGNORECASE))
-            
-            # Find encoded emails
-            encoded_emails = re.findall(self.encoded_email_pattern, text, re.IGNORECASE)
-            for encoded in encoded_emails:
-                decoded = self.decode_email(encoded)
-                raw_emails.add(decoded)
+            result = self.fetcher.fetch(url, self.extract_emails, self.browser_html)
+            if self.verbose and result.tier == 'browser':
+                print(f"   [BROWSER] {result.reason}")
             
-            # Validate emails
-            valid_emails = []
-            for email in raw_emails:
-                email = email.strip().lower()
-                validated = self.validate_email(email)
-                if validated:
-                    valid_emails.append(validated)
+            self.note_page(result.html, place_id, found)
             
-            return list(set(valid_emails))
+            return result
             
         except Exception as e:
             if self.verbose:
                 print(f"   [WARNING] Error: {str(e)[:50]}")
-            return []
+            return None
     
-    def crawl_website(self, website_url, place_id):
-        """Crawl website - PLAYWRIGHT VERSION"""
+    def crawl_page(self, url, place_id=None, found=None):
+        """ดึงอีเมลจากหน้า URL"""
+        result = self.fetch_page(url, place_id, found)
+        return (result.data or []) if result else []
+    
+    def normalize_website(self, website_url):
+        """คืน URL ที่ crawl ได้ (เติม https://) หรือ None ถ้าไม่ใช่ website ของร้าน"""
         if not website_url or not isinstance(website_url, str):
-            return []
+            return None
         
         # Check invalid websites
         if self.is_invalid_website(website_url):
             if self.verbose:
                 print(f"   [SKIP] Invalid website: {website_url}")
-            return []
+            return None
         
         # Fix URL format
         if not website_url.startswith(('http://', 'https://')):
             website_url = 'https://' + website_url
-        
-        emails = []
-        
-        # Phase 3.1: Homepage
-        if self.verbose:
-            print(f"   [SEARCH] Phase 3.1 (Homepage): {website_url}")
-        homepage_emails = self.crawl_page(website_url, place_id)  # Pass place_id
-        if homepage_emails:
-            emails.extend(homepage_emails)
+        return website_url
+    
+    def crawl_plan(self, website_url):
+        """ลำดับหน้าของ Phase 3: [(phase, label, url), ...] — หยุดที่หน้าแรกที่เจออีเมล"""
+        return [
+            ('3.1', 'Homepage', website_url),
+            ('3.2', 'Contact', urljoin(website_url, '/contact')),
+            ('3.2', 'Contact', urljoin(website_url, '/contact-us')),
+            ('3.3', 'About', urljoin(website_url, '/about')),
+            ('3.3', 'About', urljoin(website_url, '/about-us')),
+        ]
+    
+    def discovery_plan(self, website_url, homepage_html):
+        """
+        Phase 3.2+ จาก homepage ที่โหลดแล้ว: ลิงก์ติดต่อ/เกี่ยวกับเราของหน้าเอง → sitemap.xml →
+        path ที่เดา (crawl_plan เดิม). Returns [(phase, label, url), ...] ไม่เกิน contact_links_max (ยกเว้นเดา)
+        """
+        import contact_links
+        candidates = contact_links.rank_links(homepage_html, website_url, self.contact_links_max)
+        source = 'homepage links'
+        if not candidates:
+            sitemap = self.fetcher.fetch_text(urljoin(website_url, '/sitemap.xml'))
+            candidates = contact_links.sitemap_links(sitemap, website_url, self.contact_links_max)
+            source = 'sitemap.xml'
+        if not candidates:
             if self.verbose:
-                print(f"   [OK] Phase 3.1: Found {len(homepage_emails)} emails")
-            return emails
+                print(f"   [LINKS] No contact links found → guessing paths")
+            return self.crawl_plan(website_url)[1:]
+        if self.verbose:
+            print(f"   [LINKS] {len(candidates)} candidate page(s) from {source}")
+        return [('3.2', label, url) for _, url, label in candidates]
+    
+    def use_probing(self):
+        """Probe หน้า homepage/contact/about พร้อมกันได้เมื่อมี HTTP tier และ per-host cap > 1"""
+        return self.fetcher.http_tier and self.fetcher.probe_parallel > 1
+    
+    def report_probe(self, plan, index, result, place_id, found=None):
+        """Log + save Facebook URLs ของหน้าที่ probe ได้ (ตามลำดับ plan). Returns emails"""
+        phase, label, url = plan[index]
+        if self.verbose:
+            tier = f" [{result.tier}]" if result.tier != 'http' else ''
+            print(f"   [SEARCH] Phase {phase} ({label}): {url}{tier}")
+        self.note_page(result.html, place_id, found)
+        if result.data and self.verbose:
+            print(f"   [OK] Phase {phase}: Found {len(result.data)} emails")
+        return result.data or []
+    
+    def cached_website(self, website_url, place_id, entry=None):
+        """ผล crawl ของเว็บนี้จาก crawl cache (save Facebook URLs ให้ place นี้ด้วย) หรือ None.
+        entry: CacheEntry ที่อ่านมาแล้ว (browserless pass) — ไม่อ่าน cache ซ้ำ"""
+        if entry is None:
+            entry = self.crawl_cache.get('site', website_url)
+        if entry is None:
+            return None
+        if self.verbose:
+            print(f"   [CACHE] {website_url}: {len(entry.emails)} emails, "
+                  f"{len(entry.facebook_urls)} Facebook URL(s) (crawled {entry.age_hours:.1f}h ago)")
+        for fb_url in entry.facebook_urls:
+            self.save_discovered_url(place_id, fb_url, 'FACEBOOK')
+        return entry.emails
+    
+    def store_website(self, website_url, emails, found):
+        """เก็บผล crawl ลง cache — ไม่เก็บถ้าไม่มีหน้าไหนโหลดได้ (อาจแค่ล่มชั่วคราว)"""
+        if emails or found['pages']:
+            self.crawl_cache.put('site', website_url, emails, found['facebook_urls'])
+    
+    def crawl_website(self, website_url, place_id):
+        """Crawl website (crawl cache ก่อน) - PLAYWRIGHT VERSION"""
+        website_url = self.normalize_website(website_url)
+        if not website_url:
+            return []
         
-        time.sleep(0.5)
+        cached = self.cached_website(website_url, place_id)
+        if cached is not None:
+            return cached
         
-        # Phase 3.2: Contact Page
-        contact_urls = [
-            urljoin(website_url, '/contact'),
-            urljoin(website_url, '/contact-us'),
-        ]
+        found = {'pages': 0, 'facebook_urls': []}
+        emails = self.crawl_site(website_url, place_id, found)
+        self.store_website(website_url, emails, found)
+        return emails
+    
+    def crawl_site(self, website_url, place_id, found):
+        """Phase 3 (ไม่ผ่าน cache): homepage แล้วหน้าที่ลิงก์ของ homepage ชี้ไป, หรือ crawl_plan เมื่อ CONTACT_DISCOVERY=0"""
+        if not self.contact_discovery:
+            return self.crawl_pages(self.crawl_plan(website_url), place_id, found)
         
-        for contact_url in contact_urls:
+        if self.verbose:
+            print(f"   [SEARCH] Phase 3.1 (Homepage): {website_url}")
+        home = self.fetch_page(website_url, place_id, found)
+        if home and home.data:
             if self.verbose:
-                print(f"   [SEARCH] Phase 3.2 (Contact): {contact_url}")
-            contact_emails = self.crawl_page(contact_url, place_id)  # Pass place_id
-            if contact_emails:
-                emails.extend(contact_emails)
-                if self.verbose:
-                    print(f"   [OK] Phase 3.2: Found {len(contact_emails)} emails")
-                return emails
-            time.sleep(0.5)
-        
-        # Phase 3.3: About Page
-        about_urls = [
-            urljoin(website_url, '/about'),
-            urljoin(website_url, '/about-us'),
-        ]
+                print(f"   [OK] Phase 3.1: Found {len(home.data)} emails")
+            return home.data
+        if not (home and home.html):
+            # Homepage ไม่ตอบเลย (DNS / connection) — หน้าอื่นของ host เดียวกันก็เช่นกัน
+            return []
+        return self.crawl_pages(self.discovery_plan(website_url, home.html), place_id, found)
+    
+    def crawl_pages(self, plan, place_id, found):
+        """โหลดหน้าตาม plan (probe พร้อมกันหรือทีละหน้า) — หยุดที่หน้าแรกตามลำดับ plan ที่เจออีเมล"""
+        if self.use_probing():
+            # Speculative: all candidate pages in flight at once; plan order picks the winner
+            probe = self.fetcher.probe([url for _, _, url in plan], self.extract_emails, self.browser_html,
+                                       max_parallel=self.fetcher.probe_parallel)
+            try:
+                for index, result in probe:
+                    emails = self.report_probe(plan, index, result, place_id, found)
+                    if emails:
+                        return emails
+            finally:
+                probe.close()
+            return []
         
-        for about_url in about_urls:
+        # Pacing between pages of the same site comes from the fetcher's per-host scheduler
+        for phase, label, url in plan:
             if self.verbose:
-                print(f"   [SEARCH] Phase 3.3 (About): {about_url}")
-            about_emails = self.crawl_page(about_url, place_id)  # Pass place_id
-            if about_emails:
-                emails.extend(about_emails)
+                print(f"   [SEARCH] Phase {phase} ({label}): {url}")
+            emails = self.crawl_page(url, place_id, found)
+            if emails:
                 if self.verbose:
-                    print(f"   [OK] Phase 3.3: Found {len(about_emails)} emails")
+                    print(f"   [OK] Phase {phase}: Found {len(emails)} emails")
                 return emails
-            time.sleep(0.5)
         
-        return emails
+        return []
     
     # ==================== Email Management ====================
     
     def validate_email(self, email):
-        """Validate และ normalize email"""
-        try:
-            validated = validate_email(email, check_deliverability=False)
-            return validated.normalized
-        except EmailNotValidError:
-            return None
+        """Validate และ normalize email (cached)"""
+        return email_extract.normalize_email(email)
     
     def save_email(self, place_id, email, source):
         """Save email to emails table or API"""
         if self.use_api and self._api:
             try:
-                self._api.create_email(place_id, email, source)
+                if self._writer:
+                    self._writer.add_email(place_id, email, source)
+                else:
+                    self._api.create_email(place_id, email, source)
                 return True
             except Exception as e:
                 if self.verbose:
@@ -435,7 +662,10 @@ class EmailFinderPlaywright:
     def finalize_record(self, place_id, status):
         """UPDATE status"""
         if self.use_api and self._api:
-            self._api.update_place(place_id, {'status': status})
+            if self._writer:
+                self._writer.set_place_status(place_id, status)
+            else:
+                self._api.update_place(place_id, {'status': status})
             return
         self.cursor.execute(
             "UPDATE places SET status=?, updated_at=strftime('%s', 'now') WHERE place_id=?",
@@ -445,124 +675,428 @@ class EmailFinderPlaywright:
     
     # ==================== Main Processing ====================
     
-    def process_record(self, place_id, name, website, raw_data_json):
-        """Process 1 record"""
+    def begin_record(self, place_id, name, raw_data_json, locked=False):
+        """Phase 1 (lock) + Phase 2 (Maps data). Returns (emails, source)"""
         if self.verbose:
             print(f"\n{'='*60}")
             print(f"[PROCESSING] {name} (ID: {place_id})")
         
-        try:
-            # Phase 1: Lock
+        # Phase 1: Lock
+        if not locked:
             self.lock_record(place_id)
-            if self.verbose:
-                print(f"   [LOCK] Phase 1: Set status=PROCESSING")
+        if self.verbose:
+            print(f"   [LOCK] Phase 1: Set status=PROCESSING")
+        
+        # Phase 2: Extract from Maps Data
+        if self.verbose:
+            print(f"   [SEARCH] Phase 2: Maps Data...")
+        maps_emails = self.extract_from_maps_data(raw_data_json)
+        if maps_emails:
+            return maps_emails, 'MAPS'
+        return [], None
+    
+    def finish_record(self, place_id, emails_found, source):
+        """Save emails + Phase 5 (DONE / FAILED)"""
+        if emails_found:
+            for email in emails_found:
+                self.save_email(place_id, email, source)
             
-            emails_found = []
-            source = None
+            if self.verbose:
+                print(f"   [OK] Saved {len(emails_found)} emails (source: {source})")
             
-            # Phase 2: Extract from Maps Data
+            self.finalize_record(place_id, 'DONE')
             if self.verbose:
-                print(f"   [SEARCH] Phase 2: Maps Data...")
-            maps_emails = self.extract_from_maps_data(raw_data_json)
-            if maps_emails:
-                emails_found = maps_emails
-                source = 'MAPS'
+                print(f"   [OK] Phase 5: DONE")
+            return True
+        
+        self.finalize_record(place_id, 'FAILED')
+        if self.verbose:
+            print(f"   [FAILED] Phase 5: No email found")
+        return False
+    
+    def process_record(self, place_id, name, website, raw_data_json, locked=False, cached=None):
+        """Process 1 record (locked=True when already claimed with a lease;
+        cached = CacheEntry ของเว็บจาก browserless pass → Phase 3 ใช้ entry นั้น ไม่ crawl)"""
+        try:
+            emails_found, source = self.begin_record(place_id, name, raw_data_json, locked)
             
             # Phase 3: Crawl Website (if not found yet)
             if not emails_found and website:
                 if self.verbose:
                     print(f"   [SEARCH] Phase 3: Website...")
-                website_emails = self.crawl_website(website, place_id)  # Pass place_id
+                if cached is not None:
+                    website_emails = self.cached_website(self.normalize_website(website), place_id, cached)
+                else:
+                    website_emails = self.crawl_website(website, place_id)  # Pass place_id
                 if website_emails:
                     emails_found = website_emails
                     source = 'WEBSITE'
             
-            # Save emails
-            if emails_found:
-                for email in emails_found:
-                    self.save_email(place_id, email, source)
-                
-                if self.verbose:
-                    print(f"   [OK] Saved {len(emails_found)} emails (source: {source})")
-                
-                self.finalize_record(place_id, 'DONE')
+            return self.finish_record(place_id, emails_found, source)
+            
+        except Exception as e:
+            if self.verbose:
+                print(f"   [ERROR] {e}")
+            self.finalize_record(place_id, 'FAILED')
+            return False
+    
+    # ==================== Browserless Pass ====================
+    
+    def browserless_reason(self, website, raw_data_json):
+        """
+        (reason, entry): เหตุผลที่ record นี้จบได้โดยไม่โหลดหน้า — 'maps' (อีเมลใน Maps data), 'no website'
+        (ไม่มี / เป็น Facebook, LINE, Instagram), 'cached' (entry = CacheEntry ของเว็บ ส่งต่อให้ process_record
+        จะได้ไม่อ่าน cache ซ้ำ ซึ่งอาจหมดอายุไปแล้วและหลุดไป crawl บน event loop) — reason None = ต้อง crawl
+        """
+        try:
+            if self.maps_emails(raw_data_json):
+                return 'maps', None
+        except Exception:
+            pass  # JSON เสีย: Phase 2 ใน process_record จะ log เอง
+        if not website or self.is_invalid_website(website):
+            return 'no website', None
+        url = website if website.startswith(('http://', 'https://')) else 'https://' + website
+        # miss ไม่นับที่นี่: crawl_website ของ record นั้นจะอ่าน (และนับ) อีกครั้ง
+        entry = self.crawl_cache.get('site', url, count_miss=False)
+        if entry is not None:
+            return 'cached', entry
+        return None, None
+    
+    def browserless_pass(self, records, total, locked, counts):
+        """
+        อ่าน records ทีละชุด: record ที่จบได้โดยไม่โหลดหน้าทำทันที (ไม่แตะ fetcher/browser),
+        yield เฉพาะ record ที่ต้อง crawl ให้ engine ปกติ. ชุดละ claim_batch เมื่อ claim ด้วย lease
+        (record ที่รอ crawl ไม่ค้างนานกว่า batch ของมัน) ไม่งั้น 500
+        """
+        size = self.claim_batch if locked else 500
+        records = iter(records)
+        while True:
+            chunk = list(itertools.islice(records, size))
+            if not chunk:
+                return
+            self._deferred = []
+            for record in chunk:
+                place_id, name, website, raw_data_json = record
+                reason, entry = self.browserless_reason(website, raw_data_json)
+                if reason is None:
+                    self._deferred.append(record)
+                    continue
+                self.browserless_stats[reason] += 1
+                with self._counts_lock:
+                    counts['idx'] += 1
+                    idx = counts['idx']
+                print(f"[{idx}/{total}] " if total else f"[{idx}] ", end="")
+                ok = self.process_record(place_id, name, website, raw_data_json, locked=locked, cached=entry)
+                with self._counts_lock:
+                    counts['success' if ok else 'failed'] += 1
+            if self.verbose and self._deferred:
+                print(f"\n[FAST] {len(chunk) - len(self._deferred)}/{len(chunk)} records without page loads; "
+                      f"crawling {len(self._deferred)}")
+            while self._deferred:
+                yield self._deferred.pop(0)
+    
+    def browserless_summary(self):
+        s = self.browserless_stats
+        done = sum(s.values())
+        if not self.browserless:
+            return '[FAST] browserless pass disabled'
+        return (f"[FAST] {done} records without page loads: {s['maps']} Maps emails, "
+                f"{s['no website']} no/social website, {s['cached']} crawl cache")
+    
+    # ==================== Concurrent Engine (--workers N) ====================
+    
+    async def blocking_async(self, fn, *args):
+        """DB/API call จาก worker coroutine. API mode: รันใน thread — writer flush / claim / lock
+        เป็น HTTP แบบ sync และ round-trip เดียวจะหยุดทุก worker ถ้ารันบน loop.
+        SQLite mode: connection ผูกกับ loop thread (และ commit local เร็วพอ) — เรียกตรง"""
+        if self.use_api and self._api:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+    
+    async def browser_html_async(self, get_page, url):
+        """browser_html บน page ของ worker. get_page() สร้าง page เมื่อมี URL แรกที่ต้องใช้ browser"""
+        page = await get_page()
+        await page.goto(url, wait_until='commit', timeout=self.page_timeout)
+        await self.ready.await_ready(page, url)
+        return await page.content()
+    
+    async def fetch_page_async(self, get_page, url, place_id=None, found=None):
+        """fetch_page บน asyncio; HTTP tier และการ parse HTML ทำใน thread เพื่อไม่บล็อก worker อื่น"""
+        try:
+            result = await self.fetcher.afetch(url, self.extract_emails,
+                                               lambda target: self.browser_html_async(get_page, target))
+            if self.verbose and result.tier == 'browser':
+                print(f"   [BROWSER] {result.reason}")
+            await self.blocking_async(self.note_page, result.html, place_id, found)
+            return result
+        except Exception as e:
+            if self.verbose:
+                print(f"   [WARNING] Error: {str(e)[:50]}")
+            return None
+    
+    async def crawl_page_async(self, get_page, url, place_id=None, found=None):
+        """crawl_page บน asyncio"""
+        result = await self.fetch_page_async(get_page, url, place_id, found)
+        return (result.data or []) if result else []
+    
+    async def crawl_website_async(self, get_page, website_url, place_id):
+        """crawl_website เวอร์ชัน async (crawl cache + ลำดับหน้าเดียวกันจาก crawl_plan)"""
+        website_url = self.normalize_website(website_url)
+        if not website_url:
+            return []
+        
+        cached = await self.blocking_async(self.cached_website, website_url, place_id)
+        if cached is not None:
+            return cached
+        
+        found = {'pages': 0, 'facebook_urls': []}
+        emails = await self.crawl_site_async(get_page, website_url, place_id, found)
+        self.store_website(website_url, emails, found)
+        return emails
+    
+    async def crawl_site_async(self, get_page, website_url, place_id, found):
+        """crawl_site เวอร์ชัน async"""
+        if not self.contact_discovery:
+            return await self.crawl_pages_async(get_page, self.crawl_plan(website_url), place_id, found)
+        
+        if self.verbose:
+            print(f"   [SEARCH] Phase 3.1 (Homepage): {website_url}")
+        home = await self.fetch_page_async(get_page, website_url, place_id, found)
+        if home and home.data:
+            if self.verbose:
+                print(f"   [OK] Phase 3.1: Found {len(home.data)} emails")
+            return home.data
+        if not (home and home.html):
+            return []
+        plan = await asyncio.to_thread(self.discovery_plan, website_url, home.html)
+        return await self.crawl_pages_async(get_page, plan, place_id, found)
+    
+    async def crawl_pages_async(self, get_page, plan, place_id, found):
+        """crawl_pages เวอร์ชัน async"""
+        if self.use_probing():
+            probe = self.fetcher.aprobe([url for _, _, url in plan], self.extract_emails,
+                                        lambda target: self.browser_html_async(get_page, target),
+                                        max_parallel=self.fetcher.probe_parallel)
+            async with contextlib.aclosing(probe):
+                async for index, result in probe:
+                    emails = await self.blocking_async(self.report_probe, plan, index, result, place_id, found)
+                    if emails:
+                        return emails
+            return []
+        
+        for phase, label, url in plan:
+            if self.verbose:
+                print(f"   [SEARCH] Phase {phase} ({label}): {url}")
+            emails = await self.crawl_page_async(get_page, url, place_id, found)
+            if emails:
                 if self.verbose:
-                    print(f"   [OK] Phase 5: DONE")
-                return True
-            else:
-                self.finalize_record(place_id, 'FAILED')
+                    print(f"   [OK] Phase {phase}: Found {len(emails)} emails")
+                return emails
+        
+        return []
+    
+    async def process_record_async(self, get_page, place_id, name, website, raw_data_json, locked=False):
+        """process_record บน page ของ worker (phase และผลลัพธ์เหมือนเดิม)"""
+        try:
+            emails_found, source = await self.blocking_async(self.begin_record, place_id, name, raw_data_json, locked)
+            
+            if not emails_found and website:
                 if self.verbose:
-                    print(f"   [FAILED] Phase 5: No email found")
-                return False
+                    print(f"   [SEARCH] Phase 3: Website...")
+                website_emails = await self.crawl_website_async(get_page, website, place_id)
+                if website_emails:
+                    emails_found = website_emails
+                    source = 'WEBSITE'
+            
+            return await self.blocking_async(self.finish_record, place_id, emails_found, source)
             
         except Exception as e:
             if self.verbose:
                 print(f"   [ERROR] {e}")
-            self.finalize_record(place_id, 'FAILED')
+            await self.blocking_async(self.finalize_record, place_id, 'FAILED')
             return False
     
-    def run(self, limit=None):
-        """Main run method"""
+    async def run_workers(self, records, total, locked, workers, counts=None):
+        """
+        N workers ดึง record จาก iterator เดียวกัน. Browser (1 browser, 1 context, 1 page ต่อ worker)
+        เริ่มเมื่อมีหน้าแรกที่ HTTP tier ใช้ไม่ได้.
+        DB/API calls ผ่าน blocking_async (API mode: ใน thread; SQLite mode: บน loop thread ที่ connection ผูกอยู่)
+        counts: {'idx', 'success', 'failed'} ที่นับต่อจาก browserless pass
+        Returns (success_count, failed_count)
+        """
+        records = iter(records)
+        counts = counts if counts is not None else {'idx': 0, 'success': 0, 'failed': 0}
+        browser_state = {'playwright': None, 'browser': None, 'context': None}
+        browser_lock = asyncio.Lock()
+        # records เป็น generator (claim batch / browserless pass) — next() ได้ทีละ worker
+        records_lock = asyncio.Lock()
+        
+        async def new_page():
+            async with browser_lock:
+                if browser_state['context'] is None:
+                    from playwright.async_api import async_playwright
+                    if self.verbose:
+                        print(f"[BROWSER] Launching Chromium (up to {workers} pages)...")
+                    browser_state['playwright'] = await async_playwright().start()
+                    browser_state['browser'], _ = await browser_service.alaunch(
+                        browser_state['playwright'], self.LAUNCH_ARGS, self.browser_service_url,
+                        log=print if self.verbose else None)
+                    context = await browser_state['browser'].new_context(**self.CONTEXT_OPTIONS)
+                    await self.intercept.ainstall(context)
+                    browser_state['context'] = context
+            return await browser_state['context'].new_page()
+        
+        async def worker():
+            page = None
+            
+            async def get_page():
+                nonlocal page
+                if page is None:
+                    page = await new_page()
+                return page
+            
+            while True:
+                # next() อาจ claim batch ใหม่ หรือรอ page prefetch (sync HTTP) — ไม่บล็อก worker อื่น
+                async with records_lock:
+                    record = await self.blocking_async(next, records, None)
+                if record is None:
+                    return
+                with self._counts_lock:
+                    counts['idx'] += 1
+                    idx = counts['idx']
+                place_id, name, website, raw_data_json = record
+                print(f"[{idx}/{total}] {name}" if total else f"[{idx}] {name}")
+                ok = await self.process_record_async(get_page, place_id, name, website, raw_data_json, locked=locked)
+                with self._counts_lock:
+                    counts['success' if ok else 'failed'] += 1
+        
+        try:
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        finally:
+            if browser_state['browser']:
+                await browser_state['browser'].close()
+            if browser_state['playwright']:
+                await browser_state['playwright'].stop()
+                if self.verbose:
+                    print("[BROWSER] Closed")
+        return counts['success'], counts['failed']
+    
+    def run(self, limit=None, workers=1):
+        """Main run method (workers > 1: async engine with N concurrent pages)"""
         start_time = time.time()
         
         # Connect to database
         self.connect_db()
+        if self.use_api and self._api:
+            self._writer = self._api.open_writer(verbose=self.verbose)
+        
+        # every concurrent page should have a claimed record to start on
+        self.claim_batch = max(self.claim_batch, workers)
         
         try:
-            # Get records
-            records = self.get_new_records(limit)
-            
-            if not records:
+            # Get records: claim leased batches; fall back to list + lock per record
+            first_batch = self.claim_records(min(self.claim_batch, limit) if limit else self.claim_batch)
+            if first_batch is None:
+                records = self.get_new_records(limit)
+                total = len(records) if isinstance(records, list) else records.total
+                locked = False
+            else:
+                records = self.iter_claimed_records(first_batch, limit)
+                total = 0 if not first_batch else None
+                locked = True
+            if total == 0:
                 print("[INFO] No records to process (status='NEW')")
                 return
             
-            print(f"[START] Processing {len(records)} records...\n")
+            if locked:
+                print(f"[START] Worker {self.worker_id}: claiming records in batches of {self.claim_batch}...\n")
+            elif total is None:
+                # server did not report a total (old API / failed first page): no progress percentage
+                print("[START] Processing records with status='NEW' (total unknown)...\n")
+            else:
+                print(f"[START] Processing {total} records...\n")
             
-            # Initialize browser
-            self.init_browser()
+            counts = {'idx': 0, 'success': 0, 'failed': 0}
+            if self.browserless:
+                # Maps emails / no website / cached sites first; only the rest reach the crawl engine
+                records = self.browserless_pass(records, total, locked, counts)
             
-            success_count = 0
-            failed_count = 0
+            if workers > 1:
+                success_count, failed_count = asyncio.run(self.run_workers(records, total, locked, workers, counts))
+            else:
+                # Process records sequentially (browser starts on the first page that needs it)
+                for place_id, name, website, raw_data_json in records:
+                    counts['idx'] += 1
+                    print(f"[{counts['idx']}/{total}] " if total else f"[{counts['idx']}] ", end="")
+                    
+                    success = self.process_record(place_id, name, website, raw_data_json, locked=locked)
+                    
+                    if success:
+                        counts['success'] += 1
+                    else:
+                        counts['failed'] += 1
+                success_count, failed_count = counts['success'], counts['failed']
             
-            # Process records sequentially
-            for idx, (place_id, name, website, raw_data_json) in enumerate(records, 1):
-                print(f"[{idx}/{len(records)}] ", end="")
-                
-                success = self.process_record(place_id, name, website, raw_data_json)
-                
-                if success:
-                    success_count += 1
-                else:
-                    failed_count += 1
+            if total is None and not success_count + failed_count:
+                # total unknown up front: the list turned out to be empty
+                print("[INFO] No records to process (status='NEW')")
+                return
             
             elapsed = time.time() - start_time
             
             print(f"\n{'='*60}")
             print(f"[SUCCESS] {success_count} records")
             print(f"[FAILED] {failed_count} records")
-            print(f"[TIME] {elapsed:.2f} seconds ({elapsed/len(records):.2f}s per record)")
+            processed = max(1, success_count + failed_count)
+            print(f"[TIME] {elapsed:.2f} seconds ({elapsed/processed:.2f}s per record)")
+            print(self.browserless_summary())
+            if self._fetcher is not None:
+                print(self._fetcher.summary())
+                print(self.ready.summary())
+                print(self.crawl_cache.summary())
+                print(self._fetcher.scheduler.summary())
+                print(self.intercept.summary())
+            else:
+                print(self.crawl_cache.summary())
             print(f"{'='*60}")
             
         finally:
             # Cleanup
+            if self._claimed_pending or self._deferred:
+                self.release_records([r[0] for r in self._claimed_pending + self._deferred])
+                self._claimed_pending = []
+                self._deferred = []
             self.close_browser()
+            self.crawl_cache.close()
+            if self._writer:
+                self._writer.close()
+                self._writer = None
             self.close_db()
 
 
 def main():
-    import os
     parser = argparse.ArgumentParser(description='Stage 2: Email Finder (Playwright)')
     parser.add_argument('--db', default='pipeline.db', help='SQLite database path')
     parser.add_argument('--api', action='store_true', help='Use API (CHECKIN_API_URL) instead of SQLite')
     parser.add_argument('--limit', type=int, help='จำกัดจำนวน records')
     parser.add_argument('--verbose', '-v', action='store_true', help='แสดงข้อความละเอียด')
+    parser.add_argument('--worker-id', help='ชื่อ worker สำหรับ claim งาน (default: hostname-pid)')
+    parser.add_argument('--lease', type=int, default=900, help='อายุ lease ของงานที่ claim (วินาที)')
+    parser.add_argument('--claim-batch', type=int, default=10, help='จำนวน records ที่ claim ต่อครั้ง')
+    parser.add_argument('--workers', type=int, default=1, help='จำนวน page ที่ crawl พร้อมกัน (async Playwright)')
+    parser.add_argument('--browser-service', nargs='?', const='1', default=None, metavar='URL',
+                        help='ต่อ Chromium ของ browser_service.py (default env BROWSER_SERVICE); ไม่รันอยู่ = launch เอง')
     args = parser.parse_args()
     use_api = args.api or bool(os.environ.get('CHECKIN_API_URL') or os.environ.get('API_BASE_URL'))
     print("=" * 60)
     print("Stage 2: Email Finder - PLAYWRIGHT VERSION 🚀")
     print("=" * 60)
-    finder = EmailFinderPlaywright(args.db, verbose=args.verbose, use_api=use_api)
-    finder.run(limit=args.limit)
+    finder = EmailFinderPlaywright(
+        args.db, verbose=args.verbose, use_api=use_api,
+        worker_id=args.worker_id, lease_seconds=args.lease, claim_batch=args.claim_batch,
+        browser_service_url=args.browser_service,
+    )
+    finder.run(limit=args.limit, workers=max(1, args.workers))
     
     print("\n[DONE] Stage 2 completed! ✅")
 
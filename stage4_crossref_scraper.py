@@ -6,15 +6,22 @@ Stage 4: Cross-Reference Scraper 🔗
 - Scrape Website URLs ที่ Stage 3 เจอ
 - หา email เพิ่มเติม
 """
+import os
 import sys
+import socket
 import sqlite3
-import re
 import time
 import argparse
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
-from email_validator import validate_email, EmailNotValidError
 from playwright.sync_api import sync_playwright
+import email_extract
+import fb_extract
+import browser_service
+from crawl_cache import CrawlCache
+from host_scheduler import HostScheduler
+from interception import InterceptionPolicy
+from page_fetcher import TieredFetcher
+from page_readiness import PageReadiness
 
 # Fix Windows console encoding
 if sys.platform == 'win32':
@@ -23,10 +30,17 @@ if sys.platform == 'win32':
     except:
         pass
 
+# SQLite busy timeout (seconds): with several workers on one pipeline.db a claim/commit waits for the
+# write lock instead of failing. SQLITE_TIMEOUT overrides (raise it when running many workers).
+try:
+    SQLITE_TIMEOUT = max(1.0, float(os.getenv('SQLITE_TIMEOUT', '30')))
+except ValueError:
+    SQLITE_TIMEOUT = 30.0
+
 
 class CrossRefScraper:
-    def __init__(self, db_path, verbose=False, use_api=False):
-        import os
+    def __init__(self, db_path, verbose=False, use_api=False,
+                 worker_id=None, lease_seconds=900, claim_batch=10, browser_service_url=None):
         self.db_path = db_path
         self.verbose = verbose
         self.use_api = use_api or bool(os.environ.get('CHECKIN_API_URL') or os.environ.get('API_BASE_URL'))
@@ -41,14 +55,44 @@ class CrossRefScraper:
         self.page_timeout = 8000
         self.wait_time = 1500
         
-        # Email regex
-        self.email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        
-        # Playwright objects
+        # Playwright objects (started on the first page that needs a browser)
         self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
+        
+        # Shared long-lived Chromium (browser_service.py) when running; otherwise launch our own
+        self.browser_service_url = browser_service.resolve(browser_service_url)
+        
+        # Website URLs: plain HTTP first, Chromium only for JS-rendered / blocked pages
+        # Per-host rate/concurrency budgets (facebook.com has its own, stricter one)
+        # Crawl cache (shared file with Stage 2) also holds per-URL validators: pages seen before are
+        # revalidated (ETag / Last-Modified / content hash) instead of re-extracted
+        self.scheduler = HostScheduler.from_env()
+        self.crawl_cache = CrawlCache.from_env()
+        self.fetcher = TieredFetcher(timeout=self.page_timeout / 1000, scheduler=self.scheduler,
+                                     validators=self.crawl_cache)
+        
+        # Browser pages: return once an email/mailto appears or the page goes quiet (hard cap)
+        self.ready = PageReadiness(cap_ms=self.wait_time * 2, fixed_ms=self.wait_time)
+        self.fb_ready = PageReadiness(cap_ms=5000, min_ms=1000, fixed_ms=max(self.wait_time, 2500))
+        
+        # Browser request blocking (types + third-party hosts) with per-page request/byte counts
+        self.intercept = InterceptionPolicy.from_env()
+        
+        # Buffered API writer, spool-backed (created in run() when using API)
+        self._writer = None
+        
+        # Work claiming (lease) so several Stage 4 workers never take the same URL
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.claim_batch = max(1, claim_batch)
+        self._claimed_pending = []
+        self._claim_supported = None  # decided by the first claim
+        try:
+            self.claim_retry_seconds = max(0.0, float(os.getenv('CLAIM_RETRY_SECONDS', '600')))
+        except ValueError:
+            self.claim_retry_seconds = 600.0
     
     def connect_db(self):
         """Connect to database or no-op when using API"""
@@ -58,7 +102,8 @@ class CrossRefScraper:
             if self.verbose:
                 print("[OK] Using API")
             return
-        self.conn = sqlite3.connect(self.db_path)
+        # N workers share the DB: wait for the write lock instead of failing with 'database is locked'
+        self.conn = sqlite3.connect(self.db_path, timeout=SQLITE_TIMEOUT)
         self.cursor = self.conn.cursor()
         if self.verbose:
             print(f"[OK] Connected to database: {self.db_path}")
@@ -72,6 +117,14 @@ class CrossRefScraper:
             if self.verbose:
                 print("[OK] Closed database connection")
     
+    # Same flags as browser_service (Stages 2-4 share one list so they can't drift apart)
+    LAUNCH_ARGS = browser_service.LAUNCH_ARGS
+    CONTEXT_OPTIONS = {
+        'viewport': {'width': 1920, 'height': 1080},
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+        'bypass_csp': True,
+    }
+    
     def init_browser(self):
         """Initialize Playwright browser"""
         if self.verbose:
@@ -79,34 +132,28 @@ class CrossRefScraper:
         
         self.playwright = sync_playwright().start()
         
-        self.browser = self.playwright.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-gpu',
-                '--no-sandbox',
-                '--disable-dev-shm-usage',
-                '--disable-web-security',
-            ]
-        )
+        self.browser, _ = browser_service.launch(self.playwright, self.LAUNCH_ARGS, self.browser_service_url,
+                                                 log=print if self.verbose else None)
         
-        self.context = self.browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            bypass_csp=True,
-        )
+        self.context = self.browser.new_context(**self.CONTEXT_OPTIONS)
         
-        # Block images/CSS
-        self.context.route("**/*.{png,jpg,jpeg,gif,svg,webp,mp4,avi,mov}", lambda route: route.abort())
-        self.context.route("**/*.css", lambda route: route.abort())
+        # Block images/fonts/CSS and third-party analytics/ads/widgets (interception.py)
+        self.intercept.install(self.context)
         
         self.page = self.context.new_page()
         
         if self.verbose:
             print("[BROWSER] Ready!")
     
+    def ensure_browser(self):
+        """เริ่ม browser เมื่อมี URL แรกที่ต้องใช้ (Facebook / เว็บที่ HTTP tier ใช้ไม่ได้)"""
+        if self.page is None:
+            self.init_browser()
+    
     def close_browser(self):
         """Close browser"""
+        if not self.playwright:
+            return
         if self.page:
             self.page.close()
         if self.context:
@@ -124,28 +171,18 @@ class CrossRefScraper:
     def get_discovered_urls(self, limit=None):
         """Get discovered URLs with status='NEW' (from DB or API)"""
         if self.use_api and self._api:
-            per_page = min(500, limit) if limit else 500
-            page = 1
-            data = []
-            while True:
-                r = self._api.get_discovered_urls(status='NEW', per_page=per_page, page=page)
-                chunk = (r or {}).get('data') or []
-                if not chunk:
-                    break
-                data.extend(chunk)
-                if limit and len(data) >= limit:
-                    data = data[:limit]
-                    break
-                current_page = int((r or {}).get('current_page') or page)
-                last_page = int((r or {}).get('last_page') or current_page)
-                if current_page >= last_page:
-                    break
-                if len(chunk) < per_page:
-                    break
-                page += 1
-            records = [(d.get('id'), d.get('place_id'), d.get('url'), d.get('url_type')) for d in data]
+            # Stream pages (next page prefetched while the current one is processed)
+            records = self._api.iter_discovered_urls(
+                status='NEW',
+                per_page=min(500, limit) if limit else 500,
+                limit=limit,
+                transform=lambda d: (d.get('id'), d.get('place_id'), d.get('url'), d.get('url_type')),
+            )
             if self.verbose:
-                print(f"[INFO] Found {len(records)} discovered URLs (status='NEW') (API)")
+                if records.total is None:
+                    print("[INFO] Streaming discovered URLs (status='NEW') (API, total unknown)")
+                else:
+                    print(f"[INFO] Found {records.total} discovered URLs (status='NEW') (API)")
             return records
         sql = """
             SELECT id, place_id, url, url_type 
@@ -172,10 +209,104 @@ class CrossRefScraper:
         )
         self.conn.commit()
     
+    def claim_discovered_urls(self, n):
+        """Claim up to n NEW discovered URLs for this worker (status=PROCESSING + lease).
+        Expired leases go back to NEW first. Returns None if claiming is not supported — decided on
+        the first claim only. After that, transient failures (API 429/5xx / connection error / open
+        breaker, locked DB) are retried with backoff for up to claim_retry_seconds, then raised."""
+        retry_until = time.monotonic() + self.claim_retry_seconds
+        delay = 1.0
+        transient = (sqlite3.OperationalError,) + (self._api.TRANSIENT_ERRORS if self._api else ())
+        while True:
+            try:
+                records = self._claim_discovered_urls_once(n)
+                if records is not None or self._claim_supported is None:
+                    self._claim_supported = records is not None
+                    return records
+                error = 'claim endpoint not available'
+            except transient as e:
+                error = e
+            wait = getattr(error, 'retry_in', delay) + 0.1
+            if time.monotonic() + wait > retry_until:
+                raise RuntimeError(f"Claiming discovered URLs failed for {self.claim_retry_seconds:g}s: {error}")
+            print(f"[WARNING] Claim failed ({error}); retrying in {wait:.0f}s")
+            time.sleep(wait)
+            delay = min(delay * 2, 60.0)
+    
+    def _claim_discovered_urls_once(self, n):
+        """1 claim attempt: rows, None = claiming not supported (no endpoint / migration 0003 / RETURNING),
+        raise on transient errors"""
+        if self.use_api and self._api:
+            rows = self._api.claim_discovered_urls(n, self.worker_id, self.lease_seconds)
+            if rows is None:
+                return None
+            return [(d.get('id'), d.get('place_id'), d.get('url'), d.get('url_type')) for d in rows]
+        now = int(time.time())
+        try:
+            self.cursor.execute("BEGIN IMMEDIATE")
+            self.cursor.execute("""
+                UPDATE discovered_urls SET status='NEW', claimed_by=NULL, lease_expires_at=NULL
+                WHERE status='PROCESSING' AND lease_expires_at IS NOT NULL AND lease_expires_at < ?
+            """, (now,))
+            self.cursor.execute("""
+                UPDATE discovered_urls
+                SET status='PROCESSING', claimed_by=?, lease_expires_at=?, updated_at=?
+                WHERE id IN (
+                    SELECT id FROM discovered_urls WHERE status='NEW' ORDER BY id LIMIT ?
+                )
+                RETURNING id, place_id, url, url_type
+            """, (self.worker_id, now + self.lease_seconds, now, n))
+            records = sorted(self.cursor.fetchall())
+            self.conn.commit()
+            return records
+        except sqlite3.OperationalError as e:
+            self.conn.rollback()
+            if 'locked' in str(e) or 'busy' in str(e):
+                raise  # another worker holds the write lock longer than the busy timeout: retry
+            # DB without migration 0003 (or SQLite < 3.35 without RETURNING)
+            if self.verbose and self._claim_supported is None:
+                print(f"[WARNING] Claiming not available ({e}); using list + lock")
+            return None
+    
+    def release_discovered_urls(self, url_ids):
+        """คืน URL ที่ claim ไว้แต่ยังไม่ได้เริ่มทำ กลับเป็น NEW"""
+        if not url_ids:
+            return
+        if self.use_api and self._api:
+            if self._writer:
+                for url_id in url_ids:
+                    self._writer.set_discovered_url_status(url_id, 'NEW')
+            else:
+                self._api.update_discovered_urls_status_bulk([{'id': int(i), 'status': 'NEW'} for i in url_ids])
+            return
+        self.cursor.executemany(
+            "UPDATE discovered_urls SET status='NEW', claimed_by=NULL, lease_expires_at=NULL WHERE id=? AND claimed_by=?",
+            [(url_id, self.worker_id) for url_id in url_ids]
+        )
+        self.conn.commit()
+    
+    def iter_claimed_urls(self, first_batch, limit=None):
+        """Yield claimed URLs, claiming the next batch when the current one is used up"""
+        batch = first_batch
+        taken = 0
+        while batch:
+            self._claimed_pending = list(batch)
+            while self._claimed_pending:
+                record = self._claimed_pending.pop(0)
+                taken += 1
+                yield record
+            n = min(self.claim_batch, limit - taken) if limit else self.claim_batch
+            if n <= 0:
+                break
+            batch = self.claim_discovered_urls(n)
+    
     def finalize_discovered_url(self, url_id, status):
         """UPDATE status='DONE' or 'FAILED'"""
         if self.use_api and self._api:
-            self._api.update_discovered_url(int(url_id), status)
+            if self._writer:
+                self._writer.set_discovered_url_status(url_id, status)
+            else:
+                self._api.update_discovered_url(int(url_id), status)
             return
         self.cursor.execute(
             "UPDATE discovered_urls SET status=?, updated_at=strftime('%s', 'now') WHERE id=?",
@@ -187,7 +318,10 @@ class CrossRefScraper:
         """Save email to emails table or API"""
         if self.use_api and self._api:
             try:
-                self._api.create_email(place_id, email, source)
+                if self._writer:
+                    self._writer.add_email(place_id, email, source)
+                else:
+                    self._api.create_email(place_id, email, source)
                 return True
             except Exception as e:
                 if self.verbose:
@@ -208,12 +342,8 @@ class CrossRefScraper:
     # ==================== Scraping ====================
     
     def validate_email(self, email):
-        """Validate email"""
-        try:
-            validated = validate_email(email, check_deliverability=False)
-            return validated.normalized
-        except EmailNotValidError:
-            return None
+        """Validate email (cached)"""
+        return email_extract.normalize_email(email)
     
     def _facebook_about_url(self, fb_url):
         """ไปที่หน้า About ของ Facebook (อีเมลอยู่ที่แท็บ About)"""
@@ -226,53 +356,44 @@ class CrossRefScraper:
         """Scrape Facebook URL - ไปที่หน้า About เพื่อดึงอีเมล"""
         try:
             about_url = self._facebook_about_url(fb_url)
-            self.page.goto(about_url, wait_until='domcontentloaded', timeout=self.page_timeout)
-            self.page.wait_for_timeout(max(self.wait_time, 2500))  # รอให้ About โหลด
-            
-            html = self.page.content()
-            
-            # Find emails
-            emails = re.findall(self.email_pattern, html, re.IGNORECASE)
-            emails = [e for e in emails if 'facebook' not in e.lower()]
-            
-            # Validate
-            valid_emails = []
-            for email in emails:
-                validated = self.validate_email(email)
-                if validated:
-                    valid_emails.append(validated)
-            
-            return list(set(valid_emails))
+            self.ensure_browser()
+            with self.scheduler.slot(about_url):
+                self.page.goto(about_url, wait_until='domcontentloaded', timeout=self.page_timeout)
+                self.fb_ready.wait(self.page, about_url)  # รอให้ About โหลด (อีเมลโผล่ / หน้าเงียบ / cap)
+                html = self.page.content()
+            return fb_extract.extract_contacts(html).emails
             
         except Exception as e:
             if self.verbose:
                 print(f"   [ERROR] {str(e)[:50]}")
             return []
     
+    def extract_emails(self, html):
+        """ดึงอีเมลจาก HTML (ทั้ง text และ source)"""
+        return email_extract.extract_emails(html)
+    
+    def browser_html(self, url):
+        """เปิดหน้าด้วย Playwright แล้วคืน HTML"""
+        self.ensure_browser()
+        self.page.goto(url, wait_until='commit', timeout=self.page_timeout)
+        self.ready.wait(self.page, url)
+        return self.page.content()
+    
     def scrape_website_url(self, web_url):
-        """Scrape Website URL"""
+        """Scrape Website URL (crawl cache ก่อน, แล้ว HTTP, Playwright เมื่อจำเป็น)"""
+        cached = self.crawl_cache.get('page', web_url)
+        if cached is not None:
+            if self.verbose:
+                print(f"   [CACHE] {len(cached.emails)} emails (crawled {cached.age_hours:.1f}h ago)")
+            return cached.emails
         try:
-            self.page.goto(web_url, wait_until='commit', timeout=self.page_timeout)
-            self.page.wait_for_timeout(self.wait_time)
-            
-            html = self.page.content()
-            soup = BeautifulSoup(html, 'lxml')
-            text = soup.get_text()
-            
-            # Find emails in both HTML and text
-            raw_emails = set()
-            raw_emails.update(re.findall(self.email_pattern, text, re.IGNORECASE))
-            raw_emails.update(re.findall(self.email_pattern, html, re.IGNORECASE))
-            
-            # Validate
-            valid_emails = []
-            for email in raw_emails:
-                email = email.strip().lower()
-                validated = self.validate_email(email)
-                if validated:
-                    valid_emails.append(validated)
-            
-            return list(set(valid_emails))
+            result = self.fetcher.fetch(web_url, self.extract_emails, self.browser_html)
+            if self.verbose and result.tier == 'browser':
+                print(f"   [BROWSER] {result.reason}")
+            emails = result.data or []
+            if emails or result.html:
+                self.crawl_cache.put('page', web_url, emails)
+            return emails
             
         except Exception as e:
             if self.verbose:
@@ -281,8 +402,8 @@ class CrossRefScraper:
     
     # ==================== Processing ====================
     
-    def process_discovered_url(self, url_id, place_id, url, url_type):
-        """Process 1 discovered URL"""
+    def process_discovered_url(self, url_id, place_id, url, url_type, locked=False):
+        """Process 1 discovered URL (locked=True when already claimed with a lease)"""
         if self.verbose:
             print(f"\n{'='*60}")
             print(f"[PROCESSING] {url_type}: {url}")
@@ -290,7 +411,8 @@ class CrossRefScraper:
         
         try:
             # Lock
-            self.lock_discovered_url(url_id)
+            if not locked:
+                self.lock_discovered_url(url_id)
             
             # Scrape based on type
             emails = []
@@ -334,44 +456,75 @@ class CrossRefScraper:
         
         # Connect DB
         self.connect_db()
+        if self.use_api and self._api:
+            self._writer = self._api.open_writer(verbose=self.verbose)
         
         try:
-            # Get discovered URLs
-            urls = self.get_discovered_urls(limit)
-            
-            if not urls:
+            # Get discovered URLs: claim leased batches; fall back to list + lock per URL
+            first_batch = self.claim_discovered_urls(min(self.claim_batch, limit) if limit else self.claim_batch)
+            if first_batch is None:
+                urls = self.get_discovered_urls(limit)
+                total = len(urls) if isinstance(urls, list) else urls.total
+                locked = False
+            else:
+                urls = self.iter_claimed_urls(first_batch, limit)
+                total = 0 if not first_batch else None
+                locked = True
+            if total == 0:
                 print("[INFO] No discovered URLs to process (status='NEW')")
                 return
             
-            print(f"[START] Processing {len(urls)} discovered URLs...\n")
-            
-            # Initialize browser
-            self.init_browser()
+            if locked:
+                print(f"[START] Worker {self.worker_id}: claiming URLs in batches of {self.claim_batch}...\n")
+            elif total is None:
+                # server did not report a total (old API / failed first page): no progress percentage
+                print("[START] Processing discovered URLs with status='NEW' (total unknown)...\n")
+            else:
+                print(f"[START] Processing {total} discovered URLs...\n")
             
             success_count = 0
             failed_count = 0
             
             # Process each URL
             for idx, (url_id, place_id, url, url_type) in enumerate(urls, 1):
-                print(f"[{idx}/{len(urls)}] ", end="")
+                print(f"[{idx}/{total}] " if total else f"[{idx}] ", end="")
                 
-                success = self.process_discovered_url(url_id, place_id, url, url_type)
+                success = self.process_discovered_url(url_id, place_id, url, url_type, locked=locked)
                 
                 if success:
                     success_count += 1
                 else:
                     failed_count += 1
             
+            if total is None and not success_count + failed_count:
+                # total unknown up front: the list turned out to be empty
+                print("[INFO] No discovered URLs to process (status='NEW')")
+                return
+            
             elapsed = time.time() - start_time
             
             print(f"\n{'='*60}")
             print(f"[SUCCESS] {success_count} URLs")
             print(f"[FAILED] {failed_count} URLs")
-            print(f"[TIME] {elapsed:.2f} seconds ({elapsed/len(urls):.2f}s per URL)")
+            processed = max(1, success_count + failed_count)
+            print(f"[TIME] {elapsed:.2f} seconds ({elapsed/processed:.2f}s per URL)")
+            print(self.fetcher.summary())
+            print(self.ready.summary())
+            print(self.fb_ready.summary('facebook pages'))
+            print(self.crawl_cache.summary())
+            print(self.scheduler.summary())
+            print(self.intercept.summary())
             print(f"{'='*60}")
             
         finally:
+            if self._claimed_pending:
+                self.release_discovered_urls([r[0] for r in self._claimed_pending])
+                self._claimed_pending = []
             self.close_browser()
+            self.crawl_cache.close()
+            if self._writer:
+                self._writer.close()
+                self._writer = None
             self.close_db()
 
 
@@ -380,6 +533,11 @@ def main():
     parser.add_argument('--db', default='pipeline.db', help='SQLite database path')
     parser.add_argument('--limit', type=int, help='จำกัดจำนวน URLs')
     parser.add_argument('--verbose', '-v', action='store_true', help='แสดงข้อความละเอียด')
+    parser.add_argument('--worker-id', help='ชื่อ worker สำหรับ claim งาน (default: hostname-pid)')
+    parser.add_argument('--lease', type=int, default=900, help='อายุ lease ของงานที่ claim (วินาที)')
+    parser.add_argument('--claim-batch', type=int, default=10, help='จำนวน URLs ที่ claim ต่อครั้ง')
+    parser.add_argument('--browser-service', nargs='?', const='1', default=None, metavar='URL',
+                        help='ต่อ Chromium ของ browser_service.py (default env BROWSER_SERVICE); ไม่รันอยู่ = launch เอง')
     
     args = parser.parse_args()
     
@@ -387,7 +545,11 @@ def main():
     print("Stage 4: Cross-Reference Scraper 🔗")
     print("=" * 60)
     
-    scraper = CrossRefScraper(args.db, verbose=args.verbose)
+    scraper = CrossRefScraper(
+        args.db, verbose=args.verbose,
+        worker_id=args.worker_id, lease_seconds=args.lease, claim_batch=args.claim_batch,
+        browser_service_url=args.browser_service,
+    )
     scraper.run(limit=args.limit)
     
     print("\n[DONE] Stage 4 completed! ✅")